@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""Authenticated requests per second with HTTP Basic auth
+
+Serves a trivial page behind CherryPy's auth_basic tool using
+user.validate_password, the same way the web UI is configured when AUTH_TYPE
+is Basic, and polls it from client threads like open status pages do. Runs
+once with the verified-credential cache disabled and once with it enabled.
+
+Usage: python benchmarks/basic_auth.py [--clients 4] [--seconds 5]
+"""
+
+import argparse
+import base64
+import http.client
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+bench_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+bench_parser.add_argument("--clients", type=int, default=4, help="Client threads")
+bench_parser.add_argument("--seconds", type=float, default=5, help="Run time per case")
+bench_args = bench_parser.parse_args()
+
+tmp = tempfile.mkdtemp(prefix="redball-bench-")
+# redball parses the command line on import
+sys.argv = [sys.argv[0], "--quiet", "--log", os.path.join(tmp, "logs")]
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cherrypy  # noqa: E402
+
+import redball  # noqa: E402
+from redball import config, database, user  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+class Status(object):
+    @cherrypy.expose()
+    def index(self):
+        return "OK"
+
+
+def client(port, stop, counts, n):
+    auth = base64.b64encode(b"bench:benchpass").decode("ascii")
+    con = http.client.HTTPConnection("127.0.0.1", port)
+    while not stop.is_set():
+        con.request("GET", "/", headers={"Authorization": "Basic " + auth})
+        r = con.getresponse()
+        r.read()
+        if r.status != 200:
+            raise Exception("Unexpected response status: {}".format(r.status))
+
+        counts[n] += 1
+
+    con.close()
+
+
+def run_case(port, ttl):
+    user.AUTH_CACHE_TTL = ttl
+    user.invalidate_auth_cache()
+    stop = threading.Event()
+    counts = {n: 0 for n in range(bench_args.clients)}
+    threads = [
+        threading.Thread(target=client, args=(port, stop, counts, n)) for n in counts
+    ]
+    for t in threads:
+        t.start()
+
+    time.sleep(bench_args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return sum(counts.values()) / bench_args.seconds
+
+
+if __name__ == "__main__":
+    redball.DB_PATH = tmp
+    redball.DB_FILE = os.path.join(tmp, "redball.db")
+    database.validate_db()
+    config.update_config(
+        {"category": "Web/Security", "key": "AUTH_TYPE", "val": "Basic", "type": "str"}
+    )
+    user.create_user(
+        userid="bench",
+        name="Bench",
+        password="benchpass",
+        confirm_password="benchpass",
+        email="",
+        reddit_userid="",
+        privileges=["rb_web"],
+    )
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    cherrypy.config.update(
+        {
+            "server.socket_host": "127.0.0.1",
+            "server.socket_port": port,
+            "server.thread_pool": max(10, bench_args.clients),
+            "environment": "embedded",
+            "log.screen": False,
+        }
+    )
+    cherrypy.tree.mount(
+        Status(),
+        "/",
+        {
+            "/": {
+                "tools.auth_basic.on": True,
+                "tools.auth_basic.realm": "redball",
+                "tools.auth_basic.checkpassword": user.validate_password,
+                "tools.auth_basic.accept_charset": "UTF-8",
+            }
+        },
+    )
+    cherrypy.engine.start()
+    cherrypy.engine.wait(cherrypy.engine.states.STARTED)
+
+    print("{} client(s), {}s per case".format(bench_args.clients, bench_args.seconds))
+    print("{:<10} {:>14}".format("cache", "requests/sec"))
+    try:
+        results = {}
+        for name, ttl in (("off", 0), ("on", 300)):
+            results[name] = run_case(port, ttl)
+            print("{:<10} {:>14.1f}".format(name, results[name]))
+
+        print("speedup: {:.0f}x".format(results["on"] / results["off"]))
+    finally:
+        cherrypy.engine.exit()
+        database.POOL.reset()
+        shutil.rmtree(tmp, ignore_errors=True)
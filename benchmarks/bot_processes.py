@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""Template rendering throughput of bots running as threads vs processes
+
+Starts N bots of a scratch bot type whose module is this file. Each bot
+renders a Mako boxscore-style table over and over, like game thread bots do
+when building posts, and reports its render count through detailedState.
+Runs once with the bot type in thread mode and once in process mode, and
+reports total renders/sec across all bots. Process mode can only do better
+when there are spare CPU cores.
+
+Usage: python benchmarks/bot_processes.py [--bots 4] [--rows 300] [--seconds 10]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from mako.template import Template
+
+# Bot processes import this file as a bot module, so the setup that the other
+# benchmarks do at import time (including importing redball, which parses
+# the command line) only happens in main()
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+STATE_INTERVAL = 0.5
+
+BOXSCORE = Template(
+    """\
+|Batter|Pos|AB|R|H|RBI|BB|K|LOB|AVG|OPS|
+|:--|:--|--:|--:|--:|--:|--:|--:|--:|--:|--:|
+% for p in players:
+|${p["name"]}|${p["pos"]}|${p["ab"]}|${p["r"]}|${p["h"]}|${p["rbi"]}|\
+${p["bb"]}|${p["k"]}|${p["lob"]}|${"{:.3f}".format(p["h"] / max(p["ab"], 1))}|\
+${"{:.3f}".format((p["h"] + p["bb"]) / max(p["ab"] + p["bb"], 1) * 2)}|
+% endfor
+"""
+)
+
+
+def bench_state(renders, seconds):
+    text = "{} renders in {:.1f}s".format(renders, seconds)
+    return {
+        "summary": {"text": text, "html": text, "markdown": text},
+        "renders": renders,
+        "seconds": seconds,
+    }
+
+
+def run(bot, settings):
+    players = [
+        {
+            "name": "Player {}".format(i),
+            "pos": ("C", "1B", "2B", "3B", "SS", "LF", "CF", "RF", "DH")[i % 9],
+            "ab": i % 5 + 1,
+            "r": i % 2,
+            "h": i % 3,
+            "rbi": i % 4,
+            "bb": i % 2,
+            "k": i % 3,
+            "lob": i % 4,
+        }
+        for i in range(int(settings["Benchmark"]["rows"]))
+    ]
+    renders = 0
+    start = last = time.time()
+    while not bot.STOP:
+        BOXSCORE.render(players=players)
+        renders += 1
+        if time.time() - last >= STATE_INTERVAL:
+            last = time.time()
+            bot.detailedState = bench_state(renders, last - start)
+
+    bot.detailedState = bench_state(renders, time.time() - start)
+
+
+def main():
+    bench_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    bench_parser.add_argument("--bots", type=int, default=4, help="Bots to run")
+    bench_parser.add_argument("--rows", type=int, default=300, help="Rows per table")
+    bench_parser.add_argument(
+        "--seconds", type=float, default=10, help="Run time per mode"
+    )
+    bench_args = bench_parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="redball-bench-")
+    # redball parses the command line on import
+    sys.argv = [sys.argv[0], "--quiet", "--log", os.path.join(tmp, "logs")]
+    sys.path.insert(0, REPO_ROOT)
+
+    import redball
+    from redball import bot, config, database, upgrade
+
+    logging.disable(logging.INFO)
+    redball.DB_PATH = tmp
+    redball.DB_FILE = os.path.join(tmp, "redball.db")
+    database.validate_db()
+    upgrade.upgrade_database()
+
+    botTypeId = config.create_botType(
+        description="Benchmark", moduleName="benchmarks.bot_processes"
+    )
+    authId = config.create_redditAuth(
+        description="Benchmark",
+        reddit_appId="",
+        reddit_appSecret="",
+        reddit_scopes=[],
+        reddit_refreshToken="",
+    )
+    bots = []
+    for i in range(bench_args.bots):
+        b = bot.Bot(
+            botInfo={
+                "name": "bench{}".format(i),
+                "botType": botTypeId,
+                "autoRun": "False",
+                "redditAuth": authId,
+            },
+            create=True,
+        )
+        config.add_bot_config(
+            botId=b.id,
+            category="Benchmark",
+            key="rows",
+            description="Rows per table",
+            dataType="int",
+            val=bench_args.rows,
+        )
+        bots.append(bot.Bot(botId=b.id))
+
+    print(
+        "{} bot(s), {} rows per table, {} CPU(s), {}s per mode".format(
+            bench_args.bots, bench_args.rows, os.cpu_count(), bench_args.seconds
+        )
+    )
+    print("{:<10} {:>14}".format("mode", "renders/sec"))
+    try:
+        results = {}
+        for mode in config.BOT_RUN_MODES:
+            config.update_botType(botTypeId, runMode=mode)
+            for b in bots:
+                b.start()
+
+            time.sleep(bench_args.seconds)
+            for b in bots:
+                b.stop()
+
+            for b in bots:
+                b.thread.join()
+
+            results[mode] = sum(
+                b.detailedState["renders"] / b.detailedState["seconds"] for b in bots
+            )
+            print("{:<10} {:>14.1f}".format(mode, results[mode]))
+
+        print("speedup: {:.1f}x".format(results["process"] / results["thread"]))
+    finally:
+        database.POOL.reset()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
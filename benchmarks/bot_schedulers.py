@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Threads used by bot scheduled jobs, per-bot schedulers vs the shared one
+
+Each of N "bots" schedules a status update job and a couple of update jobs,
+the way the game thread and sidebar bots do. Runs once with a
+BackgroundScheduler per bot (how bots used to schedule jobs) and once with a
+scheduler.JobGroup per bot on the shared platform scheduler, and reports the
+thread count while the jobs are running and how many job runs completed.
+
+Usage: python benchmarks/bot_schedulers.py [--bots 25] [--seconds 5]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+bench_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+bench_parser.add_argument("--bots", type=int, default=25, help="Bots to simulate")
+bench_parser.add_argument("--seconds", type=float, default=5, help="Run time per case")
+bench_args = bench_parser.parse_args()
+
+tmp = tempfile.mkdtemp(prefix="redball-bench-")
+# redball parses the command line on import
+sys.argv = [sys.argv[0], "--quiet", "--log", os.path.join(tmp, "logs")]
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from apscheduler.schedulers.background import BackgroundScheduler  # noqa: E402
+
+import redball  # noqa: E402
+from redball import scheduler  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+def add_jobs(sch, counts, n):
+    def job():
+        counts[n] += 1
+        time.sleep(0.01)
+
+    sch.add_job(job, "interval", name="bot-{}-statusUpdateTask".format(n), minutes=1)
+    for i in range(2):
+        sch.add_job(job, "interval", name="bot-{}-update-{}".format(n, i), seconds=1)
+
+
+def run_case(shared):
+    counts = {n: 0 for n in range(bench_args.bots)}
+    baseline = threading.active_count()
+    schedulers = []
+    for n in counts:
+        if shared:
+            sch = scheduler.JobGroup("bot-{}".format(n))
+        else:
+            sch = BackgroundScheduler()
+            sch.start()
+
+        add_jobs(sch, counts, n)
+        schedulers.append(sch)
+
+    time.sleep(bench_args.seconds)
+    threads = threading.active_count() - baseline
+    for sch in schedulers:
+        sch.shutdown()
+
+    return threads, sum(counts.values())
+
+
+if __name__ == "__main__":
+    print("{} bot(s), {}s per case".format(bench_args.bots, bench_args.seconds))
+    print("{:<10} {:>10} {:>10}".format("scheduler", "threads", "job runs"))
+    try:
+        for name, shared in (("per-bot", False), ("shared", True)):
+            threads, runs = run_case(shared)
+            print("{:<10} {:>10} {:>10}".format(name, threads, runs))
+    finally:
+        if redball.SCHEDULER:
+            redball.SCHEDULER.shutdown()
+
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Read throughput of the redball database while bots are writing
+
+Runs the same workload against a scratch database once per journal mode:
+N "bot" threads repeatedly doing the count_check_edit select + update/insert
++ commit cycle, while reader threads load bot config the way Bot.get_config()
+and the web UI do. Reports reads/sec and writes/sec for each mode.
+
+Usage: python benchmarks/db_concurrency.py [--bots 12] [--readers 4] [--seconds 5]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+bench_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+bench_parser.add_argument("--bots", type=int, default=12, help="Writer threads")
+bench_parser.add_argument("--readers", type=int, default=4, help="Reader threads")
+bench_parser.add_argument("--seconds", type=float, default=5, help="Run time per mode")
+bench_parser.add_argument(
+    "--modes", default="OFF,WAL", help="Comma-separated journal modes to compare"
+)
+bench_args = bench_parser.parse_args()
+
+tmp = tempfile.mkdtemp(prefix="redball-bench-")
+# redball parses the command line on import
+sys.argv = [sys.argv[0], "--quiet", "--log", os.path.join(tmp, "logs")]
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import redball  # noqa: E402
+from redball import database  # noqa: E402
+
+logging.disable(logging.INFO)
+
+
+def writer(botId, stop, counts):
+    table = "rb_bot_{}_thread_edits".format(botId)
+    database.db_qry(
+        """CREATE TABLE IF NOT EXISTS {} (
+            threadId text not null,
+            status text not null,
+            checks integer default 0,
+            edits integer default 0,
+            dateCreated text not null,
+            dateUpdated text not null,
+            unique (threadId, status)
+        );""".format(
+            table
+        ),
+        commit=True,
+        closeAfter=True,
+    )
+    i = 0
+    while not stop.is_set():
+        threadId = "t{}".format(i % 50)
+        s = database.db_qry(
+            (
+                "select checks,edits from {} where threadId=? and status=?;".format(
+                    table
+                ),
+                (threadId, "I"),
+            ),
+            closeAfter=True,
+        )
+        if s:
+            q = (
+                "update {} set checks=checks+1, dateUpdated=? where threadId=? and status=?;".format(
+                    table
+                ),
+                (time.time(), threadId, "I"),
+            )
+        else:
+            q = (
+                "insert into {} (threadId, status, checks, edits, dateCreated, dateUpdated) values (?, ?, 1, 0, ?, ?);".format(
+                    table
+                ),
+                (threadId, "I", time.time(), time.time()),
+            )
+        database.db_qry(q, commit=True, closeAfter=True)
+        counts[botId] += 1
+        i += 1
+
+
+def reader(n, stop, counts, bots):
+    i = 0
+    while not stop.is_set():
+        database.db_qry(
+            ("SELECT * FROM rb_botConfig WHERE botId=?;", (i % bots + 1,)),
+            closeAfter=True,
+        )
+        counts[n] += 1
+        i += 1
+
+
+def run_mode(mode):
+    dataPath = os.path.join(tmp, mode)
+    os.makedirs(dataPath)
+    redball.DB_PATH = dataPath
+    redball.DB_FILE = os.path.join(dataPath, "redball.db")
+    database.SETTINGS.update({"JOURNAL_MODE": mode})
+    database.POOL.reset()
+    database.validate_db()
+
+    # Give each bot a realistically sized config
+    database.db_qry(
+        [
+            (
+                "INSERT INTO rb_botConfig (botId, category, key, val, type) VALUES (?, ?, ?, ?, 'str');",
+                (b, "Category {}".format(k % 10), "KEY_{}".format(k), '"value"'),
+            )
+            for b in range(1, bench_args.bots + 1)
+            for k in range(150)
+        ],
+        commit=True,
+        closeAfter=True,
+    )
+
+    stop = threading.Event()
+    writeCounts = {b: 0 for b in range(1, bench_args.bots + 1)}
+    readCounts = {r: 0 for r in range(bench_args.readers)}
+    threads = [
+        threading.Thread(target=writer, args=(b, stop, writeCounts))
+        for b in writeCounts
+    ] + [
+        threading.Thread(target=reader, args=(r, stop, readCounts, bench_args.bots))
+        for r in readCounts
+    ]
+    for t in threads:
+        t.start()
+
+    time.sleep(bench_args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return (
+        sum(readCounts.values()) / bench_args.seconds,
+        sum(writeCounts.values()) / bench_args.seconds,
+    )
+
+
+if __name__ == "__main__":
+    print(
+        "{} bot writer(s), {} reader(s), {}s per mode".format(
+            bench_args.bots, bench_args.readers, bench_args.seconds
+        )
+    )
+    print("{:<8} {:>12} {:>12}".format("mode", "reads/sec", "writes/sec"))
+    try:
+        for mode in bench_args.modes.split(","):
+            reads, writes = run_mode(mode.strip().upper())
+            print("{:<8} {:>12.0f} {:>12.0f}".format(mode, reads, writes))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Per-row cost of each db_qry rowType
+
+Fills an in-memory rb_botConfig table and times fetching all rows with the
+old per-row dict_factory and with each rowType supported by db_qry(). Rows
+have the same columns as rb_botConfig so the numbers reflect the config
+loads behind Bot.get_config() and the web config page.
+
+Usage: python benchmarks/row_types.py [--rows 10000] [--repeat 20]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+bench_parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+bench_parser.add_argument("--rows", type=int, default=10000, help="Rows per fetch")
+bench_parser.add_argument("--repeat", type=int, default=20, help="Fetches per type")
+bench_args = bench_parser.parse_args()
+
+tmp = tempfile.mkdtemp(prefix="redball-bench-")
+# redball parses the command line on import
+sys.argv = [sys.argv[0], "--quiet", "--log", os.path.join(tmp, "logs")]
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from redball import database  # noqa: E402
+
+con = sqlite3.connect(":memory:")
+con.execute(
+    """CREATE TABLE rb_botConfig (
+        id integer primary key autoincrement,
+        botId integer not null,
+        category text not null,
+        key text not null,
+        description text,
+        type text,
+        val text,
+        options text,
+        subkeys text,
+        parent_key text,
+        read_only text,
+        system text default 'False'
+    );"""
+)
+con.executemany(
+    "INSERT INTO rb_botConfig (botId, category, key, description, type, val, options, subkeys, parent_key, read_only) VALUES (1, ?, ?, 'A setting', 'str', '\"value\"', '[]', '[]', '', 'False');",
+    (
+        ("Category {}".format(i % 20), "KEY_{}".format(i))
+        for i in range(bench_args.rows)
+    ),
+)
+QUERY = "SELECT * FROM rb_botConfig;"
+
+
+def fetch_dict_factory():
+    cur = con.cursor()
+    cur.row_factory = database.dict_factory
+    return cur.execute(QUERY).fetchall()
+
+
+def fetch(rowType):
+    def f():
+        cur = con.cursor()
+        cur.row_factory = sqlite3.Row if rowType == "row" else None
+        return database.materialize(cur, cur.execute(QUERY).fetchall(), rowType)
+
+    return f
+
+
+if __name__ == "__main__":
+    cases = [("dict_factory (old)", fetch_dict_factory)] + [
+        (rowType, fetch(rowType)) for rowType in ("dict", "row", "record", "tuple")
+    ]
+    print("{} rows x {} fetches, best of 3".format(bench_args.rows, bench_args.repeat))
+    perRow = {}
+    for name, f in cases:
+        t = min(timeit.repeat(f, number=bench_args.repeat, repeat=3))
+        perRow[name] = t / bench_args.repeat / bench_args.rows * 1e9
+
+    # Overhead is the cost on top of fetching plain tuples
+    print(
+        "{:<20} {:>10} {:>14} {:>8}".format(
+            "rowType", "ns/row", "overhead ns", "vs old"
+        )
+    )
+    base = perRow["dict_factory (old)"] - perRow["tuple"]
+    for name, ns in perRow.items():
+        overhead = ns - perRow["tuple"]
+        print(
+            "{:<20} {:>10.0f} {:>14.0f} {:>8}".format(
+                name,
+                ns,
+                overhead,
+                "{:.1f}x".format(base / overhead) if overhead > 0 else "-",
+            )
+        )
@@ -6,7 +6,7 @@ By Todd Roberts
 import threading
 
 import redball
-from redball import logger
+from redball import database as rbdb, logger
 
 # Import bot-specific modules
 import os
@@ -87,14 +87,14 @@ def run(bot, settings):
             raise
 
     try:
-        db = sqlite3.connect(
+        db = rbdb.connect(
             os.path.join(
                 settings["Database"]["dbPath"], settings["Database"]["dbFile"]
             ),
-            timeout=30,
+            logg=tl.log,
         )
         """Local sqlite database to store info about processed comments"""
-        db.execute("PRAGMA journal_mode = off;")
+        db.row_factory = None
         # db.set_trace_callback(print)
     except sqlite3.Error as e:
         tl.log.error("Error connecting to database: {}".format(e))
@@ -346,7 +346,7 @@ def run(bot, settings):
                         limits
                     )
                 )
-                time.sleep(60)
+                bot.sleep(60)
             else:
                 tl.log.debug("Reddit API limits: {}".format(limits))
         else:  # If main thread has said to stop, we stop!
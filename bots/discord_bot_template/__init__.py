@@ -3,7 +3,6 @@
 by Todd Roberts
 """
 
-import time
 import threading
 
 import redball
@@ -49,16 +48,13 @@ def run(bot, settings):
         daemon=True,
     )
     botThread.start()
-    i = 0  # This is used inside the sample loop to log 'still alive' entries every 60 cycles
     while True:  # This loop keeps the bot running
         if (
             redball.SIGNAL is None and not bot.STOP
         ):  # Make sure the main thread hasn't sent a stop command
-            i = i + 1
-            if i == 60:  # Log that you're still running every 60 seconds
+            # Log that you're still running every 60 seconds
+            if not bot.sleep(60):  # bot.sleep() returns True early if stopped
                 tl.log.debug("Still alive...")
-                i = 0
-            time.sleep(1)
         else:  # If main thread has said to stop, we stop!
             tl.log.info("Bot {} (id={}) exiting...".format(bot.name, bot.id))
             break  # Exit the infinite loop to stop the bot
@@ -4,7 +4,7 @@ import time
 import threading
 
 import redball
-from redball import logger
+from redball import database as rbdb, logger
 
 from bs4 import BeautifulSoup
 import hashlib
@@ -81,14 +81,14 @@ def run(bot, settings):
             raise
 
     try:
-        db = sqlite3.connect(
+        db = rbdb.connect(
             os.path.join(
                 settings["Database"]["dbPath"], settings["Database"]["dbFile"]
             ),
-            timeout=30,
+            logg=tl.log,
         )
         """Local sqlite database to store info about processed posts"""
-        db.execute("PRAGMA journal_mode = off;")
+        db.row_factory = None
     except sqlite3.Error as e:
         tl.log.error(f"Error connecting to database: {e}")
         raise
@@ -335,7 +335,7 @@ def run(bot, settings):
                 tl.log.error(
                     f"Sleeping for 10 seconds and then continuing after exception: {e}"
                 )
-                time.sleep(10)
+                bot.sleep(10)
         else:  # If main thread has said to stop, we stop!
             tl.log.info(f"Bot {bot.name} (id={bot.id}) exiting...")
             break  # Exit the infinite loop to stop the bot
@@ -4,8 +4,6 @@
 by Todd Roberts
 """
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.schedulers import SchedulerNotRunningError
 from datetime import datetime, timedelta
 import json
 import pytz
@@ -35,6 +33,8 @@ __version__ = "1.5.2"
 
 GENERIC_DATA_LOCK = threading.Lock()
 GAME_DATA_LOCK = threading.Lock()
+LAUNCH_SCHEDULE = {}
+LAUNCH_SCHEDULE_LOCK = threading.Lock()
 
 
 def run(bot, settings):
@@ -42,6 +42,59 @@ def run(bot, settings):
     thisBot.run()
 
 
+def launch_priority(bot, settings):
+    # Seconds until the configured team's first game today (0 if it already
+    # started), or until midnight on an off day, for the redball launcher
+    if settings.get("MLB", {}).get("TEAM", "") == "":
+        return None
+
+    teamId = int(settings["MLB"]["TEAM"].split("|")[1])
+    today = datetime.today()
+    gameTimes = [
+        x[0] for x in get_launch_schedule(today.strftime("%Y-%m-%d")) if teamId in x[1:]
+    ]
+    if gameTimes:
+        return max(0, min(gameTimes) - time.time())
+
+    return (today + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ).timestamp() - time.time()
+
+
+def get_launch_schedule(date):
+    # All MLB games on the given date as (start timestamp, away team id,
+    # home team id), fetched once per date for all bots being launched
+    with LAUNCH_SCHEDULE_LOCK:
+        if LAUNCH_SCHEDULE.get("date") != date:
+            s = statsapi.get(
+                "schedule",
+                {
+                    "sportId": 1,
+                    "date": date,
+                    "fields": "dates,games,gameDate,teams,away,home,team,id",
+                },
+            )
+            LAUNCH_SCHEDULE.update(
+                {
+                    "date": date,
+                    "games": [
+                        (
+                            datetime.strptime(game["gameDate"], "%Y-%m-%dT%H:%M:%SZ")
+                            .replace(tzinfo=pytz.utc)
+                            .timestamp(),
+                            game["teams"]["away"]["team"]["id"],
+                            game["teams"]["home"]["team"]["id"],
+                        )
+                        for d in s.get("dates", [])
+                        for game in d.get("games", [])
+                        if game.get("gameDate")
+                    ],
+                }
+            )
+
+        return LAUNCH_SCHEDULE["games"]
+
+
 class Bot(object):
     def __init__(self, bot, settings):
         self.bot = bot
@@ -83,27 +136,9 @@ class Bot(object):
         # Initialize Reddit API connection
         self.init_reddit()
 
-        # Initialize scheduler
-        if "SCHEDULER" in vars(self.bot):
-            # Scheduler already exists, maybe bot restarted
-            sch_jobs = self.bot.SCHEDULER.get_jobs()
-            self.log.warning(
-                f"Scheduler already exists on bot startup with the following job(s): {sch_jobs}"
-            )
-            # Remove all jobs and shut down so we can start fresh
-            for x in sch_jobs:
-                x.remove()
-            try:
-                self.bot.SCHEDULER.shutdown()
-            except SchedulerNotRunningError as e:
-                self.log.debug(f"Could not shut down scheduler because: {e}")
-
-        self.bot.SCHEDULER = BackgroundScheduler(
-            timezone=tzlocal.get_localzone()
-            if str(tzlocal.get_localzone()) != "local"
-            else "America/New_York"
-        )
-        self.bot.SCHEDULER.start()
+        # Scheduled jobs run on the shared redball scheduler, in a job group
+        # for this bot that is cleared when the bot stops
+        self.bot.SCHEDULER.remove_all_jobs()
 
         self.bot.detailedState = {
             "summary": {
@@ -6215,11 +6250,19 @@ class Bot(object):
         else:
             self.log.debug("Building of tables complete. Results: {}".format(results))
 
+        rbdb.ensure_indexes(prefix=self.dbTablePrefix, logg=self.log)
+
         return True
 
     def refresh_settings(self):
+        settings, changed = self.bot.get_config_changes(self.settings)
+        if not changed:
+            self.log.debug("Settings have not changed since last refresh")
+            return
+
+        self.log.debug("Settings changed in categories: {}".format(changed))
         self.prevSettings = self.settings
-        self.settings = self.bot.get_config()
+        self.settings = settings
         if self.prevSettings["Logging"] != self.settings["Logging"]:
             # reload logger
             self.log = logger.init_logger(
@@ -6334,25 +6377,18 @@ class Bot(object):
                 self.log.info("It's a brand new day!")
                 break
             else:
-                i = 0
-                while True:
-                    if redball.SIGNAL is None and not self.bot.STOP:
-                        i += 1
-                        if today != datetime.today().strftime("%Y-%m-%d"):
-                            break
-                        elif i == 600:
-                            self.log.info("Still waiting for the next day...")
-                            break
-                        time.sleep(1)
-                    else:
-                        break
+                # Sleep until midnight, checking in every 10 minutes
+                midnight = (datetime.today() + timedelta(days=1)).replace(
+                    hour=0, minute=0, second=0, microsecond=0
+                )
+                wait = (midnight - datetime.today()).total_seconds()
+                if not self.bot.sleep(min(wait, 600)) and wait > 600:
+                    self.log.info("Still waiting for the next day...")
 
     def sleep(self, t):
         # t = total number of seconds to sleep before returning
-        i = 0
-        while redball.SIGNAL is None and not self.bot.STOP and i < t:
-            i += 1
-            time.sleep(1)
+        # Returns early if the bot is stopped or woken
+        self.bot.sleep(t)
 
     def convert_timezone(self, dt, convert_to="America/New_York"):
         # dt = datetime object to convert, convert_to = timezone to convert to (e.g. 'America/New_York', or 'local' for local bot timezone)
@@ -14,7 +14,7 @@ import threading
 import time
 
 import redball
-from redball import logger
+from redball import database as rbdb, logger
 
 __version__ = "1.1.0.1"
 
@@ -72,8 +72,11 @@ class StatBot:
                 raise
 
         try:
-            self.db = sqlite3.connect(os.path.join(self.dbPath, self.dbFile))
+            self.db = rbdb.connect(
+                os.path.join(self.dbPath, self.dbFile), logg=self.log
+            )
             """Local sqlite database to store info about processed comments"""
+            self.db.row_factory = None
         except sqlite3.Error as e:
             self.log.error("Error connecting to database: {}".format(e))
             raise
@@ -810,7 +813,7 @@ class StatBot:
                         limits
                     )
                 )
-                time.sleep(60)
+                self.bot.sleep(60)
             else:
                 self.log.debug("Reddit API limits: {}".format(limits))
 
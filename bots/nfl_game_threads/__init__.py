@@ -4,8 +4,6 @@
 by Todd Roberts
 """
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.schedulers import SchedulerNotRunningError
 from copy import deepcopy
 from datetime import datetime, timedelta
 import json
@@ -83,27 +81,9 @@ class Bot(object):
         # Initialize Reddit API connection
         self.init_reddit()
 
-        # Initialize scheduler
-        if "SCHEDULER" in vars(self.bot):
-            # Scheduler already exists, maybe bot restarted
-            sch_jobs = self.bot.SCHEDULER.get_jobs()
-            self.log.warning(
-                f"Scheduler already exists on bot startup with the following job(s): {sch_jobs}"
-            )
-            # Remove all jobs and shut down so we can start fresh
-            for x in sch_jobs:
-                x.remove()
-            try:
-                self.bot.SCHEDULER.shutdown()
-            except SchedulerNotRunningError as e:
-                self.log.debug(f"Could not shut down scheduler because: {e}")
-
-        self.bot.SCHEDULER = BackgroundScheduler(
-            timezone=tzlocal.get_localzone()
-            if str(tzlocal.get_localzone()) != "local"
-            else "America/New_York"
-        )
-        self.bot.SCHEDULER.start()
+        # Scheduled jobs run on the shared redball scheduler, in a job group
+        # for this bot that is cleared when the bot stops
+        self.bot.SCHEDULER.remove_all_jobs()
 
         self.bot.detailedState = {
             "summary": {
@@ -2683,11 +2663,19 @@ class Bot(object):
         else:
             self.log.debug("Building of tables complete. Results: {}".format(results))
 
+        rbdb.ensure_indexes(prefix=self.dbTablePrefix, logg=self.log)
+
         return True
 
     def refresh_settings(self):
+        settings, changed = self.bot.get_config_changes(self.settings)
+        if not changed:
+            self.log.debug("Settings have not changed since last refresh")
+            return
+
+        self.log.debug("Settings changed in categories: {}".format(changed))
         self.prevSettings = self.settings
-        self.settings = self.bot.get_config()
+        self.settings = settings
         if self.prevSettings["Logging"] != self.settings["Logging"]:
             # reload logger
             self.log = logger.init_logger(
@@ -2806,25 +2794,18 @@ class Bot(object):
                 self.log.info("It's a brand new day!")
                 break
             else:
-                i = 0
-                while True:
-                    if redball.SIGNAL is None and not self.bot.STOP:
-                        i += 1
-                        if today != datetime.today().strftime("%Y-%m-%d"):
-                            break
-                        elif i == 600:
-                            self.log.info("Still waiting for the next day...")
-                            break
-                        time.sleep(1)
-                    else:
-                        break
+                # Sleep until midnight, checking in every 10 minutes
+                midnight = (datetime.today() + timedelta(days=1)).replace(
+                    hour=0, minute=0, second=0, microsecond=0
+                )
+                wait = (midnight - datetime.today()).total_seconds()
+                if not self.bot.sleep(min(wait, 600)) and wait > 600:
+                    self.log.info("Still waiting for the next day...")
 
     def sleep(self, t):
         # t = total number of seconds to sleep before returning
-        i = 0
-        while redball.SIGNAL is None and not self.bot.STOP and i < t:
-            i += 1
-            time.sleep(1)
+        # Returns early if the bot is stopped or woken
+        self.bot.sleep(t)
 
     def convert_timezone(self, dt, convert_to="America/New_York"):
         # dt = datetime object to convert, convert_to = timezone to convert to (e.g. 'America/New_York', or 'local' for local bot timezone)
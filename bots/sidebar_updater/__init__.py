@@ -2,8 +2,6 @@
 by Todd Roberts
 """
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.schedulers import SchedulerNotRunningError
 from datetime import datetime
 import json
 from mako.lookup import TemplateLookup
@@ -15,9 +13,7 @@ import re
 import requests
 import sys
 import threading
-import time
 import traceback
-import tzlocal
 
 import redball
 from redball import logger
@@ -66,27 +62,9 @@ class SidebarUpdaterBot:
         # Initialize Reddit API connection
         self.init_reddit()
 
-        # Initialize scheduler
-        if "SCHEDULER" in vars(self.bot):
-            # Scheduler already exists, maybe bot restarted
-            sch_jobs = self.bot.SCHEDULER.get_jobs()
-            self.log.warning(
-                f"Scheduler already exists on bot startup with the following job(s): {sch_jobs}"
-            )
-            # Remove all jobs and shut down so we can start fresh
-            for x in sch_jobs:
-                x.remove()
-            try:
-                self.bot.SCHEDULER.shutdown()
-            except SchedulerNotRunningError as e:
-                self.log.debug(f"Could not shut down scheduler because: {e}")
-
-        self.bot.SCHEDULER = BackgroundScheduler(
-            timezone=tzlocal.get_localzone()
-            if str(tzlocal.get_localzone()) != "local"
-            else "America/New_York"
-        )
-        self.bot.SCHEDULER.start()
+        # Scheduled jobs run on the shared redball scheduler, in a job group
+        # for this bot that is cleared when the bot stops
+        self.bot.SCHEDULER.remove_all_jobs()
 
         self.bot.detailedState = {
             "summary": {
@@ -322,15 +300,10 @@ class SidebarUpdaterBot:
     def shutdown(self):
         if "SCHEDULER" in vars(self.bot):
             sch_jobs = self.bot.SCHEDULER.get_jobs()
-            # Remove all jobs and shut down the scheduler
+            # Remove all jobs; the scheduler itself is shared
             for x in sch_jobs:
                 self.log.debug(f"Removing scheduled job [{x.name}]")
                 x.remove()
-            try:
-                self.log.debug("Shutting down scheduler...")
-                self.bot.SCHEDULER.shutdown()
-            except SchedulerNotRunningError as e:
-                self.log.debug(f"Could not shut down scheduler because: {e}")
         self.bot.STOP = True
         self.bot.detailedState = {
             "summary": {
@@ -343,10 +316,8 @@ class SidebarUpdaterBot:
 
     def sleep(self, t):
         # t = total number of seconds to sleep before returning
-        i = 0
-        while redball.SIGNAL is None and not self.bot.STOP and i < t:
-            i += 1
-            time.sleep(1)
+        # Returns early if the bot is stopped or woken
+        self.bot.sleep(t)
 
     def update_new_reddit_standings(
         self, my_team, standings, team_subs, all_teams, current_week=None
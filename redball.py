@@ -5,14 +5,14 @@ Created by Todd Roberts
 https://github.com/toddrob99/redball
 """
 
-from apscheduler.schedulers.background import BackgroundScheduler
 import os
 import sys
 import signal
 import threading
-import tzlocal
+import time
 
-import redball
+startTime = time.time()
+import redball  # noqa: E402
 
 signal.signal(signal.SIGINT, redball.signal_handler)
 signal.signal(signal.SIGTERM, redball.signal_handler)
@@ -77,6 +77,7 @@ if __name__ == "__main__":
         help="Specify path where log files should be stored (default is /logs relative to redball.py).",
     )
     args = parser.parse_args()
+    redball.startup_phase("import", since=startTime)
 
     # Read config and re-initialize logging
     redball.startup(
@@ -108,19 +109,22 @@ if __name__ == "__main__":
         target=redball.overwatch, name="rb-overwatch", daemon=True
     )
     redball.OVERWATCH_THREAD.start()
+    redball.startup_phase("web server")
 
-    # Set up task scheduler
-    redball.SCHEDULER = BackgroundScheduler(
-        timezone=tzlocal.get_localzone()
-        if str(tzlocal.get_localzone()) != "local"
-        else "America/New_York"
-    )
-    redball.SCHEDULER.start()
+    # Set up task scheduler, shared with the bots
+    from redball import scheduler
+
+    scheduler.get_scheduler()
 
     # Schedule task to back up DB
     from redball import database
 
     redball.SCHEDULER.add_job(database.backup_database, "cron", hour=3, minute=33)
 
+    # Schedule task to prune old bot history ahead of the backup
+    redball.SCHEDULER.add_job(database.prune_history, "cron", hour=3, minute=3)
+    redball.startup_phase("scheduler")
+    redball.log_startup_times()
+
     # And now we wait for a signal to exit
     redball.stay_alive()
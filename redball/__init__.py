@@ -7,6 +7,7 @@ https://github.com/toddrob99/redball
 
 import argparse
 import cherrypy
+import multiprocessing
 import os
 import sys
 import threading
@@ -91,28 +92,57 @@ logSettings = {
     "LOG_RETENTION": 7,
     "FILE_LOG_LEVEL": "DEBUG",
 }
-log = logger.init_logger(
-    logger_name="",
-    log_to_console=logSettings["LOG_TO_CONSOLE"],
-    log_to_file=logSettings["LOG_TO_FILE"],
-    log_path=LOG_PATH,
-    log_file="redball.log",
-    file_log_level=logSettings["FILE_LOG_LEVEL"],
-    log_retention=logSettings["LOG_RETENTION"],
-    console_log_level=logSettings["CONSOLE_LOG_LEVEL"],
-    clear_first=True,
-)
+# Bot processes (see botprocess.py) import redball before
+# multiprocessing.parent_process() is set, but after they are named
+if multiprocessing.current_process().name == "MainProcess":
+    log = logger.init_logger(
+        logger_name="",
+        log_to_console=logSettings["LOG_TO_CONSOLE"],
+        log_to_file=logSettings["LOG_TO_FILE"],
+        log_path=LOG_PATH,
+        log_file="redball.log",
+        file_log_level=logSettings["FILE_LOG_LEVEL"],
+        log_retention=logSettings["LOG_RETENTION"],
+        console_log_level=logSettings["CONSOLE_LOG_LEVEL"],
+        clear_first=True,
+    )
+else:
+    # Records go to the parent's handlers, so don't open a second handler
+    # on redball.log
+    log = logger.get_logger(logger_name="", log_level="DEBUG")
 
 WEB_THREAD = None
 OVERWATCH_THREAD = None
 SCHEDULER = None
-DB_LOCK = threading.Lock()
+DB_LOCK = threading.RLock()
 HTTPS_SERVER = None
 LOGGED_IN_USERS = {}
 SIGNAL = None
+# Set along with SIGNAL, for loops that wait on shutdown
+SHUTDOWN = threading.Event()
 DEV = False
 BOTS = {}
 REDDIT_AUTH_LOCKS = {}
+# Seconds spent in each phase of startup, in order
+STARTUP_TIMES = {}
+STARTUP_MARK = time.time()
+
+
+def startup_phase(name, since=None):
+    # Record the time since the previous phase ended (or since `since`)
+    global STARTUP_MARK
+    now = time.time()
+    STARTUP_TIMES.update({name: now - (since or STARTUP_MARK)})
+    STARTUP_MARK = now
+
+
+def log_startup_times():
+    log.info(
+        "Startup took {:.2f}s: {}".format(
+            sum(STARTUP_TIMES.values()),
+            ", ".join("{} {:.2f}s".format(k, v) for k, v in STARTUP_TIMES.items()),
+        )
+    )
 
 
 def startup(suppress_bots=False, dev=False, data_path=None, log_path=None):
@@ -137,6 +167,8 @@ def startup(suppress_bots=False, dev=False, data_path=None, log_path=None):
 
     # Initialize the DB
     database.validate_db()
+    database.configure()
+    startup_phase("database")
 
     # Re-initialize logger if settings are different than defaults (most likely the case)
     updated = False
@@ -200,31 +232,39 @@ def startup(suppress_bots=False, dev=False, data_path=None, log_path=None):
         clear_first=True,
     )
 
+    startup_phase("logging")
+
     # Create locks for reddit authorization refresh token updates
     for a in config.get_redditAuths():
         REDDIT_AUTH_LOCKS.update({str(a["id"]): threading.Lock()})
 
-    # Load bot settings
-    for b in database.db_qry(
-        "SELECT id FROM rb_bots ORDER BY id ASC;", closeAfter=True
-    ):
-        BOTS.update({str(b["id"]): bot.Bot(botId=b["id"])})
+    # Load bot settings, all in one query
+    for b in bot.get_bots(fields=bot.BOT_COLUMNS):
+        BOTS.update({str(b["id"]): bot.Bot(botInfo=b)})
 
     log.debug("BOTS: {}".format(BOTS))
+    startup_phase("load bots")
 
     # Start bot threads
     if suppress_bots:
         log.info("Suppressing bot auto-run per command line argument.")
 
+    autoRun = []
     for b in BOTS.values():
+        b.thread = None
         if b.autoRun == "True":
             if suppress_bots:
                 b.STOP = True
-                b.thread = None
             else:
-                b.start()
-        else:
-            b.thread = None
+                autoRun.append(b)
+
+    if autoRun:
+        # The launcher starts them in the background, soonest work first and
+        # a few at a time, so startup doesn't wait on them
+        log.debug("Queueing {} auto-run bot(s) to launch.".format(len(autoRun)))
+        bot.queue_launch(autoRun)
+
+    startup_phase("queue bots")
 
     return True
 
@@ -235,16 +275,25 @@ def overwatch():
         if SIGNAL is None:
             # Start any autoRun=True bots that are not running
             # Leave the bot stopped if it was manually stopped or suppressed
-            for b in BOTS.values():
-                if b.autoRun == "True" and not b.isRunning() and not b.STOP:
+            revive = []
+            for b in list(BOTS.values()):
+                if (
+                    b.autoRun == "True"
+                    and not b.isRunning()
+                    and not b.STOP
+                    and not bot.is_queued(b)
+                ):
                     log.info(
-                        "Bot {} (id={}) is not running but autoRun is enabled. Starting the bot...".format(
+                        "Bot {} (id={}) is not running but autoRun is enabled. Queueing the bot to start...".format(
                             b.name, b.id
                         )
                     )
-                    b.start()
+                    revive.append(b)
 
-            time.sleep(5)
+            if revive:
+                bot.queue_launch(revive)
+
+            SHUTDOWN.wait(5)
         else:
             log.debug("Overwatch exiting...")
             break
@@ -252,18 +301,21 @@ def overwatch():
 
 def stay_alive():
     global SIGNAL
+    # Signals don't interrupt waits on Windows, so wake up every second
+    # there to give the signal handler a chance to run
+    interval = 1 if sys.platform == "win32" else 600
     i = 0
     while True:
         if SIGNAL is None:
             try:
-                i = i + 1
-                if i == 600:
+                SHUTDOWN.wait(interval)
+                i = i + interval
+                if i >= 600:
                     log.debug("Still alive...")
                     i = 0
-
-                time.sleep(1)
             except (KeyboardInterrupt, SystemExit):
                 SIGNAL = "shutdown"
+                SHUTDOWN.set()
         else:
             shutdown(SIGNAL)
 
@@ -272,6 +324,7 @@ def signal_handler(signal=None, frame=None):
     global SIGNAL
     if signal is not None:
         SIGNAL = signal
+        SHUTDOWN.set()
         # log.info('Received signal {}...'.format(signal))
         shutdown(signal)
 
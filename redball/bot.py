@@ -3,18 +3,80 @@
 import importlib
 import json
 import os
+import random
 import threading
+import time
 
 import redball
-from redball import config, database, logger, user
+from redball import config, database, logger, scheduler, user
 
 log = logger.get_logger(logger_name="redball.bots", log_level="DEBUG", propagate=True)
 
+BOT_EVENTS = {"seq": 0, "bots": {}}
+"""Last published status and detailed state summary per bot id, each with the
+sequence number of the change that produced it"""
+BOT_EVENTS_CONDITION = threading.Condition()
+BOT_COLUMNS = ["id", "name", "botType", "redditAuth", "autoRun"]
+BOT_FIELDS = BOT_COLUMNS + ["status", "detailedState"]
+BOT_SUMMARY_FIELDS = ["id", "name", "status"]
+"""Fields for lightweight bot listings (e.g. for monitoring)"""
+RESTART_TIMEOUT = 60
+LAUNCH_QUEUE = []
+"""Auto-run bots waiting to be started by the launcher, soonest work first"""
+LAUNCH_CONDITION = threading.Condition()
+LAUNCH_STATE = {"thread": None, "next": 0, "starting": 0}
+LAUNCH_DEFAULTS = {"LAUNCH_CONCURRENCY": 4, "LAUNCH_SPACING": 5, "LAUNCH_JITTER": 5}
+LAUNCH_READY_TIMEOUT = 120
+"""Seconds a launched bot counts against LAUNCH_CONCURRENCY if it never
+reports its state or sleeps"""
+
+
+def publish_status(b, running=None):
+    # Record a bot's status and detailed state summary, and wake up
+    # anyone waiting in get_status_changes() if either changed
+    config.resource_changed("bots")
+    entry = {
+        "status": b.status(running),
+        "summary": b.detailedState["summary"] if b.detailedState else "",
+    }
+    with BOT_EVENTS_CONDITION:
+        prev = BOT_EVENTS["bots"].get(str(b.id))
+        if (
+            prev
+            and prev["status"] == entry["status"]
+            and prev["summary"] == entry["summary"]
+        ):
+            return
+
+        BOT_EVENTS["seq"] += 1
+        entry["seq"] = BOT_EVENTS["seq"]
+        BOT_EVENTS["bots"][str(b.id)] = entry
+        BOT_EVENTS_CONDITION.notify_all()
+
+
+def get_status_changes(since, timeout=None):
+    # Wait up to timeout seconds for changes published after sequence number
+    # since, and return (current sequence number, {botId: entry})
+    with BOT_EVENTS_CONDITION:
+        BOT_EVENTS_CONDITION.wait_for(lambda: BOT_EVENTS["seq"] > since, timeout)
+        return (
+            BOT_EVENTS["seq"],
+            {k: v for k, v in BOT_EVENTS["bots"].items() if v["seq"] > since},
+        )
+
 
 class Bot(object):
     def __init__(self, botId=None, botInfo=None, create=False):
+        # STOP is backed by an event so sleep() returns as soon as it is set
+        self.stopEvent = threading.Event()
+        self.wakeCondition = threading.Condition()
+        self.wakeCount = 0
+        # Set once a started bot is past its startup (authenticating, first
+        # data pulls): it reported its state, went to sleep, or exited
+        self.readyEvent = threading.Event()
         self.STOP = False
-        self.detailedState = {"summary": {"text": "", "html": "", "markdown": ""}}
+        self._detailedState = {"summary": {"text": "", "html": "", "markdown": ""}}
+        self.configVersion = 0
         if botInfo:
             if create:
                 self.id = self.create_bot(
@@ -48,31 +110,57 @@ class Bot(object):
             redball.BOTS.pop(str(self.id))
         self.thread = None
 
+    @property
+    def STOP(self):
+        return self.stopEvent.is_set()
+
+    @STOP.setter
+    def STOP(self, value):
+        if value:
+            self.stopEvent.set()
+            self.wake()
+        else:
+            self.stopEvent.clear()
+
+    def wake(self):
+        # Return from any current sleep() calls early, e.g. after settings change
+        with self.wakeCondition:
+            self.wakeCount += 1
+            self.wakeCondition.notify_all()
+
+    def sleep(self, t):
+        # Sleep for up to t seconds. Returns True if the sleep was cut short
+        # by stop() or wake(), False if the full time elapsed.
+        self.readyEvent.set()
+        with self.wakeCondition:
+            wakeCount = self.wakeCount
+            return self.wakeCondition.wait_for(
+                lambda: self.wakeCount != wakeCount or self.stopEvent.is_set(), t
+            )
+
+    @property
+    def detailedState(self):
+        return self._detailedState
+
+    @detailedState.setter
+    def detailedState(self, value):
+        # Bots replace their detailed state periodically; let the web UI know
+        self._detailedState = value
+        self.readyEvent.set()
+        publish_status(self)
+
     def start(self):
         if self.isRunning():
             log.info("Bot {} (id={}) already running.".format(self.name, self.id))
+            dequeue_launch(self)
         else:
             botType = config.get_botTypes(self.botType)
-            try:
-                log.debug(
-                    "Attempting to import bot module: {}...".format(
-                        botType["moduleName"]
-                    )
-                )
-                self.botMod = importlib.import_module(
-                    "bots.{}".format(botType["moduleName"]), "redball"
-                )
-            except ImportError as e:
-                log.debug(
-                    "Failed to import from bots directory, trying global import... (Error: {})".format(
-                        e
-                    )
-                )
-                try:
-                    self.botMod = importlib.import_module(botType["moduleName"])
-                    log.debug("Successfully imported bot module.")
-                except Exception as e:
-                    log.error("Error importing global bot module: {}".format(e))
+            self.moduleName = botType["moduleName"]
+            self.runMode = botType.get("runMode") or "thread"
+            if self.runMode != "process":
+                # Process mode bots import their module in the child process
+                self.botMod = load_module(self.moduleName)
+                if not self.botMod:
                     return False
 
             log.info("Starting bot {} (id={}).".format(self.name, self.id))
@@ -81,21 +169,52 @@ class Bot(object):
                 self.redditAuth
             )
             self.thread = threading.Thread(
-                target=self.botMod.run,
-                args=(self, botArgs),
+                target=self.run_thread,
+                args=(botArgs,),
                 name="bot-{}-{}".format(self.id, self.name.replace(" ", "-")),
                 daemon=True,
             )
             self.STOP = False
+            self.readyEvent.clear()
             self.thread.start()
+            dequeue_launch(self)
+            publish_status(self, running=True)
 
         return True
 
+    def run_thread(self, botArgs):
+        # Bot thread target, so the web UI hears about the bot stopping and
+        # the bot's scheduled jobs don't outlive it
+        jobs = self.SCHEDULER = scheduler.JobGroup("bot-{}".format(self.id))
+        try:
+            if self.runMode == "process":
+                from redball import botprocess
+
+                botprocess.run(self, botArgs)
+            else:
+                self.botMod.run(self, botArgs)
+        finally:
+            self.readyEvent.set()
+            jobs.shutdown()
+            publish_status(self, running=False)
+
     def stop(self):
         if self.isRunning():
             log.info("Stopping bot {} (id={}).".format(self.name, self.id))
             self.STOP = True
             return True
+        elif cancel_launch(self):
+            log.info(
+                "Removed bot {} (id={}) from the launch queue.".format(
+                    self.name, self.id
+                )
+            )
+            self.STOP = True
+            publish_status(self)
+            return True
+        elif self.isRunning():
+            # The launcher started it while this was checking the queue
+            return self.stop()
         else:
             log.info(
                 "Received stop signal for {} bot {} (id={}) but bot is not running.".format(
@@ -104,6 +223,51 @@ class Bot(object):
             )
             return False
 
+    def restart(self, timeout=RESTART_TIMEOUT):
+        # Stop the bot, wait for its thread to exit, and start it again.
+        # A bot that was only queued to launch has no thread to wait for.
+        if self.stop() and self.thread:
+            self.thread.join(timeout)
+            if self.isRunning():
+                log.warning(
+                    "Bot {} (id={}) did not stop within {} seconds; not restarting.".format(
+                        self.name, self.id, timeout
+                    )
+                )
+                return False
+
+        return self.start()
+
+    def status(self, running=None):
+        if self.isRunning() if running is None else running:
+            return "Running"
+        elif is_queued(self):
+            return "Queued"
+        else:
+            return "Stopped"
+
+    def launch_priority(self):
+        # Seconds until the bot has work to do, from the bot module's optional
+        # launch_priority(bot, settings) function, or None if unknown.
+        # Process mode bot modules aren't imported into this process for it.
+        botType = config.get_botTypes(self.botType)
+        if (botType.get("runMode") or "thread") == "process":
+            return None
+
+        botMod = load_module(botType["moduleName"])
+        if not hasattr(botMod, "launch_priority"):
+            return None
+
+        try:
+            return botMod.launch_priority(self, self.get_config())
+        except Exception as e:
+            log.warning(
+                "Error getting launch priority for bot {} (id={}): {}".format(
+                    self.name, self.id, e
+                )
+            )
+            return None
+
     def isRunning(self):
         try:
             self.thread
@@ -159,62 +323,101 @@ class Bot(object):
         query = (q, local_args)
         result = database.db_qry(query, commit=True, closeAfter=True)
         if result in ["", []]:
+            authChanged = kwargs.get("redditAuth") and str(kwargs["redditAuth"]) != str(
+                self.redditAuth
+            )
+            # Refresh first, so a bot woken by the change rebuilds its auth
+            # config from the new redditAuth
             self.refresh_info()
+            if authChanged:
+                config.bot_config_changed(self.id, ["Reddit Auth", "Lemmy Auth"])
+
+            config.resource_changed("bots")
 
         return result
 
     def delete_bot(self):
-        con = database.get_con()
-        cur = database.get_cur(con)
-
-        queries = [
-            ("DELETE FROM rb_bots WHERE id=?;", (self.id,)),
-            ("DELETE FROM rb_botConfig WHERE botId=?;", (self.id,)),
-            (
-                "DELETE FROM rb_privileges WHERE privilege like 'rb_bot_{}_%';".format(
+        # Remove the bot, its config, privileges and tables in one transaction
+        result = None
+        with database.transaction(logg=log) as con:
+            cur = database.get_cur(con)
+            queries = [
+                ("DELETE FROM rb_bots WHERE id=?;", (self.id,)),
+                ("DELETE FROM rb_botConfig WHERE botId=?;", (self.id,)),
+                (
+                    "DELETE FROM rb_privileges WHERE privilege like 'rb_bot_{}_%';".format(
+                        self.id
+                    )
+                ),
+            ]
+            botConfigTables = database.db_qry(
+                "select name from sqlite_master where type='table' and name like 'rb_bot_{}_%';".format(
                     self.id
-                )
-            ),
-        ]
-        botConfigTables = database.db_qry(
-            "select name from sqlite_master where type='table' and name like 'rb_bot_{}_%';".format(
-                self.id
-            ),
-            con=con,
-            cur=cur,
-            commit=False,
-            closeAfter=False,
-        )
-        if isinstance(botConfigTables, dict):
-            for v in botConfigTables.values():
-                queries.append(("DROP TABLE {};", (v,)))
+                ),
+                con=con,
+                cur=cur,
+            )
+            if isinstance(botConfigTables, list):
+                for t in botConfigTables:
+                    queries.append("DROP TABLE IF EXISTS {};".format(t["name"]))
+
+            result = database.db_qry(queries, con=con, cur=cur)
+            errors = [x for x in result if isinstance(x, str)]
+            if len(errors):
+                result = errors[0]
+                raise database.Rollback()
 
-        result = database.db_qry(queries, commit=True, closeAfter=True)
-        if isinstance(result, list):
             user.remove_privilege("rb_bot_{}_ro".format(self.id))
             user.remove_privilege("rb_bot_{}_startstop".format(self.id))
             user.remove_privilege("rb_bot_{}_rw".format(self.id))
+
+        if isinstance(result, list):
+            config.resource_changed("bots")
             self.__del__()
 
         return result
 
     def create_bot(self, name, botType, autoRun, redditAuth):
-        con = database.get_con()
-        cur = database.get_cur(con)
-
-        query = (
-            "INSERT INTO rb_bots (name,botType,autoRun,redditAuth) values (?,?,?,?);",
-            (name, botType, autoRun, redditAuth),
+        # Load default settings before taking the database lock
+        botTypeInfo = config.get_botTypes(botType)
+        defaultSettingsFile = os.path.join(
+            redball.BOT_PATH, f"{botTypeInfo['moduleName']}_config.json"
+        )
+        log.debug(
+            f"Default settings file for botType {botTypeInfo['name']}: {defaultSettingsFile}"
         )
-        result = database.db_qry(query, con=con, cur=cur)
-        if isinstance(result, str) and result.find("ERROR") != -1:
-            con.commit()
-            con.close()
-            return result
+        defaultSettings = {}
+        if os.path.isfile(defaultSettingsFile):
+            try:
+                with open(defaultSettingsFile) as f:
+                    defaultSettings = json.load(f)
+            except Exception as e:
+                log.error(
+                    f"Error occurred while loading default config for [{botTypeInfo['description']}] bot type from json file [{defaultSettingsFile}]: {e}."
+                )
+                defaultSettings = {}
+
+            if not len(defaultSettings):
+                log.debug(
+                    f"No default settings found in the json file for botType {botTypeInfo['name']}."
+                )
         else:
-            insert_id = database.db_qry(
-                "SELECT last_insert_rowid() as id;", con=con, cur=cur
-            )[0]["id"]
+            log.warning(
+                f"No default settings json file found for [{botTypeInfo['description']}] bot type."
+            )
+
+        # Bot, default settings and privileges are inserted in one transaction
+        with database.transaction(logg=log) as con:
+            cur = database.get_cur(con)
+            query = (
+                "INSERT INTO rb_bots (name,botType,autoRun,redditAuth) values (?,?,?,?);",
+                (name, botType, autoRun, redditAuth),
+            )
+            result = database.db_qry(query, con=con, cur=cur)
+            if isinstance(result, str) and result.find("ERROR") != -1:
+                return result
+
+            insert_id = cur.lastrowid
             log.info(
                 "Created bot with id: {}. Inserting default settings...".format(
                     insert_id
@@ -228,80 +431,76 @@ class Bot(object):
 
             config.add_default_bot_config(insert_id, con, cur)
 
-            botTypeInfo = config.get_botTypes(botType)
-            defaultSettingsFile = os.path.join(
-                redball.BOT_PATH, f"{botTypeInfo['moduleName']}_config.json"
-            )
-            log.debug(
-                f"Default settings file for botType {botTypeInfo['name']}: {defaultSettingsFile}"
-            )
-            if os.path.isfile(defaultSettingsFile):
-                try:
-                    with open(defaultSettingsFile) as f:
-                        defaultSettings = json.load(f)
-                except Exception as e:
-                    log.error(
-                        f"Error occurred while loading default config for [{botTypeInfo['description']}] bot type from json file [{defaultSettingsFile}]: {e}."
-                    )
-                    defaultSettings = {}
-
-                if len(defaultSettings):
-                    log.debug(
-                        f"Loaded default settings for botType {botTypeInfo['name']}: {defaultSettings}. Adding to bot {insert_id}..."
-                    )
-                    result = config.add_bot_config(
-                        botId=insert_id,
-                        multi=defaultSettings,
-                        replace=True,
-                        con=con,
-                        cur=cur,
-                        commit=False,
-                        closeAfter=False,
-                    )
-                else:
-                    log.debug(
-                        f"No default settings found in the json file for botType {botTypeInfo['name']}."
-                    )
-            else:
-                log.warning(
-                    f"No default settings json file found for [{botTypeInfo['description']}] bot type."
+            if len(defaultSettings):
+                log.debug(
+                    f"Loaded default settings for botType {botTypeInfo['name']}: {defaultSettings}. Adding to bot {insert_id}..."
+                )
+                config.add_bot_config(
+                    botId=insert_id,
+                    multi=defaultSettings,
+                    replace=True,
+                    con=con,
+                    cur=cur,
+                    commit=False,
+                    closeAfter=False,
                 )
 
             # Create privileges and grant to creator
-            q = """INSERT INTO rb_privileges ('privilege', 'description')
-                VALUES
-                ('rb_bot_{}_ro', 'Read-only access to bot id {}.'),
-                ('rb_bot_{}_startstop', 'Access to start and stop bot id {}.'),
-                ('rb_bot_{}_rw', 'Full access to bot id {}.')
-            ;""".format(
-                insert_id, insert_id, insert_id, insert_id, insert_id, insert_id
+            database.bulk_insert(
+                "rb_privileges",
+                ("privilege", "description"),
+                [
+                    (
+                        "rb_bot_{}_ro".format(insert_id),
+                        "Read-only access to bot id {}.".format(insert_id),
+                    ),
+                    (
+                        "rb_bot_{}_startstop".format(insert_id),
+                        "Access to start and stop bot id {}.".format(insert_id),
+                    ),
+                    (
+                        "rb_bot_{}_rw".format(insert_id),
+                        "Full access to bot id {}.".format(insert_id),
+                    ),
+                ],
+                con=con,
+                cur=cur,
+                logg=log,
             )
-            database.db_qry(q, con=con, cur=cur)
-
-            con.commit()
-            con.close()
 
-            return insert_id
+        config.resource_changed("bots")
+        return insert_id
 
-    def get_config(self):
-        redditInfo = config.get_redditAuths(self.redditAuth)
+    def get_config(self, categories=None):
+        # Build the settings dict passed to the bot, optionally limited to
+        # some categories. Records the config version it was built from.
+        self.configVersion = self.config_version()
         cfg = {
             "Database": {
                 "dbPath": redball.DB_PATH,
                 "dbFile": redball.DB_FILE,
                 "dbTablePrefix": "rb_bot_{}_".format(self.id),
             },
-            "Reddit Auth": {
-                "reddit_clientId": redditInfo["reddit_appId"],
-                "reddit_clientSecret": redditInfo["reddit_appSecret"],
-            },
-            "Lemmy Auth": {
-                "lemmy_username": redditInfo["reddit_appId"],
-                "lemmy_password": redditInfo["reddit_appSecret"],
-                "lemmy_instance": redditInfo["reddit_refreshToken"]
-            }
         }
+        if not categories or {"Reddit Auth", "Lemmy Auth"} & set(categories):
+            redditInfo = config.get_redditAuths(self.redditAuth)
+            cfg.update(
+                {
+                    "Reddit Auth": {
+                        "reddit_clientId": redditInfo["reddit_appId"],
+                        "reddit_clientSecret": redditInfo["reddit_appSecret"],
+                    },
+                    "Lemmy Auth": {
+                        "lemmy_username": redditInfo["reddit_appId"],
+                        "lemmy_password": redditInfo["reddit_appSecret"],
+                        "lemmy_instance": redditInfo["reddit_refreshToken"]
+                    }
+                }
+            )
         for x in (x for x in config.get_bot_config(self.id)):
+            if categories and x.get("category") not in categories:
+                continue
+
             if x.get("category", "Default") not in cfg.keys():
                 cfg.update({x.get("category", "Default"): {}})
 
@@ -309,9 +508,287 @@ class Bot(object):
 
         return cfg
 
+    def get_config_changes(self, settings):
+        # Returns (settings, changed categories) given the settings from the
+        # last get_config() call. Only a version comparison if nothing changed.
+        if self.config_version() == self.configVersion:
+            return settings, set()
+
+        changed = self.config_changes(self.configVersion)
+        if changed is None:
+            newSettings = self.get_config()
+            changed = set(
+                k
+                for k in set(settings) | set(newSettings)
+                if settings.get(k) != newSettings.get(k)
+            )
+            return newSettings, changed
+
+        newSettings = {
+            k: v for k, v in settings.items() if k not in changed or k == "Database"
+        }
+        newSettings.update(self.get_config(categories=changed))
+        return newSettings, changed
+
+    def config_version(self):
+        return config.get_bot_config_version(self.id)
+
+    def config_changes(self, since):
+        return config.get_bot_config_changes(self.id, since)
+
+
+def load_module(moduleName):
+    # Import a bot module from the bots directory, or globally
+    try:
+        log.debug("Attempting to import bot module: {}...".format(moduleName))
+        return importlib.import_module("bots.{}".format(moduleName), "redball")
+    except ImportError as e:
+        log.debug(
+            "Failed to import from bots directory, trying global import... (Error: {})".format(
+                e
+            )
+        )
+        try:
+            botMod = importlib.import_module(moduleName)
+            log.debug("Successfully imported bot module.")
+            return botMod
+        except Exception as e:
+            log.error("Error importing global bot module: {}".format(e))
+            return None
+
+
+def get_launch_settings():
+    cfg = {x["key"]: x["val"] for x in config.get_sys_config(category="Bots")}
+    return {k: cfg.get(k, v) for k, v in LAUNCH_DEFAULTS.items()}
+
+
+def queue_launch(bots):
+    # Queue bots for the launcher, which starts them soonest work first, a
+    # few at a time with jittered spacing, so a mass start doesn't hit Reddit
+    # and the sports data APIs all at once. Bots that are stopping are
+    # started again once they stop. Returns the bots that were added.
+    with LAUNCH_CONDITION:
+        queued = set(e["bot"].id for e in LAUNCH_QUEUE)
+        added = [b for b in bots if b.id not in queued]
+        for b in added:
+            LAUNCH_QUEUE.append(
+                {"bot": b, "priority": None, "ranked": False, "queued": time.time()}
+            )
+
+        # The launcher clears its thread under LAUNCH_CONDITION once the
+        # queue is empty, so a thread that's still finishing up isn't counted
+        if added and not LAUNCH_STATE["thread"]:
+            LAUNCH_STATE["thread"] = threading.Thread(
+                target=run_launcher, name="bot-launcher", daemon=True
+            )
+            LAUNCH_STATE["thread"].start()
+
+        LAUNCH_CONDITION.notify_all()
+
+    for b in added:
+        publish_status(b)
+
+    return added
+
+
+def is_queued(b):
+    with LAUNCH_CONDITION:
+        return any(e["bot"].id == b.id for e in LAUNCH_QUEUE)
 
-def get_bots(botId=None):
-    query = "SELECT * FROM rb_bots WHERE 1=1"
+
+def dequeue_launch(b):
+    # Take the bot out of the launch queue; returns its entry, if it had one
+    with LAUNCH_CONDITION:
+        entry = next((e for e in LAUNCH_QUEUE if e["bot"].id == b.id), None)
+        if entry:
+            LAUNCH_QUEUE.remove(entry)
+
+    return entry
+
+
+def cancel_launch(b):
+    # Take the bot out of the launch queue, and keep the launcher from
+    # starting it if it's already on its way; returns False if it wasn't queued
+    with LAUNCH_CONDITION:
+        entry = dequeue_launch(b)
+        if entry:
+            entry["cancelled"] = True
+
+    return entry is not None
+
+
+def get_launch_queue():
+    # Queued bots in launch order, with estimated launch times
+    settings = get_launch_settings()
+    interval = float(settings["LAUNCH_SPACING"]) + float(settings["LAUNCH_JITTER"]) / 2
+    eta = max(LAUNCH_STATE["next"], time.time())
+    queue = []
+    with LAUNCH_CONDITION:
+        for e in sorted(
+            LAUNCH_QUEUE, key=lambda e: (not e.get("starting"), launch_order(e))
+        ):
+            queue.append(
+                {
+                    "id": e["bot"].id,
+                    "name": e["bot"].name,
+                    "priority": e["priority"],
+                    "queued": e["queued"],
+                    "starting": e.get("starting", False),
+                    "eta": time.time() if e.get("starting") else eta,
+                }
+            )
+            if not e.get("starting"):
+                eta += interval
+
+    return queue
+
+
+def launch_order(e):
+    # Bots with work soonest first, then bots that can't tell, in queue order
+    return (e["priority"] is None, e["priority"] or 0, e["queued"])
+
+
+def run_launcher():
+    settings = get_launch_settings()
+    concurrency = max(1, int(settings["LAUNCH_CONCURRENCY"]))
+    spacing = max(0, float(settings["LAUNCH_SPACING"]))
+    jitter = max(0, float(settings["LAUNCH_JITTER"]))
+    log.debug(
+        "Launcher started with concurrency {}, spacing {}s and jitter {}s.".format(
+            concurrency, spacing, jitter
+        )
+    )
+
+    def launch(e):
+        b = e["bot"]
+        try:
+            with LAUNCH_CONDITION:
+                if e.get("cancelled"):
+                    # Stopped while waiting for this thread
+                    return
+
+            if b.isRunning() and b.STOP:
+                # Restarting; let it finish stopping first
+                b.thread.join(RESTART_TIMEOUT)
+                if b.isRunning():
+                    log.warning(
+                        "Bot {} (id={}) did not stop within {} seconds; not restarting.".format(
+                            b.name, b.id, RESTART_TIMEOUT
+                        )
+                    )
+                    return
+
+            b.start()
+            with LAUNCH_CONDITION:
+                cancelled = e.get("cancelled")
+
+            if cancelled:
+                # Stopped while starting; start() cleared STOP, so stop it now
+                b.stop()
+            elif b.isRunning():
+                # start() only starts the bot thread; authenticating and the
+                # first data pulls happen after that, so keep the bot's
+                # launch slot until it gets through them
+                deadline = time.time() + LAUNCH_READY_TIMEOUT
+                while (
+                    not b.readyEvent.wait(1)
+                    and time.time() < deadline
+                    and redball.SIGNAL is None
+                ):
+                    pass
+        except Exception as ex:
+            log.error("Error starting bot {} (id={}): {}".format(b.name, b.id, ex))
+        finally:
+            dequeue_launch(b)
+            publish_status(b)
+            with LAUNCH_CONDITION:
+                LAUNCH_STATE["starting"] -= 1
+                LAUNCH_CONDITION.notify_all()
+
+    launched = 0
+    started = time.time()
+    while redball.SIGNAL is None:
+        with LAUNCH_CONDITION:
+            waiting = [e for e in LAUNCH_QUEUE if not e.get("starting")]
+            if not waiting:
+                if not LAUNCH_QUEUE:
+                    LAUNCH_STATE["thread"] = None
+                    break
+
+                # Only bots still starting; wait for them to finish
+                LAUNCH_CONDITION.wait(1)
+                continue
+
+        ranked = sorted((e for e in waiting if e["ranked"]), key=launch_order)
+        unranked = [e for e in waiting if not e["ranked"]]
+        wait = LAUNCH_STATE["next"] - time.time()
+        if unranked and (
+            not ranked or wait > 0 or LAUNCH_STATE["starting"] >= concurrency
+        ):
+            # Rank bots one at a time, in queue order, while waiting for the
+            # next launch or a free slot. Bot modules may ask an external API when their
+            # next game is, so this spreads those calls out too, and bots
+            # that are already ranked don't wait for the rest.
+            unranked[0]["priority"] = unranked[0]["bot"].launch_priority()
+            unranked[0]["ranked"] = True
+            continue
+
+        if wait > 0:
+            # Wake up early for shutdown and newly queued bots
+            redball.SHUTDOWN.wait(min(wait, 1))
+            continue
+
+        with LAUNCH_CONDITION:
+            if LAUNCH_STATE["starting"] >= concurrency:
+                LAUNCH_CONDITION.wait(1)
+                continue
+
+            if ranked[0] not in LAUNCH_QUEUE:
+                # Started, stopped or deleted since the queue was checked
+                continue
+
+            ranked[0]["starting"] = True
+            LAUNCH_STATE["starting"] += 1
+
+        log.info(
+            "Launching bot {} (id={}){}.".format(
+                ranked[0]["bot"].name,
+                ranked[0]["bot"].id,
+                ""
+                if ranked[0]["priority"] is None
+                else ", work in {:.0f}s".format(ranked[0]["priority"]),
+            )
+        )
+        threading.Thread(
+            target=launch,
+            args=(ranked[0],),
+            name="bot-launch-{}".format(ranked[0]["bot"].id),
+            daemon=True,
+        ).start()
+        launched += 1
+        LAUNCH_STATE["next"] = time.time() + spacing + random.uniform(0, jitter)
+
+    with LAUNCH_CONDITION:
+        if LAUNCH_STATE["thread"] is threading.current_thread():
+            # Shutting down
+            LAUNCH_STATE["thread"] = None
+
+    log.info(
+        "Launcher finished: started {} bot(s) in {:.1f}s.".format(
+            launched, time.time() - started
+        )
+    )
+
+
+def get_bots(botId=None, fields=None, botFilter=None, limit=None, offset=0):
+    # fields: only include (and compute) these attributes; id is always included
+    # botFilter: function(botId) returning False for bots to leave out, which
+    # is applied before limit/offset
+    query = "SELECT {} FROM rb_bots WHERE 1=1".format(
+        ", ".join(["id"] + [x for x in BOT_COLUMNS if x != "id" and x in fields])
+        if fields
+        else "*"
+    )
     local_args = tuple()
     fetchone = False
     if botId:
@@ -327,37 +804,20 @@ def get_bots(botId=None):
         bots = database.db_qry(query, fetchone=fetchone)
 
     if isinstance(bots, list):
-        for bot in bots:
-            if redball.BOTS.get(str(bot["id"])):
-                bot.update(
-                    {
-                        "status": "Running"
-                        if redball.BOTS[str(bot["id"])].isRunning()
-                        else "Stopped"
-                    }
-                )
+        if botFilter:
+            bots = [x for x in bots if botFilter(x["id"])]
 
-            if (
-                redball.BOTS.get(str(bot["id"]))
-                and redball.BOTS[str(bot["id"])].detailedState
-            ):
-                bot.update(
-                    {"detailedState": redball.BOTS[str(bot["id"])].detailedState}
-                )
-    elif isinstance(bots, dict):
-        if redball.BOTS.get(str(bots["id"])):
-            bots.update(
-                {
-                    "status": "Running"
-                    if redball.BOTS[str(bots["id"])].isRunning()
-                    else "Stopped"
-                }
-            )
+        if limit is not None or offset:
+            bots = bots[offset : offset + limit if limit is not None else None]
+    elif not isinstance(bots, dict):
+        return bots
 
-        if (
-            redball.BOTS.get(str(bots["id"]))
-            and redball.BOTS[str(bots["id"])].detailedState
-        ):
-            bots.update({"detailedState": redball.BOTS[str(bots["id"])].detailedState})
+    for bot in bots if isinstance(bots, list) else [bots]:
+        b = redball.BOTS.get(str(bot["id"]))
+        if b and (not fields or "status" in fields):
+            bot.update({"status": b.status()})
+
+        if b and b.detailedState and (not fields or "detailedState" in fields):
+            bot.update({"detailedState": b.detailedState})
 
     return bots
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+# Runs a bot module in a child process instead of a thread in the redball
+# process, for bot types with runMode=process. The parent keeps a thread
+# per bot (so Bot.isRunning(), stop() and overwatch work the same way) that
+# relays STOP, wake(), detailed state and config change queries over a pipe,
+# and hands log records the child sends over a queue to the parent's handlers.
+
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+import redball
+from redball import bot, config, database, logger, scheduler
+
+log = logger.get_logger(
+    logger_name="redball.botprocess", log_level="DEBUG", propagate=True
+)
+
+POLL_INTERVAL = 0.5
+STOP_TIMEOUT = 60
+"""Seconds a bot process has to exit after STOP before it is terminated"""
+REQUEST_TIMEOUT = 30
+
+REQUESTS = {
+    "config_version": config.get_bot_config_version,
+    "config_changes": config.get_bot_config_changes,
+}
+"""Queries a bot process can make of the parent, called with the bot id"""
+
+
+class LogDispatcher(logging.Handler):
+    # Hand records from a bot process to the parent logger of the same name
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+def run(b, botArgs):
+    # Parent side, called from the bot's thread. Returns when the child exits.
+    ctx = multiprocessing.get_context("spawn")
+    conn, childConn = ctx.Pipe()
+    logQueue = ctx.Queue()
+    listener = logging.handlers.QueueListener(logQueue, LogDispatcher())
+    settings = {
+        "name": threading.current_thread().name,
+        "botInfo": {
+            "id": b.id,
+            "name": b.name,
+            "botType": b.botType,
+            "autoRun": b.autoRun,
+            "redditAuth": b.redditAuth,
+        },
+        "moduleName": b.moduleName,
+        "configVersion": b.configVersion,
+        "DEV": redball.DEV,
+        "LOG_PATH": redball.LOG_PATH,
+        "DB_PATH": redball.DB_PATH,
+        "DB_FILE": redball.DB_FILE,
+        "logLevels": {
+            k: v.level
+            for k, v in logging.root.manager.loggerDict.items()
+            if isinstance(v, logging.Logger) and v.level
+        },
+    }
+    settings["logLevels"].update({"": logging.getLogger().level})
+    proc = ctx.Process(
+        target=run_child,
+        args=(childConn, logQueue, settings, botArgs),
+        name=settings["name"],
+        daemon=True,
+    )
+    listener.start()
+    proc.start()
+    childConn.close()
+    log.debug("Started process {} for bot {}.".format(proc.pid, settings["name"]))
+
+    stopped = None
+    exited = False
+    wakeCount = b.wakeCount
+    try:
+        while True:
+            if b.wakeCount != wakeCount and not b.STOP:
+                wakeCount = b.wakeCount
+                try:
+                    conn.send(("wake",))
+                except OSError:
+                    pass
+
+            if b.STOP and stopped is None:
+                stopped = time.time()
+                try:
+                    conn.send(("stop",))
+                except OSError:
+                    pass
+            elif stopped and time.time() - stopped > STOP_TIMEOUT:
+                log.warning(
+                    "Bot process {} did not exit within {} seconds of stop; terminating.".format(
+                        settings["name"], STOP_TIMEOUT
+                    )
+                )
+                break
+
+            try:
+                if not conn.poll(POLL_INTERVAL):
+                    continue
+
+                msg = conn.recv()
+            except (EOFError, OSError):
+                # Child closed its end of the pipe on the way out
+                exited = True
+                break
+
+            if msg[0] == "state":
+                b.detailedState = msg[1]
+            elif msg[0] == "request":
+                try:
+                    result = REQUESTS[msg[1]](b.id, *msg[2:])
+                except Exception as e:
+                    log.error(
+                        "Error answering {} request from bot process {}: {}".format(
+                            msg[1], settings["name"], e
+                        )
+                    )
+                    result = None
+
+                try:
+                    conn.send(("reply", result))
+                except OSError:
+                    # Child exited without waiting for the reply
+                    pass
+    finally:
+        proc.join(STOP_TIMEOUT if exited else 0)
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(STOP_TIMEOUT)
+
+        # Flushes records the child sent before it exited
+        listener.stop()
+        logQueue.close()
+        conn.close()
+
+    if proc.exitcode:
+        log.error(
+            "Bot process {} exited with code {}.".format(
+                settings["name"], proc.exitcode
+            )
+        )
+    else:
+        log.debug("Bot process {} exited.".format(settings["name"]))
+
+
+class ProcessBot(bot.Bot):
+    # Stands in for the parent's Bot object inside the child process
+    def __init__(self, conn, botInfo, configVersion):
+        super().__init__(botInfo=botInfo)
+        self.configVersion = configVersion
+        self.thread = None
+        self.conn = conn
+        self.sendLock = threading.Lock()
+        self.requestLock = threading.Lock()
+        self.replies = queue.Queue()
+        threading.Thread(target=self.listen, name="bot-pipe", daemon=True).start()
+
+    @property
+    def detailedState(self):
+        return self._detailedState
+
+    @detailedState.setter
+    def detailedState(self, value):
+        self._detailedState = value
+        self.send("state", value)
+
+    def send(self, *msg):
+        with self.sendLock:
+            try:
+                self.conn.send(msg)
+            except OSError:
+                # Parent is gone
+                self.STOP = True
+
+    def listen(self):
+        while True:
+            try:
+                msg = self.conn.recv()
+            except (EOFError, OSError):
+                # Parent is gone, so nobody is left to stop the bot
+                self.STOP = True
+                self.replies.put(None)
+                break
+
+            if msg[0] == "stop":
+                self.STOP = True
+            elif msg[0] == "wake":
+                self.wake()
+            elif msg[0] == "reply":
+                self.replies.put(msg[1])
+
+    def request(self, *msg):
+        # Returns None if the parent doesn't answer
+        with self.requestLock:
+            self.send("request", *msg)
+            try:
+                return self.replies.get(timeout=REQUEST_TIMEOUT)
+            except queue.Empty:
+                log.warning("No reply from redball for {} request.".format(msg[0]))
+                return None
+
+    def config_version(self):
+        version = self.request("config_version")
+        return self.configVersion if version is None else version
+
+    def config_changes(self, since):
+        # None (reload everything) if the parent didn't answer
+        return self.request("config_changes", since)
+
+
+def run_child(conn, logQueue, settings, botArgs):
+    # Child process entry point. Shutdown is driven by the parent through
+    # STOP, and a terminate() after STOP_TIMEOUT should not be caught.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    redball.DEV = settings["DEV"]
+    redball.LOG_PATH = settings["LOG_PATH"]
+    redball.DB_PATH = settings["DB_PATH"]
+    redball.DB_FILE = settings["DB_FILE"]
+
+    # Send everything that reaches the root logger to the parent (importing
+    # redball in a child process doesn't set up its handlers). Bot loggers
+    # have their own handlers and still write their log files from here.
+    rootLogger = logging.getLogger()
+    rootLogger.addHandler(logging.handlers.QueueHandler(logQueue))
+    for k, v in settings["logLevels"].items():
+        logging.getLogger(k).setLevel(v)
+
+    # Bots name their loggers and log files after the current thread
+    threading.current_thread().name = settings["name"]
+    database.configure()
+
+    b = ProcessBot(conn, settings["botInfo"], settings["configVersion"])
+    redball.REDDIT_AUTH_LOCKS.update({str(b.redditAuth): threading.Lock()})
+    b.reddit_auth_token_manager = config.RedditAuthDBTokenManager(b.redditAuth)
+    b.botMod = bot.load_module(settings["moduleName"])
+    if not b.botMod:
+        raise SystemExit(1)
+
+    b.SCHEDULER = scheduler.JobGroup("bot-{}".format(b.id))
+    try:
+        b.botMod.run(b, botArgs)
+    except Exception:
+        log.exception("Unhandled error in bot {}.".format(settings["name"]))
+        raise SystemExit(1)
+    finally:
+        b.SCHEDULER.shutdown()
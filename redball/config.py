@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 
+from contextlib import nullcontext
 import json
-import praw
 from threading import Lock
+import time
 import uuid
 
 import redball
@@ -11,50 +12,109 @@ from redball import database, logger
 log = logger.get_logger(logger_name="redball.config", log_level="DEBUG", propagate=True)
 
 
-def get_sys_config(category=None, key=None, includeChildren=False):
-    query = "SELECT * FROM rb_config WHERE 1=1"
-    local_args = tuple()
-    if category and key:
-        query += " AND (category=? AND key=?)"
-        local_args += (category, key)
-    elif category:
-        query += " AND category=?"
-        local_args += (category,)
-    elif key:
-        query += " AND key=?"
-        local_args += (key,)
+SYS_CONFIG_CACHE = {
+    "dbFile": None,
+    "rows": None,
+    "index": {},
+    "hits": 0,
+    "misses": 0,
+    "generation": 0,
+}
+"""All rb_config rows, deserialized, plus an index by (category, key). The
+generation is bumped on every change, so a reload that overlapped one isn't
+installed."""
+SYS_CONFIG_LOCK = Lock()
+
+
+def load_sys_config():
+    # (Re)load rb_config into SYS_CONFIG_CACHE
+    generation = SYS_CONFIG_CACHE["generation"]
+    rows = database.db_qry(
+        "SELECT * FROM rb_config ORDER BY category ASC, key ASC;", rowType="row"
+    )
+    if isinstance(rows, str):
+        return rows
+
+    rows = [
+        dict(
+            c,
+            val=deserialize_key(c["val"], c["type"]),
+            options=deserialize_key(c["options"]),
+            subkeys=deserialize_key(c["subkeys"]),
+        )
+        for c in rows
+    ]
+    with SYS_CONFIG_LOCK:
+        SYS_CONFIG_CACHE["misses"] += 1
+        if SYS_CONFIG_CACHE["generation"] != generation:
+            # Changed while loading; the rows may be from before the change,
+            # so return them to this caller only
+            return rows
+
+        SYS_CONFIG_CACHE.update(
+            {
+                "dbFile": redball.DB_FILE,
+                "rows": rows,
+                "index": {(c["category"], c["key"]): c for c in rows},
+            }
+        )
 
-    if includeChildren and key:
-        query += " OR parent_key=?"
-        local_args += (key,)
+    return rows
 
-    query += " ORDER BY category ASC;"
 
-    if len(local_args):
-        config = database.db_qry((query, local_args))
-    else:
-        config = database.db_qry(query)
+def invalidate_sys_config():
+    # Next get_sys_config() call will reload from the database
+    with SYS_CONFIG_LOCK:
+        SYS_CONFIG_CACHE["generation"] += 1
+        SYS_CONFIG_CACHE.update({"rows": None, "index": {}})
 
-    # Deserialize val, options, and subkeys
-    if isinstance(config, list):
-        for c in config:
-            c.update(
-                {
-                    "val": deserialize_key(c["val"], c["type"]),
-                    "options": deserialize_key(c["options"]),
-                    "subkeys": deserialize_key(c["subkeys"]),
-                }
-            )
-    elif isinstance(config, dict):
-        config.update(
-            {
-                "val": deserialize_key(config["val"], config["type"]),
-                "options": deserialize_key(config["options"]),
-                "subkeys": deserialize_key(config["subkeys"]),
-            }
+
+def get_sys_config_cache_stats():
+    total = SYS_CONFIG_CACHE["hits"] + SYS_CONFIG_CACHE["misses"]
+    return {
+        "size": len(SYS_CONFIG_CACHE["index"]),
+        "hits": SYS_CONFIG_CACHE["hits"],
+        "misses": SYS_CONFIG_CACHE["misses"],
+        "hitRate": round(SYS_CONFIG_CACHE["hits"] / total, 4) if total else 0,
+    }
+
+
+def get_sys_config(category=None, key=None, includeChildren=False):
+    # Served from SYS_CONFIG_CACHE; returns copies so callers can modify them
+    rows = SYS_CONFIG_CACHE["rows"]
+    index = SYS_CONFIG_CACHE["index"]
+    if rows is None or SYS_CONFIG_CACHE["dbFile"] != redball.DB_FILE:
+        rows = load_sys_config()
+        if isinstance(rows, str):
+            return rows
+
+        # Not necessarily the rows in the cache, see load_sys_config()
+        index = {(c["category"], c["key"]): c for c in rows}
+    else:
+        # Not locked, so the count is approximate under heavy concurrency
+        SYS_CONFIG_CACHE["hits"] += 1
+
+    if category and key and not includeChildren:
+        c = index.get((category, key))
+        return [dict(c)] if c else []
+
+    return [
+        dict(c)
+        for c in rows
+        if (
+            (not category or c["category"] == category) and (not key or c["key"] == key)
         )
+        or (includeChildren and key and c["parent_key"] == key)
+    ]
 
-    return config
+
+def update_sys_config_cache(category, key, val):
+    # Write a new value through to SYS_CONFIG_CACHE
+    with SYS_CONFIG_LOCK:
+        SYS_CONFIG_CACHE["generation"] += 1
+        c = SYS_CONFIG_CACHE["index"].get((category, key))
+        if c:
+            c["val"] = deserialize_key(serialize_key(val), c["type"])
 
 
 def serialize_key(key):
@@ -78,6 +138,7 @@ def deserialize_key(key, dataType=None):
 
 def update_config(data):
     if isinstance(data, list):
+        updated = []
         con = database.get_con()
         cur = database.get_cur(con)
         for item in data:
@@ -94,11 +155,15 @@ def update_config(data):
                 "UPDATE rb_config SET val = ? WHERE category = ? and key = ?;",
                 (serialize_key(item["val"]), item["category"], item["key"]),
             )
-            log.debug(
-                "Result: {}".format(database.db_qry(query=query, con=con, cur=cur))
-            )
+            result = database.db_qry(query=query, con=con, cur=cur)
+            log.debug("Result: {}".format(result))
+            if not isinstance(result, str):
+                updated.append(item)
+
         con.commit()
         con.close()
+        for item in updated:
+            update_sys_config_cache(item["category"], item["key"], item["val"])
     else:
         if data.get("type") == "bool":
             data["val"] = (
@@ -115,11 +180,88 @@ def update_config(data):
             "UPDATE rb_config SET val = ? WHERE category = ? and key = ?;",
             (serialize_key(data["val"]), data["category"], data["key"]),
         )
-        database.db_qry(query, commit=True, closeAfter=True)
+        if not isinstance(database.db_qry(query, commit=True, closeAfter=True), str):
+            update_sys_config_cache(data["category"], data["key"], data["val"])
 
     return True
 
 
+RESOURCE_VERSIONS = {}
+"""Change counter and last modified time for bots, botTypes and redditAuths"""
+RESOURCE_LOCK = Lock()
+STARTUP_TIME = time.time()
+
+
+def resource_changed(name):
+    with RESOURCE_LOCK:
+        v = RESOURCE_VERSIONS.setdefault(name, {"version": 0})
+        v.update({"version": v["version"] + 1, "modified": time.time()})
+
+
+def get_resource_version(name):
+    # (version, last modified time); changes made before startup
+    # are reported as modified at startup
+    v = RESOURCE_VERSIONS.get(name, {})
+    return v.get("version", 0), v.get("modified", STARTUP_TIME)
+
+
+BOT_CONFIG_VERSIONS = {}
+"""Per-bot config version and recent change events, keyed by str(botId)"""
+BOT_CONFIG_LOCK = Lock()
+MAX_BOT_CONFIG_CHANGES = 50
+
+
+def bot_config_changed(botId, categories=None):
+    # Bump the bot's config version and record which categories changed
+    # categories=None means the change could touch anything (full reload)
+    with BOT_CONFIG_LOCK:
+        v = BOT_CONFIG_VERSIONS.setdefault(str(botId), {"version": 0, "changes": []})
+        v["version"] += 1
+        v["modified"] = time.time()
+        v["changes"].append(
+            (v["version"], set(categories) if categories is not None else None)
+        )
+        del v["changes"][:-MAX_BOT_CONFIG_CHANGES]
+        version = v["version"]
+
+    log.debug(
+        "Bot id {} config version {}, changed categories: {}".format(
+            botId, version, categories if categories is not None else "all"
+        )
+    )
+    # Let the bot pick up the change now rather than after its current sleep
+    b = redball.BOTS.get(str(botId))
+    if b:
+        b.wake()
+
+    return version
+
+
+def get_bot_config_version(botId, modified=False):
+    # Current config version for the bot, or (version, last modified time)
+    v = BOT_CONFIG_VERSIONS.get(str(botId))
+    if modified:
+        return (v["version"], v["modified"]) if v else (0, STARTUP_TIME)
+
+    return v["version"] if v else 0
+
+
+def get_bot_config_changes(botId, since):
+    # Categories changed after version `since`
+    # Returns None if that can't be determined and everything should be reloaded
+    with BOT_CONFIG_LOCK:
+        v = BOT_CONFIG_VERSIONS.get(str(botId))
+        if not v or v["version"] <= since:
+            return set()
+
+        changes = [c for n, c in v["changes"] if n > since]
+        if len(changes) < v["version"] - since or None in changes:
+            # Older changes were trimmed from the log, or one was not categorized
+            return None
+
+        return set().union(*changes)
+
+
 def get_bot_config(
     botId,
     category=None,
@@ -151,26 +293,25 @@ def get_bot_config(
 
     query += " ORDER BY category ASC;"
 
-    if len(local_args):
-        config = database.db_qry((query, local_args))
-    else:
-        config = database.db_qry(query)
+    config = database.db_qry((query, local_args), rowType="row")
+    if isinstance(config, str):
+        return config
 
+    config = [
+        dict(
+            x,
+            val=deserialize_key(x["val"], x["type"]),
+            subkeys=deserialize_key(x["subkeys"]),
+            options=deserialize_key(x["options"]),
+        )
+        for x in config
+    ]
     if excludeSysFields:
         # Remove system fields
         for x in config:
             x.pop("read_only")
             x.pop("system")
 
-    for x in config:
-        x.update(
-            {
-                "val": deserialize_key(x["val"], x["type"]),
-                "subkeys": deserialize_key(x["subkeys"]),
-                "options": deserialize_key(x["options"]),
-            }
-        )
-
     sortedConfig = {}
     if sortByCategory:
         for cat in set(c["category"] for c in config):
@@ -195,7 +336,15 @@ def update_bot_config(botId, data):
     if isinstance(data, list):
         con = database.get_con()
         cur = database.get_cur(con)
+        categories = set()
+        errors = []
         for item in data:
+            # Updates by id alone don't say which category they touch
+            categories = (
+                categories.union([item["category"]])
+                if categories is not None and item.get("category")
+                else None
+            )
             if item.get("id"):
                 q = "UPDATE rb_botConfig SET"
                 local_args = tuple()
@@ -221,12 +370,19 @@ def update_bot_config(botId, data):
                     "UPDATE rb_botConfig SET val = ? WHERE category = ? and key = ? and botId=?;",
                     (serialize_key(item["val"]), item["category"], item["key"], botId),
                 )
-            log.debug(
-                "Result: {}".format(database.db_qry(query=query, con=con, cur=cur))
-            )
+            result = database.db_qry(query=query, con=con, cur=cur)
+            log.debug("Result: {}".format(result))
+            if isinstance(result, str):
+                errors.append(result)
+
+        # Inside database.transaction(), the commit happens when the block exits
+        if not database.deferred(con):
+            con.commit()
 
-        con.commit()
         con.close()
+        bot_config_changed(botId, categories)
+        if len(errors):
+            return errors[0]
     else:
         query = (
             "UPDATE rb_config SET val = ? WHERE category = ? and key = ?;",
@@ -237,6 +393,95 @@ def update_bot_config(botId, data):
     return True
 
 
+BOT_CONFIG_COLUMNS = (
+    "botId",
+    "category",
+    "key",
+    "val",
+    "description",
+    "type",
+    "options",
+    "subkeys",
+    "parent_key",
+    "read_only",
+    "system",
+)
+DEFAULT_BOT_CONFIG = {
+    "Logging": [
+        {
+            "key": "LOG_TO_FILE",
+            "description": "Log to File",
+            "type": "bool",
+            "val": True,
+            "subkeys": ["FILE_LOG_LEVEL"],
+        },
+        {
+            "key": "FILE_LOG_LEVEL",
+            "description": "File Log Level",
+            "type": "str",
+            "val": "DEBUG",
+            "options": ["DEBUG", "INFO", "WARNING", "ERROR"],
+            "parent_key": "LOG_TO_FILE",
+        },
+        {
+            "key": "LOG_TO_CONSOLE",
+            "description": "Log to Console",
+            "type": "bool",
+            "val": True,
+            "subkeys": ["CONSOLE_LOG_LEVEL"],
+        },
+        {
+            "key": "CONSOLE_LOG_LEVEL",
+            "description": "Console Log Level",
+            "type": "str",
+            "val": "INFO",
+            "options": ["DEBUG", "INFO", "WARNING", "ERROR"],
+            "parent_key": "LOG_TO_CONSOLE",
+        },
+        {
+            "key": "PROPAGATE",
+            "description": "Propagate Logs",
+            "type": "bool",
+            "val": False,
+        },
+    ]
+}
+SYSTEM_BOT_CONFIG = {
+    "Logging": [
+        "LOG_TO_FILE",
+        "FILE_LOG_LEVEL",
+        "LOG_TO_CONSOLE",
+        "CONSOLE_LOG_LEVEL",
+        "PROPAGATE",
+    ]
+}
+
+
+def bot_config_row(botId, category, key, val, dataType, z):
+    # Build an rb_botConfig row matching BOT_CONFIG_COLUMNS
+    options = z.get("options")
+    if dataType == "bool":
+        val = val if isinstance(val, bool) else (val.lower() == "true")
+        if options in ("", [], None):
+            options = [True, False]
+    elif dataType == "int":
+        val = int(val)
+
+    return (
+        int(botId),
+        category,
+        key,
+        serialize_key(val),
+        z.get("description", ""),
+        dataType,
+        serialize_key(options) if options not in ["", None] else "[]",
+        serialize_key(z.get("subkeys")) if z.get("subkeys") not in ["", None] else "[]",
+        z.get("parent_key", ""),
+        z.get("read_only", "False"),
+        "True" if key in SYSTEM_BOT_CONFIG.get(category, []) else "False",
+    )
+
+
 def add_bot_config(
     botId,
     category=None,
@@ -255,138 +500,80 @@ def add_bot_config(
     commit=True,
     closeAfter=True,
 ):
-    if clean:
-        log.debug("Clearing config for bot id {} per clean parameter".format(botId))
-        delete_bot_config(botId, category, key, all=True)
-
     if replace:
         log.debug("Replacing existing values...")
-        q = "INSERT OR REPLACE INTO rb_botConfig (botId, category, key, val, description, type, options, subkeys, parent_key, system) VALUES "
     else:
         log.debug("Preserving existing values...")
-        q = "INSERT OR IGNORE INTO rb_botConfig (botId, category, key, val, description, type, options, subkeys, parent_key, system) VALUES "
 
     if isinstance(multi, dict):
         log.debug(f"Multiple [{len(multi)}] config categories provided.")
-        query = []
+        rows = []
         for k, v in multi.items():
             log.debug(
-                f"Generating query for category [{k}] containing [{len(multi[k])}] items..."
+                f"Generating rows for category [{k}] containing [{len(multi[k])}] items..."
             )
-            local_args = tuple()
-            q2 = q
             for z in v:
-                if z.get("type") == "bool":
-                    z["val"] = (
-                        z["val"]
-                        if isinstance(z["val"], bool)
-                        else (z["val"].lower() == "true")
+                rows.append(
+                    bot_config_row(
+                        botId, k, z["key"], z["val"], z.get("type", "str"), z
                     )
-                    if z.get("options") in ("", [], None):
-                        z["options"] = [True, False]
-                elif z.get("type") == "int":
-                    z["val"] = int(z["val"])
-
-                if len(local_args):
-                    q2 += ", "
-
-                q2 += "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-                local_args += (
-                    int(botId),
-                    k,
-                    z["key"],
-                    serialize_key(z["val"]),
-                    z.get("description", ""),
-                    z.get("type", "str"),
-                    serialize_key(z.get("options"))
-                    if z.get("options") not in ["", None]
-                    else "[]",
-                    serialize_key(z.get("subkeys"))
-                    if z.get("subkeys") not in ["", None]
-                    else "[]",
-                    z.get("parent_key", ""),
-                    "True"
-                    if k == "Logging"
-                    and z["key"]
-                    in [
-                        "LOG_TO_FILE",
-                        "FILE_LOG_LEVEL",
-                        "LOG_TO_CONSOLE",
-                        "CONSOLE_LOG_LEVEL",
-                        "PROPAGATE",
-                    ]
-                    else "False",
                 )
-
-            q2 += ";"
-            query.append((q2, local_args))
     else:
-        if dataType == "bool":
-            val = val if isinstance(val, bool) else (val.lower() == "true")
-            if options in ("", [], None):
-                options = [True, False]
-        elif dataType == "int":
-            val = int(val)
-
-        query = (
-            q + " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
-            (
+        rows = [
+            bot_config_row(
                 botId,
                 category,
                 key,
-                serialize_key(val),
-                description,
+                val,
                 dataType,
-                serialize_key(options if isinstance(options, list) else []),
-                serialize_key(subkeys if isinstance(subkeys, list) else []),
-                parent_key,
-                "True"
-                if category == "Logging"
-                and key
-                in [
-                    "LOG_TO_FILE",
-                    "FILE_LOG_LEVEL",
-                    "LOG_TO_CONSOLE",
-                    "CONSOLE_LOG_LEVEL",
-                    "PROPAGATE",
-                ]
-                else "False",
-            ),
+                {
+                    "description": description,
+                    "options": options if isinstance(options, list) else [],
+                    "subkeys": subkeys if isinstance(subkeys, list) else [],
+                    "parent_key": parent_key,
+                },
+            )
+        ]
+
+    # Clearing and inserting happen in one transaction, unless the caller
+    # is managing the transaction (commit=False)
+    result = None
+    with database.transaction(logg=log) if commit else nullcontext():
+        if clean:
+            log.debug("Clearing config for bot id {} per clean parameter".format(botId))
+            delete_bot_config(botId, all=True)
+
+        result = database.bulk_insert(
+            "rb_botConfig",
+            BOT_CONFIG_COLUMNS,
+            rows,
+            conflict="REPLACE" if replace else "IGNORE",
+            con=con,
+            cur=cur,
+            closeAfter=closeAfter,
+            logg=log,
         )
+        if isinstance(result, str) and commit:
+            raise database.Rollback()
 
-    return database.db_qry(
-        query, con=con, cur=cur, commit=commit, closeAfter=closeAfter
-    )
+    if not isinstance(result, str):
+        # clean also published a full reload via delete_bot_config()
+        bot_config_changed(
+            botId, multi.keys() if isinstance(multi, dict) else [category]
+        )
 
-    return None
+    return result
 
 
 def add_default_bot_config(botId, con=None, cur=None):
-    boolOptions = serialize_key([True, False])
-    logLevelOptions = serialize_key(["DEBUG", "INFO", "WARNING", "ERROR"])
-    sq = (
-        """INSERT OR IGNORE INTO rb_botConfig (botId, category, key, description, type, val, options, subkeys, parent_key, read_only, system)
-            VALUES
-            (?, 'Logging', 'LOG_TO_FILE', 'Log to File', 'bool', 'true', ?, '["FILE_LOG_LEVEL"]', '', 'False', 'True'),
-            (?, 'Logging', 'FILE_LOG_LEVEL', 'File Log Level', 'str', '"DEBUG"', ?, '[]', 'LOG_TO_FILE', 'False', 'True'),
-            (?, 'Logging', 'LOG_TO_CONSOLE', 'Log to Console', 'bool', 'true', ?, '["CONSOLE_LOG_LEVEL"]', '', 'False', 'True'),
-            (?, 'Logging', 'CONSOLE_LOG_LEVEL', 'Console Log Level', 'str', '"INFO"', ?, '[]', 'LOG_TO_CONSOLE', 'False', 'True'),
-            (?, 'Logging', 'PROPAGATE', 'Propagate Logs', 'bool', 'false', ?, '[]', '', 'False', 'True')
-        ;""",
-        (
-            botId,
-            boolOptions,
-            botId,
-            logLevelOptions,
-            botId,
-            boolOptions,
-            botId,
-            logLevelOptions,
-            botId,
-            boolOptions,
-        ),
+    sres = add_bot_config(
+        botId,
+        multi=DEFAULT_BOT_CONFIG,
+        con=con,
+        cur=cur,
+        commit=False,
+        closeAfter=False,
     )
-    sres = database.db_qry(sq, con=con, cur=cur)
     if isinstance(sres, str):
         return "Error inserting default config: {}".format(sres)
     else:
@@ -407,7 +594,15 @@ def delete_bot_config(botId, category=None, key=None, confId=None, all=False):
             (botId, category, key),
         )
 
-    return database.db_qry(query, commit=True, closeAfter=True)
+    result = database.db_qry(query, commit=True, closeAfter=True)
+    if not isinstance(result, str):
+        bot_config_changed(botId, None if all or confId else [category])
+
+    return result
+
+
+BOT_RUN_MODES = ["thread", "process"]
+"""Bots run in a thread in the redball process, or in a child process"""
 
 
 def get_botTypes(id=None):
@@ -436,19 +631,23 @@ def get_botTypes(id=None):
 
 
 def create_botType(**kwargs):
+    if kwargs.get("runMode") and kwargs["runMode"] not in BOT_RUN_MODES:
+        return "ERROR: Invalid run mode."
+
     con = database.get_con()
     cur = database.get_cur(con)
 
     query = (
         """INSERT INTO rb_botTypes
-                (name, description, moduleName)
+                (name, description, moduleName, runMode)
                 VALUES
-                (?,?,?)
+                (?,?,?,?)
             ;""",
         (
             kwargs["description"].lower().strip().replace(" ", "-"),
             kwargs["description"],
             kwargs["moduleName"],
+            kwargs.get("runMode") or "thread",
         ),
     )
     result = database.db_qry(query, con=con, cur=cur)
@@ -466,6 +665,7 @@ def create_botType(**kwargs):
                     kwargs["description"], insert_id
                 )
             )
+            resource_changed("botTypes")
         else:
             insert_id = "ERROR: Failed to insert record."
 
@@ -490,6 +690,13 @@ def update_botType(id, **kwargs):
         fields.append(" moduleName=?")
         local_args += (kwargs["moduleName"],)
 
+    if kwargs.get("runMode"):
+        if kwargs["runMode"] not in BOT_RUN_MODES:
+            return "ERROR: Invalid run mode."
+
+        fields.append(" runMode=?")
+        local_args += (kwargs["runMode"],)
+
     q += ",".join(fields)
     q += " WHERE id=?"
     local_args += (int(id),)
@@ -498,12 +705,14 @@ def update_botType(id, **kwargs):
 
     query = (q, local_args)
     result = database.db_qry(query, commit=True, closeAfter=True)
+    resource_changed("botTypes")
     return result
 
 
 def delete_botType(id):
     query = ("DELETE FROM rb_botTypes WHERE id=?;", (id,))
     result = database.db_qry(query, commit=True, closeAfter=True)
+    resource_changed("botTypes")
     return result
 
 
@@ -574,6 +783,7 @@ def create_redditAuth(**kwargs):
                 )
             )
             redball.REDDIT_AUTH_LOCKS.update({str(insert_id): Lock()})
+            resource_changed("redditAuths")
         else:
             insert_id = "ERROR: Failed to insert record."
 
@@ -583,6 +793,11 @@ def create_redditAuth(**kwargs):
 
 
 def update_redditAuth(id, **kwargs):
+    # Stored values, to tell which fields actually change
+    old = get_redditAuths(id)
+    if not isinstance(old, dict):
+        old = {}
+
     local_args = tuple()
     q = "UPDATE rb_redditAuth set"
     fields = []
@@ -614,12 +829,37 @@ def update_redditAuth(id, **kwargs):
 
     query = (q, local_args)
     result = database.db_qry(query, commit=True, closeAfter=True)
+    resource_changed("redditAuths")
+    if not isinstance(result, str):
+        # Bots expose the app id/secret in both auth categories,
+        # and the refresh token doubles as the Lemmy instance
+        # (praw stores the refresh token after every token refresh, usually
+        # unchanged, so only count fields whose value is different)
+        changed = [
+            k
+            for k in ("reddit_appId", "reddit_appSecret", "reddit_refreshToken")
+            if kwargs.get(k) and kwargs[k] != old.get(k)
+        ]
+        categories = set()
+        if "reddit_appId" in changed or "reddit_appSecret" in changed:
+            categories.update(["Reddit Auth", "Lemmy Auth"])
+        if "reddit_refreshToken" in changed:
+            categories.add("Lemmy Auth")
+        if categories:
+            bots = database.db_qry(
+                ("SELECT id FROM rb_bots WHERE redditAuth=?;", (int(id),)),
+                rowType="tuple",
+            )
+            for b in bots if isinstance(bots, list) else []:
+                bot_config_changed(b[0], categories)
+
     return result
 
 
 def delete_redditAuth(id):
     query = ("DELETE FROM rb_redditAuth WHERE id=?;", (id,))
     result = database.db_qry(query, commit=True, closeAfter=True)
+    resource_changed("redditAuths")
     return result
 
 
@@ -640,6 +880,8 @@ def authorize_redditAuth(id):
     webConfig = get_sys_config(category="Web/Security")
 
     log.debug("Starting Reddit authorization process for redditAuth {}.")
+    import praw
+
     reddit = praw.Reddit(
         client_id=redditAuth["reddit_appId"],
         client_secret=redditAuth["reddit_appSecret"],
@@ -683,6 +925,8 @@ def callBack_redditAuth(state, code):
             code, redditAuth["id"]
         )
     )
+    import praw
+
     reddit = praw.Reddit(
         client_id=redditAuth["reddit_appId"],
         client_secret=redditAuth["reddit_appSecret"],
@@ -708,28 +952,44 @@ def callBack_redditAuth(state, code):
         commit=True,
         closeAfter=True,
     )
+    resource_changed("redditAuths")
     if upd in [[], [[]]]:
         return True
     else:
         return False
 
 
-class RedditAuthDBTokenManager(praw.util.token_manager.BaseTokenManager):
-    def __init__(self, redditAuthId):
-        super().__init__()
-        self._reddit_auth_id = redditAuthId
+def token_manager_class():
+    # praw is slow to import and only needed once a bot starts, so the token
+    # manager class is defined on first use of config.RedditAuthDBTokenManager
+    import praw
 
-    def post_refresh_callback(self, authorizer):
-        log.debug(f"Storing refresh token: {authorizer.refresh_token}")
-        update_redditAuth(
-            self._reddit_auth_id, reddit_refreshToken=authorizer.refresh_token
-        )
+    class RedditAuthDBTokenManager(praw.util.token_manager.BaseTokenManager):
+        def __init__(self, redditAuthId):
+            super().__init__()
+            self._reddit_auth_id = redditAuthId
+
+        def post_refresh_callback(self, authorizer):
+            log.debug(f"Storing refresh token: {authorizer.refresh_token}")
+            update_redditAuth(
+                self._reddit_auth_id, reddit_refreshToken=authorizer.refresh_token
+            )
+
+        def pre_refresh_callback(self, authorizer):
+            redditAuthInfo = get_redditAuths(self._reddit_auth_id)
+            freshToken = redditAuthInfo.get("reddit_refreshToken")
+            log.debug(f"Redeeming Reddit refresh token: {freshToken}")
+            authorizer.refresh_token = freshToken
+
+    return RedditAuthDBTokenManager
+
+
+def __getattr__(name):
+    if name == "RedditAuthDBTokenManager":
+        globals().update({name: token_manager_class()})
+        return globals()[name]
 
-    def pre_refresh_callback(self, authorizer):
-        redditAuthInfo = get_redditAuths(self._reddit_auth_id)
-        freshToken = redditAuthInfo.get("reddit_refreshToken")
-        log.debug(f"Redeeming Reddit refresh token: {freshToken}")
-        authorizer.refresh_token = freshToken
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
 
 
 def get_redditScopes(id=None, name=None):
@@ -1,11 +1,20 @@
 #!/usr/bin/env python
 
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from functools import lru_cache
+import gzip
 import os
 import json
+import lzma
+import re
+import shutil
 import sqlite3
+import threading
 import time
 import uuid
+import weakref
 
 import redball
 from redball import config, logger, upgrade
@@ -15,7 +24,131 @@ log = logger.get_logger(
 )
 
 
-def get_con(logg=log, dbFile=None):
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection owned by a ConnectionPool.
+
+    Calling close() hands the connection back to the pool instead of closing it,
+    so existing callers that use closeAfter=True or con.close() keep working.
+    Uncommitted changes are rolled back on close, as they would be if the
+    connection were really closed, unless the connection is checked out via
+    ConnectionPool.checkout() further up the stack.
+    """
+
+    def close(self):
+        self.pool.release(self)
+
+    def discard(self):
+        sqlite3.Connection.close(self)
+
+
+class ConnectionPool(object):
+    """Hand out one reusable connection to the redball database per thread.
+
+    Connections are created on first use in a thread and live until the thread
+    exits (or reset() is called), so repeat queries skip the connect/PRAGMA
+    setup entirely. Use checkout() as a context manager to borrow the current
+    thread's connection for a block of work.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, dbFile=None, logg=log):
+        dbFile = dbFile if dbFile else redball.DB_FILE
+        cons = getattr(self._local, "cons", None)
+        if cons is None:
+            cons = self._local.cons = {}
+
+        con = cons.get(dbFile)
+        if con is not None and con.generation == self._generation:
+            with self._lock:
+                self.hits += 1
+
+            return con
+        elif con is not None:
+            # Pool was reset since this connection was created
+            con.discard()
+
+        con = connect(dbFile, logg=logg, factory=PooledConnection)
+        con.pool = self
+        con.generation = self._generation
+        cons[dbFile] = con
+        with self._lock:
+            self.misses += 1
+            self._connections.add(con)
+
+        return con
+
+    @contextmanager
+    def checkout(self, dbFile=None, logg=log):
+        con = self.get(dbFile=dbFile, logg=logg)
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            yield con
+        finally:
+            self._local.depth -= 1
+            con.close()
+
+    def release(self, con):
+        if con.in_transaction and not getattr(self._local, "depth", 0):
+            con.rollback()
+
+    def reset(self):
+        # Existing connections are replaced the next time their thread asks for one
+        with self._lock:
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._connections),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / total, 4) if total else 0,
+            }
+
+
+POOL = ConnectionPool()
+
+SETTINGS = {
+    "JOURNAL_MODE": "WAL",
+    "BUSY_TIMEOUT": 30000,
+    "SYNCHRONOUS": "NORMAL",
+    "SLOW_QUERY_MS": 1000,
+}
+"""Connection tuning, loaded from the Database category of rb_config by configure()"""
+
+
+def configure(logg=log):
+    # Load connection settings from the Database sys config category
+    # and replace pooled connections so they pick up the new values
+    for x in config.get_sys_config(category="Database"):
+        if x["key"] in SETTINGS:
+            SETTINGS.update({x["key"]: x["val"]})
+
+    logg.debug("Database connection settings: {}".format(SETTINGS))
+    POOL.reset()
+
+
+WRITE_PRAGMAS = ("incremental_vacuum", "wal_checkpoint", "optimize")
+
+
+def is_read_query(q):
+    # SELECT/EXPLAIN and PRAGMA reads can run concurrently in WAL mode
+    s = q.lstrip()[:8].upper()
+    if s.startswith("PRAGMA"):
+        return "=" not in q and not any(x in q.lower() for x in WRITE_PRAGMAS)
+
+    return s.startswith(("SELECT", "EXPLAIN"))
+
+
+def connect(dbFile, logg=log, factory=sqlite3.Connection):
     if not os.path.isdir(redball.DB_PATH):
         try:
             logg.info("The data directory does not exist. Attempting to create it...")
@@ -25,11 +158,13 @@ def get_con(logg=log, dbFile=None):
             raise
 
     try:
-        logg.debug(
-            "Connecting to database {}".format(dbFile if dbFile else redball.DB_FILE)
+        logg.debug("Connecting to database {}".format(dbFile))
+        con = sqlite3.connect(
+            dbFile, timeout=int(SETTINGS["BUSY_TIMEOUT"]) / 1000, factory=factory
         )
-        con = sqlite3.connect(dbFile if dbFile else redball.DB_FILE, timeout=30)
-        con.execute("PRAGMA journal_mode = off;")
+        con.execute("PRAGMA journal_mode = {};".format(SETTINGS["JOURNAL_MODE"]))
+        con.execute("PRAGMA synchronous = {};".format(SETTINGS["SYNCHRONOUS"]))
+        con.execute("PRAGMA busy_timeout = {};".format(int(SETTINGS["BUSY_TIMEOUT"])))
         con.row_factory = dict_factory
         return con
     except sqlite3.Error as e:
@@ -37,6 +172,122 @@ def get_con(logg=log, dbFile=None):
         raise
 
 
+def get_con(logg=log, dbFile=None):
+    if not dbFile or dbFile == redball.DB_FILE:
+        return POOL.get(logg=logg)
+
+    # Other database files (e.g. backups) get a dedicated connection
+    return connect(dbFile, logg=logg)
+
+
+def get_pool_stats():
+    return POOL.stats()
+
+
+class QueryStats(object):
+    """Execution time, DB_LOCK wait and row counts per normalized query shape.
+
+    Literals, bot table prefixes and VALUES/IN lists are collapsed so the same
+    query with different arguments is counted together. Statements slower
+    than SETTINGS["SLOW_QUERY_MS"] are logged as warnings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = {}
+        self.since = time.time()
+
+    def record(self, q, execTime, lockWait=0, rows=0, logg=log):
+        shape = normalize_query(q)
+        with self._lock:
+            s = self.queries.get(shape)
+            if s is None:
+                s = self.queries[shape] = {
+                    "query": shape,
+                    "count": 0,
+                    "totalTime": 0,
+                    "maxTime": 0,
+                    "lockWait": 0,
+                    "rows": 0,
+                }
+
+            s["count"] += 1
+            s["totalTime"] += execTime
+            s["maxTime"] = max(s["maxTime"], execTime)
+            s["lockWait"] += lockWait
+            s["rows"] += rows
+
+        slow = int(SETTINGS["SLOW_QUERY_MS"])
+        if slow and (execTime + lockWait) * 1000 >= slow:
+            logg.warning(
+                "Slow query ({:.0f}ms, {:.0f}ms waiting for lock, {} rows): {}".format(
+                    execTime * 1000, lockWait * 1000, rows, q.strip()[:500]
+                )
+            )
+
+    def top(self, limit=20, sortBy="totalMs"):
+        with self._lock:
+            stats = [
+                {
+                    "query": x["query"],
+                    "count": x["count"],
+                    "rows": x["rows"],
+                    "totalMs": round(x["totalTime"] * 1000, 3),
+                    "avgMs": round(x["totalTime"] * 1000 / x["count"], 3),
+                    "maxMs": round(x["maxTime"] * 1000, 3),
+                    "lockWaitMs": round(x["lockWait"] * 1000, 3),
+                    "avgLockWaitMs": round(x["lockWait"] * 1000 / x["count"], 3),
+                }
+                for x in self.queries.values()
+            ]
+
+        stats.sort(key=lambda x: x.get(sortBy, 0), reverse=True)
+        return stats[:limit] if limit else stats
+
+    def reset(self):
+        with self._lock:
+            self.queries = {}
+            self.since = time.time()
+
+
+QUERY_STATS = QueryStats()
+
+_NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\brb_bot_\d+_"), "rb_bot_?_"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),
+    (re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+"), "(?)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+@lru_cache(maxsize=2048)
+def normalize_query(q):
+    # Reduce a statement to its shape for QUERY_STATS
+    for pattern, repl in _NORMALIZE:
+        q = pattern.sub(repl, q)
+
+    return q.strip()
+
+
+def get_query_stats(limit=20, sortBy="totalMs"):
+    return {
+        "since": QUERY_STATS.since,
+        "slowQueryMs": int(SETTINGS["SLOW_QUERY_MS"]),
+        "pool": get_pool_stats(),
+        "sysConfigCache": config.get_sys_config_cache_stats(),
+        "queries": QUERY_STATS.top(limit=limit, sortBy=sortBy),
+    }
+
+
+def timed_commit(con, logg=log):
+    # Commit and record the time it took
+    start = time.perf_counter()
+    con.commit()
+    QUERY_STATS.record("COMMIT", time.perf_counter() - start, logg=logg)
+
+
 def get_cur(con=None, logg=log):
     if not con:
         con = get_con(logg=logg)
@@ -51,14 +302,23 @@ def get_cur(con=None, logg=log):
 
 
 def db_qry(
-    query, con=None, cur=None, fetchone=False, commit=False, closeAfter=False, logg=log
+    query,
+    con=None,
+    cur=None,
+    fetchone=False,
+    commit=False,
+    closeAfter=False,
+    rowType="dict",
+    logg=log,
 ):
+    # rowType: dict (default), row (sqlite3.Row), record (namedtuple) or tuple
     if not con:
         con = get_con(logg=logg)
 
     if not cur:
         cur = get_cur(con, logg=logg)
 
+    cur.row_factory = sqlite3.Row if rowType == "row" else None
     if isinstance(query, str) or isinstance(query, tuple):
         query = [query]
 
@@ -72,23 +332,44 @@ def db_qry(
                 args = (args,)
 
         try:
-            logg.debug("q: {}, args: {}".format(q, args))
-            with redball.DB_LOCK:
+            # Log arguments are only formatted if a handler emits the record
+            logg.debug("q: %s, args: %s", q, args)
+            if SETTINGS["JOURNAL_MODE"] == "WAL" and is_read_query(q):
+                # Readers don't need to wait for the writer in WAL mode
+                lock = nullcontext()
+            else:
+                lock = redball.DB_LOCK
+
+            start = time.perf_counter()
+            with lock:
+                locked = time.perf_counter()
                 if len(args):
                     r = cur.execute(q, args)
                 else:
                     r = cur.execute(q)
 
                 if fetchone:
-                    results.append(r.fetchone())
+                    rows = r.fetchone()
+                    count = 0 if rows is None else 1
+                    results.append(materialize(cur, rows, rowType, True))
                 else:
-                    results.append(r.fetchall())
+                    rows = r.fetchall()
+                    count = len(rows)
+                    results.append(materialize(cur, rows, rowType))
+
+            QUERY_STATS.record(
+                q,
+                time.perf_counter() - locked,
+                lockWait=locked - start,
+                rows=count if cur.description else max(cur.rowcount, 0),
+                logg=logg,
+            )
         except sqlite3.Error as e:
             logg.error("Error executing database query ({}): {}".format(q, e))
             results.append("ERROR: {}".format(e))
 
-    if commit:
-        con.commit()
+    if commit and not deferred(con):
+        timed_commit(con, logg=logg)
 
     if closeAfter:
         con.close()
@@ -98,10 +379,166 @@ def db_qry(
     else:
         res = results
 
-    logg.debug("Query result: {}.".format(res))
+    logg.debug("Query result: %s.", res)
     return res
 
 
+def query_failed(results):
+    # db_qry() reports errors as "ERROR: ..." strings in place of results
+    if not isinstance(results, list):
+        results = [results]
+
+    return any(isinstance(x, str) and x.startswith("ERROR") for x in results)
+
+
+def executemany(
+    query, rows, con=None, cur=None, commit=False, closeAfter=False, logg=log
+):
+    # Run one parameterized statement for every row in rows, under a single
+    # DB_LOCK acquisition. Returns the number of rows affected.
+    if not con:
+        con = get_con(logg=logg)
+
+    if not cur:
+        cur = get_cur(con, logg=logg)
+
+    rows = list(rows)
+    try:
+        logg.debug("q: %s, rows: %s", query, len(rows))
+        start = time.perf_counter()
+        with redball.DB_LOCK:
+            locked = time.perf_counter()
+            cur.executemany(query, rows)
+
+        QUERY_STATS.record(
+            query,
+            time.perf_counter() - locked,
+            lockWait=locked - start,
+            rows=max(cur.rowcount, 0),
+            logg=logg,
+        )
+        result = cur.rowcount
+    except sqlite3.Error as e:
+        logg.error("Error executing database query ({}): {}".format(query, e))
+        result = "ERROR: {}".format(e)
+
+    if commit and not deferred(con):
+        timed_commit(con, logg=logg)
+
+    if closeAfter:
+        con.close()
+
+    logg.debug("Query result: %s.", result)
+    return result
+
+
+def bulk_insert(
+    table,
+    columns,
+    rows,
+    conflict=None,
+    con=None,
+    cur=None,
+    commit=False,
+    closeAfter=False,
+    logg=log,
+):
+    # conflict: None, IGNORE or REPLACE
+    q = "INSERT {}INTO {} ({}) VALUES ({});".format(
+        "OR {} ".format(conflict.upper()) if conflict else "",
+        table,
+        ", ".join(columns),
+        ", ".join("?" * len(columns)),
+    )
+    return executemany(
+        q, rows, con=con, cur=cur, commit=commit, closeAfter=closeAfter, logg=logg
+    )
+
+
+class Rollback(Exception):
+    """Raise inside a transaction() block to discard its changes.
+
+    The exception is swallowed by the outermost transaction() block.
+    """
+
+
+_TRANSACTION = threading.local()
+
+
+def in_transaction():
+    return getattr(_TRANSACTION, "depth", 0) > 0
+
+
+def deferred(con):
+    # Commits on the pooled connection wait for the enclosing transaction() block
+    return in_transaction() and getattr(con, "pool", None) is POOL
+
+
+@contextmanager
+def transaction(logg=log):
+    """Group writes into a single transaction on this thread's pooled connection.
+
+    DB_LOCK is held for the whole block and everything is committed once when
+    the block exits, or rolled back if it raises. db_qry() and executemany()
+    calls on the pooled connection inside the block (with or without con=)
+    join the transaction, and their commit=True is deferred until the end.
+    Nested transaction() blocks join the outermost one.
+    """
+    with redball.DB_LOCK, POOL.checkout(logg=logg) as con:
+        outer = not in_transaction()
+        if outer and not con.in_transaction:
+            con.execute("BEGIN IMMEDIATE;")
+
+        _TRANSACTION.depth = getattr(_TRANSACTION, "depth", 0) + 1
+        try:
+            yield con
+        except Rollback:
+            if not outer:
+                raise
+
+            logg.debug("Rolling back transaction.")
+            con.rollback()
+        except BaseException:
+            if outer:
+                con.rollback()
+
+            raise
+        else:
+            if outer:
+                timed_commit(con, logg=logg)
+        finally:
+            _TRANSACTION.depth -= 1
+
+
+_RECORD_TYPES = {}
+
+
+def record_type(fields):
+    # One namedtuple class per column signature, created on first use
+    cls = _RECORD_TYPES.get(fields)
+    if cls is None:
+        cls = _RECORD_TYPES[fields] = namedtuple("Record", fields, rename=True)
+
+    return cls
+
+
+def materialize(cur, rows, rowType="dict", one=False):
+    # Convert tuples fetched from cur into rowType, looking up the
+    # column names once per query rather than once per row
+    if rows is None or rowType in ("row", "tuple") or not cur.description:
+        return rows
+
+    fields = tuple(c[0] for c in cur.description)
+    if rowType == "record":
+        make = record_type(fields)._make
+        return make(rows) if one else list(map(make, rows))
+
+    if one:
+        return dict(zip(fields, rows))
+
+    return [dict(zip(fields, row)) for row in rows]
+
+
 def dict_factory(cursor, row):
     """From sqlite3 documentation:
     https://docs.python.org/2/library/sqlite3.html#sqlite3.Connection.row_factory
@@ -426,14 +863,296 @@ def build_tables(tables, logg=log):
 
     logg.debug("Executing queries to build {} table(s): {}".format(tables, queries))
     results = db_qry(queries, commit=True, closeAfter=True, logg=logg)
-    if None in results:
-        logg.debug("One or more queries failed: {}".format(results))
+    if query_failed(results):
+        logg.error("One or more queries failed: {}".format(results))
     else:
         logg.debug("Building of tables complete. Results: {}".format(results))
 
+    config.invalidate_sys_config()
     return True
 
 
+BOT_TABLE_INDEXES = {
+    # Bot-owned table (rb_bot_<id>_<name>): column lists to index. Indexes are
+    # only created on tables that have all of the columns, so one entry can
+    # cover the MLB (gamePk) and NFL/NBA/NHL (gameId) variants of a table.
+    "threads": [
+        ("gamePk", "type", "gameDate", "deleted"),
+        ("gameId", "type", "gameDate", "deleted"),
+    ],
+    "processedAtBats": [("gamePk", "gameThreadId")],
+    "comments": [("gamePk", "atBatIndex")],
+}
+
+HOT_QUERIES = [
+    # Frequent queries to report EXPLAIN QUERY PLAN for; {} is the bot table prefix
+    ("SELECT * FROM rb_botConfig WHERE botId=? ORDER BY category ASC;", (0,)),
+    (
+        "SELECT * FROM {}processedAtBats WHERE gamePk=? and gameThreadId=?;",
+        (0, ""),
+    ),
+    (
+        "select checks,edits from {}thread_edits where threadId=? and status=?;",
+        ("", ""),
+    ),
+    (
+        "select * from {}threads where type=? and gamePk in (?, ?) and gameDate = ? and deleted=0;",
+        ("", 0, 0, ""),
+    ),
+    (
+        "select * from {}threads where type=? and gameId = ? and gameDate = ? and deleted=0;",
+        ("", "", ""),
+    ),
+    ("select * from {}comments where gamePk=? and atBatIndex=?;", (0, 0)),
+    ("SELECT * FROM rb_users WHERE 1=1 AND apikey=?", ("",)),
+]
+
+
+def get_bot_tables(prefix=None, logg=log):
+    # Return {table name: table suffix} for bot-owned tables, optionally
+    # limited to one bot's prefix (e.g. rb_bot_1_)
+    tables = db_qry(
+        "select name from sqlite_master where type='table' and name like 'rb_bot_%';",
+        closeAfter=True,
+        rowType="tuple",
+        logg=logg,
+    )
+    if isinstance(tables, str):
+        return {}
+
+    botTables = {}
+    for (name,) in tables:
+        m = re.match(r"^(rb_bot_\d+_)(\w+)$", name)
+        if m and (not prefix or m.group(1) == prefix):
+            botTables.update({name: m.group(2)})
+
+    return botTables
+
+
+def ensure_indexes(prefix=None, logg=log):
+    # Create any missing BOT_TABLE_INDEXES on bot-owned tables
+    # Returns list of index names that were created or already existed
+    queries = []
+    indexes = []
+    for table, suffix in get_bot_tables(prefix, logg=logg).items():
+        if not BOT_TABLE_INDEXES.get(suffix):
+            continue
+
+        cols = db_qry(
+            "PRAGMA table_info({});".format(table), closeAfter=True, logg=logg
+        )
+        cols = [x["name"] for x in cols] if isinstance(cols, list) else []
+        for idxCols in BOT_TABLE_INDEXES[suffix]:
+            if all(c in cols for c in idxCols):
+                name = "idx_{}_{}".format(table, "_".join(idxCols))
+                indexes.append(name)
+                queries.append(
+                    "CREATE INDEX IF NOT EXISTS {} ON {} ({});".format(
+                        name, table, ", ".join(idxCols)
+                    )
+                )
+
+    if len(queries):
+        logg.debug("Ensuring {} bot table index(es) exist...".format(len(queries)))
+        results = db_qry(queries, commit=True, closeAfter=True, logg=logg)
+        if len(queries) == 1:
+            results = [results]
+
+        for i, r in enumerate(results):
+            if isinstance(r, str):
+                logg.error("Failed to create index {}: {}".format(indexes[i], r))
+
+    return indexes
+
+
+def explain_query_plans(prefix=None, logg=log):
+    # Return EXPLAIN QUERY PLAN details for HOT_QUERIES, run against
+    # each bot's tables (or only the bot with the given table prefix)
+    prefixes = sorted(
+        set(t[: -len(s)] for t, s in get_bot_tables(prefix, logg=logg).items())
+    )
+    plans = []
+    with POOL.checkout(logg=logg) as con:
+        cur = con.cursor()
+        cur.row_factory = None
+        for q, args in HOT_QUERIES:
+            for p in prefixes if "{}" in q else [None]:
+                query = q.format(p) if p else q
+                try:
+                    plan = cur.execute(
+                        "EXPLAIN QUERY PLAN {}".format(query), args
+                    ).fetchall()
+                except sqlite3.Error:
+                    # Table or column does not exist for this bot type
+                    continue
+
+                # Rows are (id, parent, notused, detail)
+                plans.append({"query": query, "plan": [x[3] for x in plan]})
+
+    return plans
+
+
+def get_meta(key, logg=log):
+    result = db_qry(
+        ("SELECT val from rb_meta where key=?;", (key,)),
+        fetchone=True,
+        closeAfter=True,
+        logg=logg,
+    )
+    return result.get("val") if isinstance(result, dict) else None
+
+
+def set_meta(key, val, logg=log):
+    return db_qry(
+        (
+            """INSERT INTO rb_meta (key, val, lastUpdate) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET val=excluded.val, lastUpdate=excluded.lastUpdate;""",
+            (key, val, time.time()),
+        ),
+        commit=True,
+        closeAfter=True,
+        logg=logg,
+    )
+
+
+RETENTION_TABLES = {
+    # Bot-owned table: (Database setting holding max age in days, date columns)
+    # The first date column that exists in the table is used. Dates are epoch
+    # timestamps, as written by the bots.
+    "thread_edits": ("RETENTION_THREAD_EDITS_DAYS", ("dateUpdated",)),
+    "processedAtBats": ("RETENTION_PROCESSEDATBATS_DAYS", ("dateUpdated",)),
+    "comments": ("RETENTION_COMMENTS_DAYS", ("dateCreated", "date")),
+    "posts": ("RETENTION_POSTS_DAYS", ("dateCreated",)),
+}
+
+
+def prune_history(logg=log, batchSize=500, pause=0.1):
+    # Nightly retention job: delete rows older than the configured age from bot
+    # history tables, then return the freed pages to the filesystem. Rows are
+    # deleted and pages freed in small steps so bots are never blocked for long.
+    startTime = time.time()
+    cfg = {x["key"]: x["val"] for x in config.get_sys_config(category="Database")}
+    pruned = {}
+    for table, suffix in get_bot_tables(logg=logg).items():
+        setting, dateCols = RETENTION_TABLES.get(suffix, (None, ()))
+        days = int(cfg.get(setting) or 0) if setting else 0
+        if days <= 0:
+            continue
+
+        cols = db_qry(
+            "PRAGMA table_info({});".format(table), closeAfter=True, logg=logg
+        )
+        cols = [x["name"] for x in cols] if isinstance(cols, list) else []
+        dateCol = next((c for c in dateCols if c in cols), None)
+        if not dateCol:
+            continue
+
+        q = """DELETE FROM {0} WHERE rowid IN (
+                SELECT rowid FROM {0} WHERE CAST({1} AS REAL) > 0 AND CAST({1} AS REAL) < ? LIMIT ?
+            );""".format(
+            table, dateCol
+        )
+        args = (time.time() - days * 86400, batchSize)
+        deleted = 0
+        while True:
+            n = executemany(q, [args], commit=True, closeAfter=True, logg=logg)
+            if isinstance(n, str):
+                logg.error("Error pruning {}: {}".format(table, n))
+                break
+
+            deleted += n
+            if n < batchSize:
+                break
+
+            time.sleep(pause)
+
+        if deleted:
+            logg.debug(
+                "Pruned {} row(s) older than {} days from {}.".format(
+                    deleted, days, table
+                )
+            )
+            pruned.update({table: deleted})
+
+    reclaimed = reclaim_space(
+        pages=int(cfg.get("VACUUM_STEP_PAGES") or 256), pause=pause, logg=logg
+    )
+    result = {
+        "rowsDeleted": sum(pruned.values()),
+        "tables": pruned,
+        "bytesReclaimed": reclaimed,
+        "duration": round(time.time() - startTime, 3),
+    }
+    logg.info(
+        "Retention job deleted {} row(s) from {} table(s) and reclaimed {} bytes in {}s.".format(
+            result["rowsDeleted"],
+            len(pruned),
+            result["bytesReclaimed"],
+            result["duration"],
+        )
+    )
+    set_meta("lastRetention", json.dumps(result), logg=logg)
+    return result
+
+
+def reclaim_space(pages=256, pause=0.1, logg=log):
+    # Free unused pages a few at a time with incremental vacuum
+    # Returns the number of bytes returned to the filesystem
+    autoVacuum = db_qry(
+        "PRAGMA auto_vacuum;",
+        fetchone=True,
+        closeAfter=True,
+        rowType="tuple",
+        logg=logg,
+    )[0]
+    pageSize = db_qry(
+        "PRAGMA page_size;", fetchone=True, closeAfter=True, rowType="tuple", logg=logg
+    )[0]
+    if autoVacuum != 2:
+        logg.warning(
+            "Incremental vacuum is not enabled on the database (auto_vacuum={}); unable to reclaim space.".format(
+                autoVacuum
+            )
+        )
+        return 0
+
+    freed = 0
+    free = db_qry(
+        "PRAGMA freelist_count;",
+        fetchone=True,
+        closeAfter=True,
+        rowType="tuple",
+        logg=logg,
+    )[0]
+    while free:
+        # executescript steps the pragma to completion; execute() would
+        # only free one page
+        try:
+            with redball.DB_LOCK, POOL.checkout(logg=logg) as con:
+                con.executescript(
+                    "PRAGMA incremental_vacuum({});".format(min(free, pages))
+                )
+                remaining = con.execute("PRAGMA freelist_count;").fetchone()[
+                    "freelist_count"
+                ]
+        except sqlite3.Error as e:
+            logg.error("Error reclaiming free pages: {}".format(e))
+            break
+
+        if remaining >= free:
+            break
+
+        freed += free - remaining
+        free = remaining
+        time.sleep(pause)
+
+    if freed:
+        # Let the WAL shrink the main database file when nothing is reading
+        db_qry("PRAGMA wal_checkpoint(PASSIVE);", closeAfter=True, logg=logg)
+
+    return freed * pageSize
+
+
 def get_database_version(logg=log):
     result = db_qry(
         "SELECT val from rb_meta where key='dbVersion';",
@@ -444,40 +1163,107 @@ def get_database_version(logg=log):
     return int(result.get("val", 0))
 
 
+BACKUP_EXTENSIONS = {"gzip": ".gz", "lzma": ".xz"}
+BACKUP_FILE_PATTERN = re.compile(r"^redball-(auto|manual)-\d{14}\.db(\.gz|\.xz)?$")
+
+
+def remove_failed_backup(bakFile, logg=log):
+    # Don't leave a partial or corrupt copy where cleanup_db_backups() would
+    # count it as one of the backups to keep
+    try:
+        os.remove(bakFile)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logg.error("Error removing failed database backup: {}".format(e))
+
+
 def backup_database(logg=log, manual=False):
-    con = get_con()
-    bakFileName = "redball{}-{}.db".format(
-        "-manual" if manual else "-auto", datetime.today().strftime("%Y%m%d%H%M%S")
-    )
-    bak = get_con(dbFile=os.path.join(redball.DB_PATH, bakFileName))
+    # Copy the database, then verify and optionally compress the copy
+    cfg = {x["key"]: x["val"] for x in config.get_sys_config(category="Database")}
+    compression = str(cfg.get("BACKUP_COMPRESSION", "none")).lower()
+    startTime = time.time()
+    while True:
+        bakFileName = "redball{}-{}.db".format(
+            "-manual" if manual else "-auto", datetime.today().strftime("%Y%m%d%H%M%S")
+        )
+        bakFile = os.path.join(redball.DB_PATH, bakFileName)
+        if not any(
+            os.path.exists(bakFile + x) for x in [""] + list(BACKUP_EXTENSIONS.values())
+        ):
+            break
+
+        # Another backup this second; don't write over it (or remove it if
+        # this one fails)
+        time.sleep(1)
+
+    # Plain connection: the backup should stay a single self-contained file
+    bak = sqlite3.connect(bakFile)
     try:
-        con.backup(bak)
-        logg.info("Successfully created database backup [{}].".format(bakFileName))
+        with POOL.checkout(logg=logg) as con:
+            # One step, so the copy comes from a single snapshot. A paged
+            # backup starts over whenever another connection writes, which
+            # on a busy instance can be forever. In WAL mode this doesn't
+            # block writers.
+            con.backup(bak)
+
+        check = bak.execute("PRAGMA quick_check;").fetchone()[0]
     except Exception as e:
         logg.error("Error backing up database: {}".format(e))
+        bak.close()
+        remove_failed_backup(bakFile, logg=logg)
+        return False
 
-    con.close()
     bak.close()
-    cleanup_db_backups(
-        days=next(
-            (
-                x["val"]
-                for x in config.get_sys_config(category="Database")
-                if x["key"] == "BACKUP_DAYS"
-            ),
-            7,
+    if check != "ok":
+        logg.error(
+            "Database backup [{}] failed integrity check: {}".format(bakFileName, check)
+        )
+        remove_failed_backup(bakFile, logg=logg)
+        return False
+
+    size = os.path.getsize(bakFile)
+    if compression in BACKUP_EXTENSIONS:
+        try:
+            opener = gzip.open if compression == "gzip" else lzma.open
+            with open(bakFile, "rb") as f, opener(
+                bakFile + BACKUP_EXTENSIONS[compression], "wb"
+            ) as z:
+                shutil.copyfileobj(f, z, 1024 * 1024)
+
+            os.remove(bakFile)
+            bakFileName += BACKUP_EXTENSIONS[compression]
+        except Exception as e:
+            # Keep the uncompressed backup
+            logg.error("Error compressing database backup: {}".format(e))
+
+    result = {
+        "file": bakFileName,
+        "size": size,
+        "fileSize": os.path.getsize(os.path.join(redball.DB_PATH, bakFileName)),
+        "duration": round(time.time() - startTime, 3),
+    }
+    logg.info(
+        "Successfully created database backup [{}] ({} bytes on disk) in {}s.".format(
+            bakFileName, result["fileSize"], result["duration"]
         )
     )
+    set_meta("lastBackup", json.dumps(result), logg=logg)
+
+    cleanup_db_backups(days=cfg.get("BACKUP_DAYS", 7))
+    return True
 
 
 def cleanup_db_backups(logg=log, backupPath=None, days=7):
+    # Delete automatic backups (compressed or not) older than days
     if not backupPath:
         backupPath = redball.DB_PATH
 
     for f in os.listdir(backupPath):
+        m = BACKUP_FILE_PATTERN.match(f)
         if (
-            "auto" in f
-            and "manual" not in f
+            m
+            and m.group(1) == "auto"
             and os.stat(os.path.join(backupPath, f)).st_mtime
             < time.time() - days * 86400 - 60  # Include 60 second buffer
             and os.path.isfile(os.path.join(backupPath, f))
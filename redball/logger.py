@@ -2,13 +2,16 @@
 
 import logging
 import logging.handlers
+import mmap
 import os
+import re
 import sys
 import time
 
 cwd = os.path.dirname(os.path.realpath(__file__))
 pardir = os.path.abspath(os.path.join(cwd, os.pardir))
 LOG_PATH = os.path.join(pardir, "logs")
+READ_BLOCK_SIZE = 65536
 
 
 def get_logger(logger_name, log_level="INFO", propagate=False):
@@ -153,3 +156,101 @@ def init_logger(
         logger.info("Logging started!")
 
     return logger
+
+
+# Log file readers for the web UI. Debug logs can be hundreds of MB, so these
+# only ever read the part of the file that is needed. Offsets are in bytes,
+# and results only include complete lines.
+
+
+def _decode(line):
+    return line.decode("utf-8", "replace").rstrip("\r\n")
+
+
+def tail_log(path, lines=100, block_size=READ_BLOCK_SIZE):
+    # Last n lines of the file, read by seeking backward from the end
+    with open(path, "rb") as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        data = b""
+        while pos > 0 and data.count(b"\n") <= lines:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + data
+
+    # Ignore a partial line still being written
+    if not data.endswith(b"\n"):
+        end -= len(data) - data.rfind(b"\n") - 1
+        data = data[: data.rfind(b"\n") + 1]
+
+    found = data.splitlines(keepends=True)[-lines:] if lines > 0 else []
+    return {
+        "start": end - sum(len(x) for x in found),
+        "end": end,
+        "size": os.path.getsize(path),
+        "lines": [_decode(x) for x in found],
+    }
+
+
+def read_log(path, offset=0, length=READ_BLOCK_SIZE):
+    # Complete lines within length bytes from offset. If offset falls in the
+    # middle of a line, the page starts with the next one. Pass end from the
+    # result as the next offset, or start - length for the previous page.
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        offset = max(0, min(offset, size))
+        if offset > 0:
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                f.readline()
+                offset = f.tell()
+
+        f.seek(offset)
+        data = f.read(max(0, length))
+
+    # Stop at the last complete line, unless that line is longer than length.
+    # A partial line at the end of the file is still being written.
+    if not data.endswith(b"\n"):
+        cut = data.rfind(b"\n")
+        if cut != -1:
+            data = data[: cut + 1]
+        elif len(data) < length:
+            data = b""
+
+    return {
+        "start": offset,
+        "end": offset + len(data),
+        "size": size,
+        "lines": [_decode(x) for x in data.splitlines(keepends=True)],
+    }
+
+
+def grep_log(path, pattern, ignore_case=False, max_matches=1000):
+    # Generator of (offset, line) for lines matching the regex, searching a
+    # memory map of the file so it is never read into memory all at once.
+    # Raises re.error right away if the pattern is invalid.
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    regex = re.compile(pattern.encode("utf-8"), flags)
+    return _grep(path, regex, max_matches)
+
+
+def _grep(path, regex, max_matches):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            pos = 0
+            found = 0
+            while found < max_matches:
+                match = regex.search(m, pos)
+                if not match:
+                    break
+
+                start = m.rfind(b"\n", 0, match.start()) + 1
+                end = m.find(b"\n", match.end())
+                end = len(m) if end == -1 else end
+                yield start, _decode(m[start:end])
+                found += 1
+                # One result per line, and don't get stuck on empty matches
+                pos = max(end + 1, match.end() + 1)
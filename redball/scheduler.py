@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# One apscheduler BackgroundScheduler for the whole platform. Bots get a
+# JobGroup on bot.SCHEDULER instead of their own scheduler, so adding bots
+# adds jobs but not scheduler threads or worker pools.
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.background import BackgroundScheduler
+from threading import Lock
+import tzlocal
+import uuid
+
+import redball
+from redball import logger
+
+log = logger.get_logger(
+    logger_name="redball.scheduler", log_level="DEBUG", propagate=True
+)
+
+MAX_WORKERS = 20
+"""Threads shared by all scheduled jobs"""
+JOB_DEFAULTS = {
+    # Run a job once, not once per missed run time, if it falls behind
+    "coalesce": True,
+    # Skip a run that couldn't start within this many seconds of its time
+    "misfire_grace_time": 60,
+    "max_instances": 1,
+}
+SCHEDULER_LOCK = Lock()
+
+
+def get_scheduler():
+    # The platform scheduler, started on first use
+    with SCHEDULER_LOCK:
+        if redball.SCHEDULER is None:
+            redball.SCHEDULER = BackgroundScheduler(
+                executors={"default": ThreadPoolExecutor(MAX_WORKERS)},
+                job_defaults=JOB_DEFAULTS,
+                timezone=tzlocal.get_localzone()
+                if str(tzlocal.get_localzone()) != "local"
+                else "America/New_York",
+            )
+            redball.SCHEDULER.start()
+            log.debug(
+                "Started scheduler with {} worker(s) and job defaults: {}".format(
+                    MAX_WORKERS, JOB_DEFAULTS
+                )
+            )
+
+        return redball.SCHEDULER
+
+
+class JobGroup(object):
+    # The part of the platform scheduler belonging to one bot. Supports the
+    # BackgroundScheduler methods bots use; job ids are prefixed with the
+    # group name so they can't collide with other bots' jobs.
+    def __init__(self, name):
+        self.name = name
+        self.jobIds = set()
+        self.lock = Lock()
+
+    def __repr__(self):
+        return "<JobGroup {} ({} job(s))>".format(self.name, len(self.jobIds))
+
+    def add_job(self, func, trigger=None, **kwargs):
+        kwargs.update(
+            {"id": "{}:{}".format(self.name, kwargs.get("id") or uuid.uuid4().hex)}
+        )
+        job = get_scheduler().add_job(func, trigger, **kwargs)
+        with self.lock:
+            self.jobIds.add(job.id)
+
+        return job
+
+    def get_jobs(self):
+        sch = get_scheduler()
+        jobs = []
+        with self.lock:
+            for jobId in list(self.jobIds):
+                job = sch.get_job(jobId)
+                if job:
+                    jobs.append(job)
+                else:
+                    # Finished (e.g. a one-off date job) or removed directly
+                    self.jobIds.discard(jobId)
+
+        return jobs
+
+    def get_job(self, jobId):
+        return get_scheduler().get_job("{}:{}".format(self.name, jobId))
+
+    def remove_job(self, jobId):
+        jobId = "{}:{}".format(self.name, jobId)
+        get_scheduler().remove_job(jobId)
+        with self.lock:
+            self.jobIds.discard(jobId)
+
+    def remove_all_jobs(self):
+        sch = get_scheduler()
+        with self.lock:
+            for jobId in self.jobIds:
+                try:
+                    sch.remove_job(jobId)
+                except JobLookupError:
+                    pass
+
+            self.jobIds.clear()
+
+    def shutdown(self, wait=True):
+        # The scheduler is shared, so only this group's jobs go away. Jobs
+        # that are already running are left to finish.
+        self.remove_all_jobs()
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from redball import database, logger
+from redball import config, database, logger
 import time
 
 log = logger.get_logger(
@@ -17,6 +17,7 @@ def upgrade_database(toVer=None):
 
     if fromVer == toVer:
         log.info("Database is up to date (version: {})!".format(fromVer))
+        upgrade_indexes()
         return True
     elif fromVer > toVer:
         log.warning(
@@ -30,10 +31,12 @@ def upgrade_database(toVer=None):
             "Current database version {}; desired version: {}.".format(fromVer, toVer)
         )
         log.info("Creating a backup of the database...")
-        database.backup_database(logg=log, manual=False)
+        if not database.backup_database(logg=log, manual=False):
+            log.critical(
+                "Database backup failed. Not upgrading the database without a good backup."
+            )
+            return False
 
-        con = database.get_con(logg=log)
-        cur = database.get_cur(con=con, logg=log)
         while fromVer < toVer:
             # Apply upgrade scripts one version at a time until the database is up-to-date
             log.info(
@@ -41,28 +44,33 @@ def upgrade_database(toVer=None):
                     fromVer, fromVer + 1
                 )
             )
+            results = None
             if len(upgradeScripts.get(fromVer + 1, [])) > 0:
-                results = database.db_qry(
-                    query=upgradeScripts[fromVer + 1],
-                    con=con,
-                    cur=cur,
-                    commit=False,
-                    closeAfter=False,
-                    logg=log,
-                )
-                if None in results:
-                    log.error(
-                        "One or more database upgrade queries failed: {}".format(
-                            results
-                        )
+                # One transaction per version, so a failed script leaves
+                # nothing behind, schema changes included
+                with database.transaction(logg=log) as con:
+                    results = database.db_qry(
+                        query=upgradeScripts[fromVer + 1],
+                        con=con,
+                        commit=True,
+                        logg=log,
                     )
-                    # Upgrade scripts failed. Do not commit and do not continue.
-                    return False
-                else:
-                    con.commit()
-                    fromVer += 1
-                    log.debug("Database upgraded to version {}.".format(fromVer))
+                    if database.query_failed(results):
+                        raise database.Rollback()
 
+            if database.query_failed(results):
+                log.error(
+                    "One or more database upgrade queries failed: {}".format(results)
+                )
+                # Upgrade scripts failed and were rolled back. Do not continue.
+                config.invalidate_sys_config()
+                return False
+            else:
+                fromVer += 1
+                log.debug("Database upgraded to version {}.".format(fromVer))
+
+        con = database.get_con(logg=log)
+        cur = database.get_cur(con=con, logg=log)
         if origVer != toVer:
             # Upgrade happened, so let's clean up the db and run an integrity check
             database.db_qry(
@@ -83,10 +91,22 @@ def upgrade_database(toVer=None):
             )
 
         con.close()
+        # Upgrade scripts add and change rb_config rows
+        config.invalidate_sys_config()
+        upgrade_indexes()
         log.debug("Database upgrade process is complete.")
         return True
 
 
+def upgrade_indexes():
+    # Add indexes to existing bot-owned tables. Bots also do this for their
+    # own tables in build_tables(), but that only happens when the bot starts.
+    indexes = database.ensure_indexes(logg=log)
+    log.debug("Bot table indexes: {}".format(indexes))
+    for x in database.explain_query_plans(logg=log):
+        log.debug("Query plan for [{}]: {}".format(x["query"], x["plan"]))
+
+
 upgradeScripts = {
     1: [
         "UPDATE rb_meta SET val='1', lastUpdate='{}' WHERE key='dbVersion';".format(
@@ -467,4 +487,88 @@ upgradeScripts = {
             time.time()
         ),
     ],
+    16: [
+        # Add system config settings: category: Database, keys: JOURNAL_MODE, BUSY_TIMEOUT, SYNCHRONOUS
+        """INSERT OR IGNORE INTO rb_config (category, key, description, type, val, options, subkeys, parent_key, read_only)
+            VALUES
+                ('Database', 'JOURNAL_MODE', 'Journal mode (WAL lets the web UI and bots read while another bot is writing)', 'str', '"WAL"', '["WAL","DELETE","OFF"]', '[]', '', 'False'),
+                ('Database', 'BUSY_TIMEOUT', 'Milliseconds to wait for a busy database before failing a query', 'int', 30000, '[]', '[]', '', 'False'),
+                ('Database', 'SYNCHRONOUS', 'Synchronous mode (NORMAL is safe with WAL; FULL is slower but survives power loss)', 'str', '"NORMAL"', '["OFF","NORMAL","FULL"]', '[]', '', 'False')
+        ;""",
+        # Update DB version
+        "UPDATE rb_meta SET val='16', lastUpdate='{}' WHERE key='dbVersion';".format(
+            time.time()
+        ),
+    ],
+    17: [
+        # Add system config setting: category: Database, key: SLOW_QUERY_MS
+        """INSERT OR IGNORE INTO rb_config (category, key, description, type, val, options, subkeys, parent_key, read_only)
+            VALUES
+                ('Database', 'SLOW_QUERY_MS', 'Log a warning for queries taking at least this many milliseconds, including time waiting for the database lock (0 to disable)', 'int', 1000, '[]', '[]', '', 'False')
+        ;""",
+        # Update DB version
+        "UPDATE rb_meta SET val='17', lastUpdate='{}' WHERE key='dbVersion';".format(
+            time.time()
+        ),
+    ],
+    18: [
+        # Add system config settings: category: Database, keys: RETENTION_*_DAYS, VACUUM_STEP_PAGES
+        """INSERT OR IGNORE INTO rb_config (category, key, description, type, val, options, subkeys, parent_key, read_only)
+            VALUES
+                ('Database', 'RETENTION_THREAD_EDITS_DAYS', 'Delete bot thread edit/check counts not updated for N days (0 to keep forever)', 'int', 30, '[]', '[]', '', 'False'),
+                ('Database', 'RETENTION_PROCESSEDATBATS_DAYS', 'Delete game thread processed at-bat records not updated for N days (0 to keep forever)', 'int', 30, '[]', '[]', '', 'False'),
+                ('Database', 'RETENTION_COMMENTS_DAYS', 'Delete bot comment history older than N days (0 to keep forever)', 'int', 180, '[]', '[]', '', 'False'),
+                ('Database', 'RETENTION_POSTS_DAYS', 'Delete duplicate link removal post history older than N days (0 to keep forever)', 'int', 0, '[]', '[]', '', 'False'),
+                ('Database', 'VACUUM_STEP_PAGES', 'Database pages to free per step when reclaiming space after the nightly retention job', 'int', 256, '[]', '[]', '', 'False')
+        ;""",
+        # Takes effect when the database is vacuumed at the end of the upgrade
+        "PRAGMA auto_vacuum = INCREMENTAL;",
+        # Update DB version
+        "UPDATE rb_meta SET val='18', lastUpdate='{}' WHERE key='dbVersion';".format(
+            time.time()
+        ),
+    ],
+    19: [
+        # Add system config setting: category: Database, key: BACKUP_COMPRESSION
+        """INSERT OR IGNORE INTO rb_config (category, key, description, type, val, options, subkeys, parent_key, read_only)
+            VALUES
+                ('Database', 'BACKUP_COMPRESSION', 'Compress database backups (gzip is faster, lzma is smaller)', 'str', '"gzip"', '["none","gzip","lzma"]', '[]', '', 'False')
+        ;""",
+        # Update DB version
+        "UPDATE rb_meta SET val='19', lastUpdate='{}' WHERE key='dbVersion';".format(
+            time.time()
+        ),
+    ],
+    20: [
+        # Add system config setting: category: Web/Security, key: TEMPLATE_WARMUP
+        """INSERT OR IGNORE INTO rb_config (category, key, description, type, val, options, subkeys, parent_key, read_only)
+            VALUES
+                ('Web/Security', 'TEMPLATE_WARMUP', 'Compile web templates when the web server starts instead of on first use', 'bool', 'true', '[true, false]', '[]', '', 'False')
+        ;""",
+        # Update DB version
+        "UPDATE rb_meta SET val='20', lastUpdate='{}' WHERE key='dbVersion';".format(
+            time.time()
+        ),
+    ],
+    21: [
+        # Add run mode to bot types: thread (default) or process
+        "ALTER TABLE rb_botTypes ADD COLUMN runMode text default 'thread';",
+        # Update DB version
+        "UPDATE rb_meta SET val='21', lastUpdate='{}' WHERE key='dbVersion';".format(
+            time.time()
+        ),
+    ],
+    22: [
+        # Add system config settings: category: Bots, keys: LAUNCH_CONCURRENCY, LAUNCH_SPACING, LAUNCH_JITTER
+        """INSERT OR IGNORE INTO rb_config (category, key, description, type, val, options, subkeys, parent_key, read_only)
+            VALUES
+                ('Bots', 'LAUNCH_CONCURRENCY', 'Auto-run bots the launcher starts at the same time (1 to start them one at a time)', 'int', 4, '[]', '[]', '', 'False'),
+                ('Bots', 'LAUNCH_SPACING', 'Seconds between auto-run bot launches', 'int', 5, '[]', '[]', '', 'False'),
+                ('Bots', 'LAUNCH_JITTER', 'Up to this many random seconds added to the spacing between auto-run bot launches', 'int', 5, '[]', '[]', '', 'False')
+        ;""",
+        # Update DB version
+        "UPDATE rb_meta SET val='22', lastUpdate='{}' WHERE key='dbVersion';".format(
+            time.time()
+        ),
+    ],
 }
@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 
 import binascii
-from datetime import datetime, timedelta
+from collections import OrderedDict
 import hashlib
+import hmac
 import json
 import os
+import sqlite3
+from threading import Lock
 import time
 
 import redball
@@ -12,6 +15,19 @@ from redball import config, database, logger
 
 log = logger.get_logger(logger_name="redball.user", log_level="DEBUG", propagate=True)
 
+AUTH_CACHE = OrderedDict()
+"""Successful basic auth checks: {userid: (uid, credential digest, expires)}"""
+AUTH_CACHE_LOCK = Lock()
+AUTH_CACHE_KEY = os.urandom(32)
+AUTH_CACHE_SIZE = 256
+AUTH_CACHE_TTL = 300
+
+APIKEY_CACHE = {}
+"""API key -> rb_users row for keys that have been used, see get_apikey_user()"""
+APIKEY_CACHE_LOCK = Lock()
+APIKEY_CACHE_STATE = {"generation": 0}
+"""Bumped by invalidate_apikey_cache(), so a lookup that overlapped it isn't cached"""
+
 
 def hash_password(pw, salt=None):
     # Much of this came from https://www.vitoshacademy.com/hashing-passwords-in-python/
@@ -30,11 +46,43 @@ def check_password(pw, hash):
     return hash_password(pw, hash[:64]) == hash
 
 
+def credential_digest(password):
+    # Keyed digest of a password, only held in memory by AUTH_CACHE
+    return hmac.new(AUTH_CACHE_KEY, password.encode("utf-8"), "sha256").digest()
+
+
+def invalidate_auth_cache(userid=None, uid=None):
+    # Forget cached basic auth checks for a user, or everyone
+    with AUTH_CACHE_LOCK:
+        if userid is None and uid is None:
+            AUTH_CACHE.clear()
+            return
+
+        for k in [
+            k
+            for k, v in AUTH_CACHE.items()
+            if k == userid or (uid is not None and str(v[0]) == str(uid))
+        ]:
+            AUTH_CACHE.pop(k)
+
+
 def validate_password(realm, username, password):
     """This method is used for basic authentication
     """
-    hash = get_user_info(userid=username, field="password")
-    if check_password(password, hash):
+    digest = credential_digest(password)
+    with AUTH_CACHE_LOCK:
+        cached = AUTH_CACHE.get(username)
+        if (
+            cached
+            and cached[2] > time.time()
+            and hmac.compare_digest(cached[1], digest)
+        ):
+            AUTH_CACHE.move_to_end(username)
+            return True
+
+    info = get_user_info(userid=username) if username else {}
+    hash = info.get("password", "")
+    if hash and check_password(password, hash):
         log.debug(
             "User {} successfully authenticated for access to the web UI.".format(
                 username
@@ -48,6 +96,17 @@ def validate_password(realm, username, password):
             )
             return False
         else:
+            if AUTH_CACHE_TTL > 0:
+                with AUTH_CACHE_LOCK:
+                    AUTH_CACHE[username] = (
+                        info["id"],
+                        digest,
+                        time.time() + AUTH_CACHE_TTL,
+                    )
+                    AUTH_CACHE.move_to_end(username)
+                    while len(AUTH_CACHE) > AUTH_CACHE_SIZE:
+                        AUTH_CACHE.popitem(last=False)
+
             return True
 
 
@@ -75,9 +134,19 @@ def get_user_info(userid=None, apikey=None, uid=None, field=None, sensitive=True
         q += " AND apikey=?"
         local_args += (apikey,)
 
-    result = database.db_qry(
-        (q, local_args), fetchone=True if len(local_args) > 0 else False, logg=log
-    )
+    if field and len(local_args):
+        # Only one column is needed, so skip building a dict
+        result = database.db_qry(
+            (q, local_args), fetchone=True, rowType="row", logg=log
+        )
+        if isinstance(result, sqlite3.Row):
+            default = "[]" if field == "privileges" else ""
+            return result[field] if field in result.keys() else default
+    else:
+        result = database.db_qry(
+            (q, local_args), fetchone=True if len(local_args) > 0 else False, logg=log
+        )
+
     if isinstance(result, dict):
         if field == "privileges":
             return result.get(field, "[]")
@@ -99,6 +168,34 @@ def get_user_info(userid=None, apikey=None, uid=None, field=None, sensitive=True
             return {}
 
 
+def get_apikey_user(apikey):
+    # get_user_info(apikey=apikey), cached until a user or their privileges change
+    if apikey in ["", None]:
+        return {}
+
+    u = APIKEY_CACHE.get(apikey)
+    if u is None:
+        generation = APIKEY_CACHE_STATE["generation"]
+        u = get_user_info(apikey=apikey)
+        if not isinstance(u, dict) or u.get("apikey") != apikey:
+            # Unknown keys are not cached
+            return {}
+
+        with APIKEY_CACHE_LOCK:
+            # The row may be stale if the cache was invalidated while it
+            # was being read; use it this once, but don't cache it
+            if APIKEY_CACHE_STATE["generation"] == generation:
+                APIKEY_CACHE[apikey] = u
+
+    return dict(u)
+
+
+def invalidate_apikey_cache():
+    with APIKEY_CACHE_LOCK:
+        APIKEY_CACHE_STATE["generation"] += 1
+        APIKEY_CACHE.clear()
+
+
 def create_user(**kwargs):
     con = database.get_con()
     cur = database.get_cur(con)
@@ -205,15 +302,31 @@ def update_user(id, **kwargs):
 
     query = (q, local_args)
     result = database.db_qry(query, commit=True, closeAfter=True)
+    invalidate_auth_cache(uid=id)
+    invalidate_apikey_cache()
+    invalidate_privileges()
     if isinstance(result, str):
         return result
     else:
         return True
 
 
+def update_password(id, password):
+    query = (
+        "UPDATE rb_users set password=?, lastUpdate=? where id=?;",
+        (hash_password(password), time.time(), int(id)),
+    )
+    result = database.db_qry(query, commit=True, closeAfter=True)
+    invalidate_auth_cache(uid=id)
+    return result
+
+
 def delete_user(id):
     query = ("DELETE FROM rb_users WHERE id=?;", (id,))
     result = database.db_qry(query, commit=True, closeAfter=True)
+    invalidate_auth_cache(uid=id)
+    invalidate_apikey_cache()
+    invalidate_privileges()
     return result
 
 
@@ -233,6 +346,68 @@ def refresh_user_privileges(userid):
             "privDate": time.time(),
         }
     )
+    redball.LOGGED_IN_USERS[userid].pop("PRIVSET", None)
+
+
+def invalidate_privileges(userid=None):
+    # Force privileges to be reloaded and recompiled on the next check
+    # for one logged in user, or all of them. API users who aren't logged
+    # in get their privileges from the api key cache, so clear that too.
+    for k, v in list(redball.LOGGED_IN_USERS.items()):
+        if userid is None or k == userid:
+            v.pop("PRIVSET", None)
+            v.pop("privDate", None)
+
+    invalidate_apikey_cache()
+
+
+def compile_privileges(privs):
+    # Expand a user's privileges into the set of everything they imply,
+    # so check_privilege() only needs set lookups
+    if isinstance(privs, str):
+        privs = json.loads(privs) if privs else []
+
+    compiled = set(privs)
+    for p in privs:
+        if p[-2:] == "rw":
+            # read-write implies read-only and startstop for the same object
+            compiled.update([p[:-2] + "ro", p[:-2] + "startstop"])
+        elif p[-9:] == "startstop":
+            # startstop implies read-only
+            compiled.add(p[:-9] + "ro")
+
+    for suffix in ["_ro", "_rw", "_startstop"]:
+        if all(
+            "rb_bot_{}{}".format(b.id, suffix) in compiled
+            for b in list(redball.BOTS.values())
+        ):
+            # Required privilege for all bots individually
+            # satisfies the requirement for bot_all
+            compiled.add("rb_bot_all" + suffix)
+
+    return frozenset(compiled)
+
+
+def get_compiled_privileges(userid, refresh=False):
+    # Compiled privileges for a logged in user, recompiled after
+    # invalidate_privileges() or when bots are added or removed
+    u = redball.LOGGED_IN_USERS.get(userid)
+    if u is None:
+        return frozenset()
+
+    if refresh or not u.get("privDate"):
+        log.debug("Refreshing privileges...")
+        refresh_user_privileges(userid)
+
+    if u.get("PRIVSET") is None or u.get("botCount") != len(redball.BOTS):
+        u.update(
+            {
+                "PRIVSET": compile_privileges(u.get("PRIVS", [])),
+                "botCount": len(redball.BOTS),
+            }
+        )
+
+    return u["PRIVSET"]
 
 
 def check_privilege(userid, privilege, refresh=False, checkAll=True):
@@ -252,66 +427,21 @@ def check_privilege(userid, privilege, refresh=False, checkAll=True):
     if userid is None or privilege in ["", None]:
         return False
 
-    if (
-        refresh
-        or not redball.LOGGED_IN_USERS.get(userid, {}).get("PRIVS")
-        or datetime.fromtimestamp(
-            redball.LOGGED_IN_USERS.get(userid, {}).get("privDate")
-        )
-        <= datetime.today() - timedelta(seconds=3)
-    ):
-        log.debug("Refreshing privileges...")
-        refresh_user_privileges(userid)
-
+    privs = get_compiled_privileges(userid, refresh)
     log.debug("checking user {} privilege: {}".format(userid, privilege))  # debug
-    if privilege in redball.LOGGED_IN_USERS[userid]["PRIVS"]:
-        # User has the exact privilege required
-        return True
-    elif (
-        (
-            privilege[-2:] == "ro"
-            and privilege[:-2] + "rw" in redball.LOGGED_IN_USERS[userid]["PRIVS"]
-        )
-        or (
-            privilege[-2:] == "ro"
-            and privilege[:-2] + "startstop" in redball.LOGGED_IN_USERS[userid]["PRIVS"]
-        )
-        or (
-            privilege[-9:] == "startstop"
-            and privilege[:-9] + "rw" in redball.LOGGED_IN_USERS[userid]["PRIVS"]
-        )
-    ):
-        # User has the read-write privilege for the object
-        # where read-only or startstop privilege is required
-        # or user has startstop privilege where read-only is required
+    if privilege in privs:
+        # User has the exact privilege required, or one that implies it
         return True
     elif (
         checkAll
         and privilege.startswith("rb_bot_")
         and "all" not in privilege
         and "create" not in privilege
-        and check_privilege(
-            userid, "rb_bot_all" + privilege[7 + privilege[7:].find("_") :]
-        )
+        and "rb_bot_all" + privilege[7 + privilege[7:].find("_") :] in privs
     ):
         # User has required privilege for all bots, including the required bot
         return True
-    elif privilege.startswith("rb_bot_all") and sum(
-        1
-        for x in redball.BOTS.keys()
-        if check_privilege(
-            userid,
-            "rb_bot_{}{}".format(redball.BOTS[x].id, privilege[10:]),
-            checkAll=False,
-        )
-    ) == len(redball.BOTS.keys()):
-        # User has required privilege for all bots individually
-        # which satisfies the requirement for bot_all
-        return True
-    elif (
-        privilege not in ["rb_api", "rb_web"]
-        and "rb_admin" in redball.LOGGED_IN_USERS[userid]["PRIVS"]
-    ):
+    elif privilege not in ["rb_api", "rb_web"] and "rb_admin" in privs:
         # User has admin privilege which gives full access to all
         # except api and web UI which must be allowed separately
         return True
@@ -351,9 +481,12 @@ def remove_privilege(privilege):
         database.db_qry(
             queries, con=con, cur=cur, commit=True, closeAfter=True, logg=log
         )
+        invalidate_auth_cache()
     else:
         con.close()
 
+    invalidate_privileges()
+
 
 def get_privileges():
     # Return list of privileges from rb_privileges
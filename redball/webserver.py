@@ -1,13 +1,20 @@
 #!/usr/bin/env python
 
 import cherrypy
+import email.utils
+import gzip
+import hashlib
 import json
+import mimetypes
 import os
+import re
 import sys
+import threading
 import time
 import traceback
 import urllib.parse
 import uuid
+import weakref
 
 from mako.lookup import TemplateLookup
 from mako import exceptions
@@ -20,10 +27,97 @@ log = logger.get_logger(
 )
 
 
+TEMPLATE_LOOKUP = None
+EVENT_STREAMS = {"count": 0}
+EVENT_STREAMS_LOCK = threading.Lock()
+MAX_EVENT_STREAMS = 20
+EVENT_STREAM_KEEPALIVE = 15
+EVENT_STREAM_LIFETIME = 600
+ETAG_SALT = uuid.uuid4().hex
+"""Mixed into ETags, since resource versions start over when redball restarts"""
+GZIP_MIN_SIZE = 1024
+"""Dynamic responses smaller than this are sent uncompressed"""
+GZIP_MIME_TYPES = [
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/json",
+    "text/plain",
+]
+STATIC_VERSIONS = {}
+STATIC_GZIP = {}
+STATIC_MAX_AGE = 31536000
+LOG_VIEW_MAX_LINES = 5000
+LOG_VIEW_MAX_BYTES = 1048576
+LOG_VIEW_MAX_MATCHES = 10000
+LOG_FOLLOW_INTERVAL = 1
+
+
+def open_event_stream():
+    """Reserve one of MAX_EVENT_STREAMS; returns a function that frees it
+    again (safe to call more than once), or None if they are all in use
+    """
+    with EVENT_STREAMS_LOCK:
+        if EVENT_STREAMS["count"] >= MAX_EVENT_STREAMS:
+            return None
+
+        EVENT_STREAMS["count"] += 1
+
+    reserved = [True]
+
+    def release():
+        with EVENT_STREAMS_LOCK:
+            if reserved[0]:
+                reserved[0] = False
+                EVENT_STREAMS["count"] -= 1
+
+    return release
+
+
+def event_stream(gen, release):
+    # Free the stream when the generator finishes, or when it is discarded
+    # without ever being started (its finally block wouldn't run then)
+    weakref.finalize(gen, release)
+    return gen
+
+
+def init_templates(warmup=False):
+    """Create the shared template lookup, compiling templates to modules
+    under the data directory, and optionally precompile all templates
+    """
+    global TEMPLATE_LOOKUP
+    TEMPLATE_LOOKUP = TemplateLookup(
+        directories=[redball.TEMPLATE_PATH],
+        module_directory=os.path.join(redball.DB_PATH, "cache", "templates"),
+        # Only look for changed templates in dev mode
+        filesystem_checks=redball.DEV,
+    )
+    if warmup:
+        start = time.time()
+        templates = [
+            f for f in os.listdir(redball.TEMPLATE_PATH) if f.endswith(".mako")
+        ]
+        for f in templates:
+            try:
+                TEMPLATE_LOOKUP.get_template(f)
+            except Exception as e:
+                log.error("Error compiling template {}: {}".format(f, e))
+
+        log.debug(
+            "Compiled {} templates in {:.3f}s.".format(
+                len(templates), time.time() - start
+            )
+        )
+
+    return TEMPLATE_LOOKUP
+
+
 def serve_page(templateName, **kwargs):
     """Look up and render template
     """
-    lookup = TemplateLookup(directories=[redball.TEMPLATE_PATH])
+    lookup = TEMPLATE_LOOKUP or init_templates()
     try:
         template = lookup.get_template(templateName)
         return template.render(**kwargs)
@@ -39,6 +133,203 @@ def serve_page(templateName, **kwargs):
             return lookup.get_template("error.mako").render(**args)
 
 
+def make_etag(*parts):
+    """Strong ETag for a response that depends on the given parts
+    """
+    key = json.dumps([ETAG_SALT] + list(parts), sort_keys=True, default=str)
+    return '"{}"'.format(hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+
+def check_etag(etag, modified=None):
+    """Set ETag (and Last-Modified) headers for the response. If the client
+    already has the current version, set 304 status and return True.
+    """
+    cherrypy.response.headers["ETag"] = etag
+    if modified:
+        cherrypy.response.headers["Last-Modified"] = email.utils.formatdate(
+            modified, usegmt=True
+        )
+
+    inm = cherrypy.request.headers.get("If-None-Match")
+    ims = cherrypy.request.headers.get("If-Modified-Since")
+    if inm:
+        # Proxies may have weakened the tag (e.g. when compressing)
+        tags = [t.strip().replace("W/", "", 1) for t in inm.split(",")]
+        current = "*" in tags or etag in tags
+        if not current and gzip_etag(etag) in tags:
+            # Client has the compressed representation
+            cherrypy.response.headers["ETag"] = gzip_etag(etag)
+            current = True
+    elif ims and modified:
+        try:
+            since = email.utils.parsedate_to_datetime(ims).timestamp()
+            current = int(modified) <= since
+        except (TypeError, ValueError):
+            current = False
+    else:
+        current = False
+
+    if current:
+        cherrypy.response.status = 304
+
+    return current
+
+
+def gzip_etag(etag):
+    """ETag for the gzip-encoded representation of a response
+    """
+    return etag[:-1] + '-gzip"' if etag.endswith('"') else etag
+
+
+def accepts_gzip():
+    """Check if the client accepts gzip content coding
+    """
+    for coding in cherrypy.request.headers.elements("Accept-Encoding"):
+        if coding.value in ("gzip", "x-gzip"):
+            return coding.qvalue > 0
+
+    return False
+
+
+def compress_response(min_size=GZIP_MIN_SIZE, compress_level=5, mime_types=None):
+    """Gzip the response body if the client accepts it, the content type is
+    compressible, and the body is at least min_size bytes
+    """
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+    # Skip static files (handled by serve_static), event streams,
+    # and anything already encoded
+    if (
+        request.handler is None
+        or response.stream
+        or "Content-Encoding" in response.headers
+    ):
+        return
+
+    ct = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if ct not in (mime_types or GZIP_MIME_TYPES):
+        return
+
+    cherrypy.lib.set_vary_header(response, "Accept-Encoding")
+    if not response.body or not accepts_gzip():
+        return
+
+    body = response.collapse_body()
+    if len(body) < min_size:
+        return
+
+    response.body = gzip.compress(body, compress_level)
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Content-Length"] = str(len(response.body[0]))
+    if response.headers.get("ETag"):
+        response.headers["ETag"] = gzip_etag(response.headers["ETag"])
+
+
+def static_version(filename):
+    """Short content hash of a static file, cached until the file changes
+    """
+    try:
+        mtime = os.path.getmtime(filename)
+    except OSError:
+        return None
+
+    cached = STATIC_VERSIONS.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(filename, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:12]
+
+    STATIC_VERSIONS.update({filename: (mtime, version)})
+    return version
+
+
+def static_url(path):
+    """URL for a file under the web root, including a content hash so it can
+    be cached indefinitely, e.g. /css/style.css?v=0123456789ab
+    """
+    version = static_version(
+        os.path.join(redball.WEB_ROOT, *path.strip("/").split("/"))
+    )
+    return "{}?v={}".format(path, version) if version else path
+
+
+def precompress_static():
+    """Write gzipped copies of compressible static files to the data
+    directory, so they don't have to be compressed on every request
+    """
+    cacheDir = os.path.join(redball.DB_PATH, "cache", "static")
+    for dirName in ["css", "img"]:
+        staticDir = os.path.join(redball.WEB_ROOT, dirName)
+        if not os.path.isdir(staticDir):
+            continue
+
+        for f in os.listdir(staticDir):
+            filename = os.path.join(staticDir, f)
+            if (
+                not os.path.isfile(filename)
+                or mimetypes.guess_type(filename)[0] not in GZIP_MIME_TYPES
+            ):
+                continue
+
+            gzFile = os.path.join(cacheDir, dirName, f + ".gz")
+            try:
+                mtime = os.path.getmtime(filename)
+                if not os.path.isfile(gzFile) or os.path.getmtime(gzFile) != mtime:
+                    os.makedirs(os.path.dirname(gzFile), exist_ok=True)
+                    with open(filename, "rb") as src, open(gzFile, "wb") as dst:
+                        dst.write(gzip.compress(src.read(), 9, mtime=0))
+
+                    # Match the original so Last-Modified is the same either way
+                    os.utime(gzFile, (mtime, mtime))
+
+                STATIC_GZIP.update({filename: gzFile})
+            except Exception as e:
+                log.error("Error precompressing static file {}: {}".format(f, e))
+
+
+def serve_static(section, dir):
+    """Serve a file from dir, using the precompressed copy if the client
+    accepts gzip. Files requested with the current content hash (see
+    static_url) are cacheable forever; anything else must be revalidated.
+    """
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+    branch = urllib.parse.unquote(
+        request.path_info[len(section.rstrip("/")) + 1 :].lstrip("/")
+    )
+    filename = os.path.normpath(os.path.join(dir, branch))
+    if not filename.startswith(os.path.normpath(dir) + os.sep):
+        raise cherrypy.HTTPError(403)
+    elif not os.path.isfile(filename):
+        return False
+
+    v = request.params.get("v")
+    if v and v == static_version(filename):
+        response.headers["Cache-Control"] = "public, max-age={}, immutable".format(
+            STATIC_MAX_AGE
+        )
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+
+    content_type = mimetypes.guess_type(filename)[0]
+    gzFile = STATIC_GZIP.get(filename)
+    if gzFile:
+        cherrypy.lib.set_vary_header(response, "Accept-Encoding")
+        # Skip a stale copy if the file changed since startup
+        if (
+            accepts_gzip()
+            and os.path.isfile(gzFile)
+            and os.path.getmtime(gzFile) == os.path.getmtime(filename)
+        ):
+            response.headers["Content-Encoding"] = "gzip"
+            filename = gzFile
+
+    cherrypy.lib.static.serve_file(filename, content_type=content_type)
+    request.handler = None
+    return True
+
+
 def init_webserver(port=None):
     webSettings = rbConfig.get_sys_config(category="Web/Security")
     proxy_on = next(x["val"] for x in webSettings if x["key"] == "HTTP_PROXY")
@@ -58,6 +349,12 @@ def init_webserver(port=None):
         next(int(x["val"]) for x in webSettings if x["key"] == "SESSION_TIMEOUT") * 60
     )
     secure_cookies = (proxy_on or https_on or http_disallow)
+    precompress_static()
+    init_templates(
+        warmup=next(
+            (x["val"] for x in webSettings if x["key"] == "TEMPLATE_WARMUP"), True
+        )
+    )
     log.info(
         "Starting web server on port {} with web root: {}{}{}...".format(
             socket_port,
@@ -70,7 +367,8 @@ def init_webserver(port=None):
         "global": {
             "server.socket_host": "0.0.0.0",
             "server.socket_port": socket_port,
-            "server.thread_pool": 10,
+            # Each open event stream (bot status, log follow) holds a thread
+            "server.thread_pool": 10 + MAX_EVENT_STREAMS,
             "engine.autoreload.on": False,
             "log.screen": False,
             "log.access_file": "",
@@ -88,6 +386,7 @@ def init_webserver(port=None):
             "tools.encode.on": True,
             "tools.decode.on": True,
             "tools.encode.encoding": "utf-8",
+            "tools.compress.on": True,
         },
         "/favicon.ico": {
             "tools.staticfile.on": True,
@@ -100,16 +399,19 @@ def init_webserver(port=None):
             "tools.sessions.on": False,
         },
         "/images": {
-            "tools.staticdir.on": True,
-            "tools.staticdir.dir": os.path.join(redball.WEB_ROOT, "img"),
+            "tools.static.on": True,
+            "tools.static.section": "/images",
+            "tools.static.dir": os.path.join(redball.WEB_ROOT, "img"),
         },
         "/img": {
-            "tools.staticdir.on": True,
-            "tools.staticdir.dir": os.path.join(redball.WEB_ROOT, "img"),
+            "tools.static.on": True,
+            "tools.static.section": "/img",
+            "tools.static.dir": os.path.join(redball.WEB_ROOT, "img"),
         },
         "/css": {
-            "tools.staticdir.on": True,
-            "tools.staticdir.dir": os.path.join(redball.WEB_ROOT, "css"),
+            "tools.static.on": True,
+            "tools.static.section": "/css",
+            "tools.static.dir": os.path.join(redball.WEB_ROOT, "css"),
         },
     }
 
@@ -133,6 +435,7 @@ def init_webserver(port=None):
             "tools.sessions.on": False,
             "tools.response_headers.on": True,
             "tools.response_headers.headers": [("Content-Type", "text/json")],
+            "tools.compress.on": True,
         }
     }
     cherrypy.config.update(global_conf)
@@ -245,6 +548,10 @@ def handle_error(**kwargs):
 
 class WebInterface(object):
     cherrypy.tools.auth = cherrypy.Tool("before_handler", check_auth)
+    cherrypy.tools.compress = cherrypy.Tool(
+        "before_finalize", compress_response, priority=80
+    )
+    cherrypy.tools.static = cherrypy.Tool("before_handler", serve_static)
 
     @cherrypy.expose()
     def login(self, r=None, i=None, e=None, *args, **kwargs):
@@ -520,6 +827,7 @@ class WebInterface(object):
                             ),
                         )
                         database.db_qry(q, commit=True, closeAfter=True)
+                        user.invalidate_privileges(cherrypy.session.get("_cp_username"))
         elif kwargs.get("action") == "delete" and bot_id:
             if not user.check_privilege(
                 cherrypy.session.get("_cp_username"),
@@ -869,28 +1177,50 @@ class WebInterface(object):
     @cherrypy.expose()
     @cherrypy.tools.auth()
     def botstatus(self, botId=None):
+        u = cherrypy.session.get("_cp_username")
+        if check_etag(
+            make_etag(
+                "botstatus",
+                botId,
+                u,
+                hash(user.get_compiled_privileges(u)),
+                rbConfig.get_resource_version("bots")[0],
+            )
+        ):
+            return ""
+
         if botId:
             if not user.check_privilege(
                 cherrypy.session.get("_cp_username"), "rb_bot_{}_ro".format(botId)
             ):
                 return "{}"
 
-            return json.dumps(
-                {botId: "Running" if redball.BOTS[botId].isRunning() else "Stopped"}
-            )
+            return json.dumps({botId: redball.BOTS[botId].status()})
         else:
             botStatus = {}
             for b in redball.BOTS.values():
                 if user.check_privilege(
                     cherrypy.session.get("_cp_username"), "rb_bot_{}_ro".format(b.id)
                 ):
-                    botStatus.update({b.id: "Running" if b.isRunning() else "Stopped"})
+                    botStatus.update({b.id: b.status()})
 
             return json.dumps(botStatus)
 
     @cherrypy.expose()
     @cherrypy.tools.auth()
     def botdetailedstate(self, botId=None):
+        u = cherrypy.session.get("_cp_username")
+        if check_etag(
+            make_etag(
+                "botdetailedstate",
+                botId,
+                u,
+                hash(user.get_compiled_privileges(u)),
+                rbConfig.get_resource_version("bots")[0],
+            )
+        ):
+            return ""
+
         if botId:
             if not user.check_privilege(
                 cherrypy.session.get("_cp_username"), "rb_bot_{}_ro".format(botId)
@@ -916,6 +1246,77 @@ class WebInterface(object):
 
             return json.dumps(botState)
 
+    @cherrypy.expose()
+    @cherrypy.tools.auth()
+    def botevents(self, botId=None):
+        """Server-sent events stream of bot status and detailed state summary
+        changes, starting with the current state of all visible bots
+        """
+        u = cherrypy.session.get("_cp_username")
+        # Don't hold the session lock for the life of the stream
+        if cherrypy.session.locked:
+            cherrypy.session.release_lock()
+
+        # Reserved here, under the lock, so concurrent requests can't all get
+        # past the limit before any of them is counted
+        release = open_event_stream()
+        if release is None:
+            # The page falls back to polling
+            raise cherrypy.HTTPError(503, "Too many open event streams.")
+
+        cherrypy.response.headers["Content-Type"] = "text/event-stream"
+        cherrypy.response.headers["Cache-Control"] = "no-cache"
+        cherrypy.response.headers["X-Accel-Buffering"] = "no"
+
+        def visible(bid):
+            return (not botId or str(bid) == str(botId)) and user.check_privilege(
+                u, "rb_bot_{}_ro".format(bid)
+            )
+
+        def event(seq, bots):
+            return "id: {}\nevent: bots\ndata: {}\n\n".format(seq, json.dumps(bots))
+
+        def stream():
+            try:
+                seq = bot.BOT_EVENTS["seq"]
+                yield "retry: 5000\n"
+                yield event(
+                    seq,
+                    {
+                        b.id: {
+                            "status": b.status(),
+                            "summary": b.detailedState["summary"]
+                            if b.detailedState
+                            else "",
+                        }
+                        for b in list(redball.BOTS.values())
+                        if visible(b.id)
+                    },
+                )
+                end = time.time() + EVENT_STREAM_LIFETIME
+                while (
+                    time.time() < end
+                    and redball.SIGNAL is None
+                    and cherrypy.engine.state == cherrypy.engine.states.STARTED
+                ):
+                    seq, changes = bot.get_status_changes(
+                        seq, timeout=EVENT_STREAM_KEEPALIVE
+                    )
+                    changes = {
+                        k: {"status": v["status"], "summary": v["summary"]}
+                        for k, v in changes.items()
+                        if visible(k)
+                    }
+                    # A comment keeps proxies from closing an idle stream,
+                    # and lets us notice when the client goes away
+                    yield event(seq, changes) if changes else ": keepalive\n\n"
+            finally:
+                release()
+
+        return event_stream(stream(), release)
+
+    botevents._cp_config = {"response.stream": True}
+
     @cherrypy.expose()
     @cherrypy.tools.auth()
     def inuse(self, botType_id=None, redditAuth_id=None):
@@ -1057,6 +1458,9 @@ class WebInterface(object):
                 elif kwargs["type"] == "Web/Security":
                     log.info("Restarting webserver...")
                     restart_webServer()
+                elif kwargs["type"] == "Database":
+                    log.info("Applying updated database connection settings...")
+                    database.configure()
         elif kwargs.get("action") == "create_botType":
             if not user.check_privilege(
                 cherrypy.session.get("_cp_username"), "rb_config_rw"
@@ -1079,6 +1483,7 @@ class WebInterface(object):
                 result = rbConfig.create_botType(
                     description=kwargs["botType_description"],
                     moduleName=kwargs["botType_moduleName"],
+                    runMode=kwargs.get("botType_runMode"),
                 )
                 if isinstance(result, str):
                     local_args.update({"errors": result, "errorcontainer_hide": ""})
@@ -1160,6 +1565,7 @@ class WebInterface(object):
                     id=botType_id,
                     description=kwargs["botType_description"],
                     moduleName=kwargs["botType_moduleName"],
+                    runMode=kwargs.get("botType_runMode"),
                 )
                 raise cherrypy.HTTPRedirect("/config")
         elif kwargs.get("action") == "create_redditAuth":
@@ -1594,6 +2000,141 @@ class WebInterface(object):
 
         return serve_page(templateName="logs.mako", **local_args)
 
+    @cherrypy.expose()
+    @cherrypy.tools.auth()
+    def logview(
+        self,
+        logId=None,
+        mode="tail",
+        lines=100,
+        offset=None,
+        length=65536,
+        pattern=None,
+        ignoreCase=None,
+        maxMatches=1000,
+        *args,
+        **kwargs
+    ):
+        """Read part of a log file without downloading the whole thing
+
+        mode=tail: JSON with the last `lines` lines
+        mode=page: JSON with up to `length` bytes of lines from byte `offset`
+        mode=grep: streams [offset, line] JSON per line matching regex `pattern`
+        mode=follow: event stream of lines appended after byte `offset`
+            (default: the current end of the file)
+        """
+        u = cherrypy.session.get("_cp_username")
+        if not user.check_privilege(u, "rb_log_ro"):
+            log.warning(
+                "Received log view request, but user [{}] has insufficient privileges ({}).".format(
+                    u, redball.LOGGED_IN_USERS.get(u, {}).get("PRIVS", []),
+                )
+            )
+            raise cherrypy.HTTPError(403, "Insufficient privileges.")
+
+        logFile = os.path.join(redball.LOG_PATH, logId or "")
+        if (
+            not logId
+            or any(x for x in ["\\", "/", ":", ".."] if x in logId)
+            or not os.path.isfile(logFile)
+        ):
+            raise cherrypy.HTTPError(404, "Invalid log specified.")
+
+        try:
+            lines = min(int(lines), LOG_VIEW_MAX_LINES)
+            offset = None if offset in [None, ""] else int(offset)
+            length = min(int(length), LOG_VIEW_MAX_BYTES)
+            maxMatches = min(int(maxMatches), LOG_VIEW_MAX_MATCHES)
+        except ValueError:
+            raise cherrypy.HTTPError(400, "Invalid number specified.")
+
+        if mode == "tail":
+            cherrypy.response.headers["Content-Type"] = "text/json"
+            return json.dumps(logger.tail_log(logFile, lines))
+        elif mode == "page":
+            cherrypy.response.headers["Content-Type"] = "text/json"
+            return json.dumps(logger.read_log(logFile, offset or 0, length))
+        elif mode == "grep":
+            try:
+                matches = logger.grep_log(
+                    logFile,
+                    pattern or "",
+                    ignore_case=str(ignoreCase).lower() == "true",
+                    max_matches=maxMatches,
+                )
+            except re.error as e:
+                raise cherrypy.HTTPError(400, "Invalid pattern: {}".format(e))
+
+            if cherrypy.session.locked:
+                cherrypy.session.release_lock()
+
+            cherrypy.response.stream = True
+            cherrypy.response.headers["Content-Type"] = "text/plain"
+            cherrypy.response.headers["X-Accel-Buffering"] = "no"
+            return (json.dumps(m) + "\n" for m in matches)
+        elif mode == "follow":
+            if cherrypy.session.locked:
+                cherrypy.session.release_lock()
+
+            # EventSource sends the last id it got when reconnecting
+            lastId = cherrypy.request.headers.get("Last-Event-ID")
+            if lastId and lastId.isdigit():
+                offset = int(lastId)
+            elif offset is None or offset < 0:
+                # Only lines logged from now on, unless asked for more
+                offset = os.path.getsize(logFile)
+
+            release = open_event_stream()
+            if release is None:
+                raise cherrypy.HTTPError(503, "Too many open event streams.")
+
+            cherrypy.response.stream = True
+            cherrypy.response.headers["Content-Type"] = "text/event-stream"
+            cherrypy.response.headers["Cache-Control"] = "no-cache"
+            cherrypy.response.headers["X-Accel-Buffering"] = "no"
+
+            def stream(pos):
+                try:
+                    yield "retry: 5000\n"
+                    end = time.time() + EVENT_STREAM_LIFETIME
+                    keepalive = time.time() + EVENT_STREAM_KEEPALIVE
+                    while (
+                        time.time() < end
+                        and redball.SIGNAL is None
+                        and cherrypy.engine.state == cherrypy.engine.states.STARTED
+                    ):
+                        try:
+                            size = os.path.getsize(logFile)
+                        except OSError:
+                            # Rotated and not recreated yet
+                            size = pos
+
+                        if size < pos:
+                            # Rotated or truncated, start over
+                            pos = 0
+
+                        if size > pos:
+                            page = logger.read_log(logFile, pos, LOG_VIEW_MAX_BYTES)
+                            if page["lines"]:
+                                pos = page["end"]
+                                keepalive = time.time() + EVENT_STREAM_KEEPALIVE
+                                yield "id: {}\nevent: lines\ndata: {}\n\n".format(
+                                    pos, json.dumps(page)
+                                )
+                                continue
+
+                        if time.time() >= keepalive:
+                            keepalive = time.time() + EVENT_STREAM_KEEPALIVE
+                            yield ": keepalive\n\n"
+
+                        time.sleep(LOG_FOLLOW_INTERVAL)
+                finally:
+                    release()
+
+            return event_stream(stream(offset), release)
+        else:
+            raise cherrypy.HTTPError(400, "Invalid mode specified.")
+
     @cherrypy.expose()
     @cherrypy.tools.auth()
     def password(self, user_id=None, *args, **kwargs):
@@ -1684,11 +2225,7 @@ class WebInterface(object):
                     }
                 )
             else:
-                pwq = (
-                    "UPDATE rb_users set password=? where id=?;",
-                    (user.hash_password(kwargs["password|new"]), u["id"],),
-                )
-                pwresult = database.db_qry(pwq, commit=True, closeAfter=True)
+                pwresult = user.update_password(u["id"], kwargs["password|new"])
                 if isinstance(pwresult, str):
                     local_args.update(
                         {
@@ -1781,23 +2318,46 @@ class APIv1(object):
         response = {}
         errors = []
         if kwargs.get("apikey") and self._authorize(kwargs["apikey"]):
-            u = user.get_user_info(apikey=kwargs["apikey"])
+            u = user.get_apikey_user(kwargs["apikey"])
+            version = self._version(args, kwargs, u) if len(args) else None
+            if version and check_etag(*version):
+                # Client already has the current response
+                return ""
+
             if len(args):
                 try:
                     if args[0].lower() == "bots":
+                        try:
+                            fields, limit, offset = self._list_args(kwargs)
+                        except ValueError:
+                            # Invalid fields, limit or offset
+                            errors.append(self._status(400))
+                            return self._prep(errors=errors)
+
                         if len(args) == 1:
-                            # Get all bots
-                            response.update(
-                                {
-                                    "bots": [
-                                        b
-                                        for b in bot.get_bots()
-                                        if user.check_privilege(
-                                            u["userid"], "rb_bot_{}_ro".format(b["id"])
-                                        )
-                                    ]
-                                }
+                            # Get all bots (?fields=id,name,status or ?summary=true,
+                            # and ?limit=&offset=)
+                            bots = bot.get_bots(
+                                fields=fields,
+                                botFilter=lambda x: user.check_privilege(
+                                    u["userid"], "rb_bot_{}_ro".format(x)
+                                ),
+                                limit=limit,
+                                offset=offset,
                             )
+                            if fields and "config" in fields:
+                                for b in bots:
+                                    b.update(
+                                        {
+                                            "config": rbConfig.get_bot_config(
+                                                b["id"],
+                                                excludeSysFields=True,
+                                                sortByCategory=True,
+                                            )
+                                        }
+                                    )
+
+                            response.update({"bots": bots})
                         elif len(args) == 2:
                             # Bot id specified
                             if not user.check_privilege(
@@ -1812,16 +2372,18 @@ class APIv1(object):
                                 errors.append(self._status(403))
                                 return self._prep(errors=errors)
                             else:
-                                bt = bot.get_bots(args[1])
-                                bt.update(
-                                    {
-                                        "config": rbConfig.get_bot_config(
-                                            args[1],
-                                            excludeSysFields=True,
-                                            sortByCategory=True,
-                                        )
-                                    }
-                                )
+                                bt = bot.get_bots(args[1], fields=fields)
+                                if not fields or "config" in fields:
+                                    bt.update(
+                                        {
+                                            "config": rbConfig.get_bot_config(
+                                                args[1],
+                                                excludeSysFields=True,
+                                                sortByCategory=True,
+                                            )
+                                        }
+                                    )
+
                                 response.update({"bots": [bt]})
                         elif len(args) == 3:
                             # Bot id and attribute specified
@@ -1858,9 +2420,9 @@ class APIv1(object):
                                             "bots": [
                                                 {
                                                     "id": args[1],
-                                                    args[2]: bot.get_bots(args[1])[
-                                                        args[2]
-                                                    ],
+                                                    args[2]: bot.get_bots(
+                                                        args[1], fields=[args[2]]
+                                                    )[args[2]],
                                                 }
                                             ]
                                         }
@@ -1979,6 +2541,40 @@ class APIv1(object):
                                 # Too many args
                                 errors.append(self._status(400))
                                 return self._prep(errors=errors)
+                    elif args[0].lower() == "queries":
+                        if not user.check_privilege(u["userid"], "rb_config_ro"):
+                            log.warning(
+                                "Received API call for query stats, but user [{}] has insufficient privileges ({}).".format(
+                                    u["userid"],
+                                    u["privileges"],
+                                )
+                            )
+                            # Insufficient privileges
+                            errors.append(self._status(403))
+                            return self._prep(errors=errors)
+                        elif len(args) == 1:
+                            # Top queries by total time (or ?sort=count|rows|avgMs|maxMs|lockWaitMs)
+                            response.update(
+                                database.get_query_stats(
+                                    limit=int(kwargs.get("limit", 20)),
+                                    sortBy=kwargs.get("sort", "totalMs"),
+                                )
+                            )
+                        elif len(args) == 2 and args[1].lower() == "plans":
+                            # EXPLAIN QUERY PLAN for hot queries (optionally ?botId=)
+                            response.update(
+                                {
+                                    "plans": database.explain_query_plans(
+                                        prefix="rb_bot_{}_".format(int(kwargs["botId"]))
+                                        if kwargs.get("botId")
+                                        else None
+                                    )
+                                }
+                            )
+                        else:
+                            # Too many args
+                            errors.append(self._status(400))
+                            return self._prep(errors=errors)
                     else:
                         errors.append(self._status(400))
                         return self._prep(errors=errors)
@@ -2010,7 +2606,7 @@ class APIv1(object):
         response = {}
         errors = []
         if kwargs.get("apikey") and self._authorize(kwargs["apikey"]):
-            u = user.get_user_info(apikey=kwargs["apikey"])
+            u = user.get_apikey_user(kwargs["apikey"])
             if len(args):
                 try:
                     if args[0].lower() == "bots":
@@ -2062,6 +2658,9 @@ class APIv1(object):
                                         ),
                                     )
                                     database.db_qry(q, commit=True, closeAfter=True)
+                                    user.invalidate_privileges(
+                                        cherrypy.session.get("_cp_username")
+                                    )
                         elif len(args) == 3:
                             if not user.check_privilege(
                                 u["userid"], "rb_bot_{}_rw".format(args[1])
@@ -2112,6 +2711,26 @@ class APIv1(object):
                         else:
                             # Too many args
                             errors.append(self._status(414))
+                    elif args[0].lower() == "batch":
+                        # Operations on multiple bots; see _batch()
+                        if len(args) > 1:
+                            # Too many args
+                            errors.append(self._status(414))
+                        else:
+                            bodyLen = int(
+                                cherrypy.request.headers.get("Content-Length", 0)
+                            )
+                            try:
+                                postBody = json.loads(
+                                    cherrypy.request.body.read(bodyLen)
+                                    if bodyLen > 0
+                                    else "{}"
+                                )
+                                log.debug("POST body: {}".format(postBody))
+                                response.update(self._batch(u, postBody))
+                            except ValueError as e:
+                                log.debug("Invalid batch request: {}".format(e))
+                                errors.append(self._status(400))
                     elif args[0].lower() == "bottypes":
                         if not user.check_privilege(u["userid"], "rb_config_rw"):
                             log.warning(
@@ -2128,6 +2747,7 @@ class APIv1(object):
                                 result = rbConfig.create_botType(
                                     description=kwargs["description"],
                                     moduleName=kwargs["moduleName"],
+                                    runMode=kwargs.get("runMode"),
                                 )
                                 if isinstance(result, str) or result == 0:
                                     # Exception encountered while processing request
@@ -2202,7 +2822,7 @@ class APIv1(object):
         response = {}
         errors = []
         if kwargs.get("apikey") and self._authorize(kwargs["apikey"]):
-            u = user.get_user_info(apikey=kwargs["apikey"])
+            u = user.get_apikey_user(kwargs["apikey"])
             if len(args):
                 try:
                     if args[0].lower() == "bots":
@@ -2331,6 +2951,7 @@ class APIv1(object):
                                     id=args[1],
                                     description=kwargs.get("description"),
                                     moduleName=kwargs.get("moduleName"),
+                                    runMode=kwargs.get("runMode"),
                                 )
                                 if result == "ERROR: Nothing provided to update.":
                                     errors.append(self._status(400))
@@ -2390,7 +3011,7 @@ class APIv1(object):
         response = {}
         errors = []
         if kwargs.get("apikey") and self._authorize(kwargs["apikey"]):
-            u = user.get_user_info(apikey=kwargs["apikey"])
+            u = user.get_apikey_user(kwargs["apikey"])
             if len(args):
                 try:
                     if args[0].lower() == "bots":
@@ -2498,7 +3119,7 @@ class APIv1(object):
         if key in ["", None]:
             return False
 
-        u = user.get_user_info(apikey=key)
+        u = user.get_apikey_user(key)
         if u in [None, {}]:
             return False
 
@@ -2518,6 +3139,201 @@ class APIv1(object):
             log.debug("API call authorized for user [{}].".format(u["userid"]))
             return True
 
+    def _version(self, args, kwargs, u):
+        # (ETag, last modified time or None) for GET responses that can be
+        # versioned, or None; see check_etag()
+        resource = args[0].lower()
+        if resource == "bots" and len(args) > 2 and args[2] == "config":
+            version, modified = rbConfig.get_bot_config_version(args[1], modified=True)
+            versions = [version]
+        elif resource == "bots":
+            # Includes status and detailed state, so no Last-Modified
+            versions = [rbConfig.get_resource_version("bots")[0]]
+            modified = None
+            if len(args) > 1:
+                # Single bot responses include the bot's config
+                versions.append(rbConfig.get_bot_config_version(args[1]))
+            elif "config" in kwargs.get("fields", ""):
+                versions.append(
+                    {k: rbConfig.get_bot_config_version(k) for k in redball.BOTS}
+                )
+        elif resource == "bottypes":
+            version, modified = rbConfig.get_resource_version("botTypes")
+            versions = [version]
+        elif resource == "redditauths":
+            version, modified = rbConfig.get_resource_version("redditAuths")
+            versions = [version]
+        else:
+            return None
+
+        # Responses depend on the user's privileges and the query string
+        etag = make_etag(
+            "api/v1",
+            args,
+            {k: v for k, v in kwargs.items() if k != "apikey"},
+            u["userid"],
+            hash(user.get_compiled_privileges(u["userid"])),
+            versions,
+        )
+        return etag, modified
+
+    def _batch(self, u, body):
+        # Apply a list of bot operations and return a result for each, e.g.
+        # {"operations": [{"action": "config", "botIds": [1, 2], "config":
+        #   [{"category": "Logging", "key": "FILE_LOG_LEVEL", "val": "INFO"}]},
+        #   {"action": "restart", "botIds": [1, 2]}]}
+        # Actions are start, stop, restart and config. Config changes are
+        # applied first, in a single transaction, then stops, then starts and
+        # restarts. Starts and restarts go through the bot launch queue, like
+        # auto-run bots, so they are spread out in the background. Raises
+        # ValueError if the request is malformed.
+        ops = body.get("operations") if isinstance(body, dict) else None
+        if not isinstance(ops, list) or not len(ops):
+            raise ValueError("No operations provided.")
+
+        results = []
+        configs = {}
+        patches = {}
+        stops = []
+        launches = []
+        for op in ops:
+            if not isinstance(op, dict):
+                raise ValueError("Invalid operation: {}".format(op))
+
+            action = str(op.get("action", "")).lower()
+            botIds = op.get("botIds", [op.get("botId")])
+            if not isinstance(botIds, list):
+                raise ValueError("Invalid botIds: {}".format(botIds))
+
+            for botId in botIds:
+                result = {"botId": botId, "action": action}
+                results.append(result)
+                b = redball.BOTS.get(str(botId))
+                if action not in ["start", "stop", "restart", "config"]:
+                    result.update({"error": "Invalid action."})
+                elif not b:
+                    result.update({"error": "Bot not found."})
+                elif not user.check_privilege(
+                    u["userid"],
+                    "rb_bot_{}_{}".format(
+                        b.id, "rw" if action == "config" else "startstop"
+                    ),
+                ):
+                    log.warning(
+                        "Received batch API call to {} bot {}, but user [{}] has insufficient privileges ({}).".format(
+                            action, b.id, u["userid"], u["privileges"],
+                        )
+                    )
+                    result.update({"error": "Insufficient privileges."})
+                elif action == "config":
+                    if b.id not in configs:
+                        configs.update(
+                            {
+                                b.id: {
+                                    (x["category"], x["key"]): x
+                                    for x in rbConfig.get_bot_config(b.id)
+                                }
+                            }
+                        )
+
+                    items = []
+                    for c in op.get("config") or []:
+                        x = (
+                            configs[b.id].get((c.get("category"), c.get("key")))
+                            if isinstance(c, dict) and "val" in c
+                            else None
+                        )
+                        if not x:
+                            result.update({"error": "Invalid setting: {}".format(c)})
+                            break
+
+                        items.append(
+                            {
+                                "category": x["category"],
+                                "key": x["key"],
+                                "val": c["val"],
+                                "type": x["type"],
+                            }
+                        )
+
+                    if not len(items):
+                        result.setdefault("error", "No config provided.")
+                    elif not result.get("error"):
+                        patches.setdefault(b.id, []).append((result, items))
+                elif action == "stop":
+                    stops.append((result, b))
+                else:
+                    launches.append((result, b))
+
+        if len(patches):
+            failed = []
+            with database.transaction():
+                for botId, entries in patches.items():
+                    try:
+                        r = rbConfig.update_bot_config(
+                            botId, [i for x in entries for i in x[1]]
+                        )
+                    except Exception as e:
+                        r = "ERROR: {}".format(e)
+
+                    if isinstance(r, str):
+                        failed.append("Bot {}: {}".format(botId, r))
+                        raise database.Rollback()
+
+            for botId, entries in patches.items():
+                for result, items in entries:
+                    if len(failed):
+                        result.update(
+                            {"result": False, "error": "Rolled back. " + failed[0]}
+                        )
+                    else:
+                        result.update({"result": True})
+
+                if not len(failed):
+                    # Bots may have reloaded before the transaction was committed
+                    rbConfig.bot_config_changed(
+                        botId, set(i["category"] for x in entries for i in x[1])
+                    )
+
+        for result, b in stops:
+            result.update({"result": b.stop()})
+
+        queue = []
+        for result, b in launches:
+            if result["action"] == "restart":
+                # The launcher waits for the bot to finish stopping
+                b.stop()
+            elif b.isRunning():
+                result.update({"result": True})
+                continue
+
+            queue.append(b)
+            result.update({"result": "queued"})
+
+        bot.queue_launch(queue)
+
+        return {"results": results}
+
+    def _list_args(self, kwargs):
+        # Fields, limit and offset for bot listings from ?fields=a,b (or
+        # ?summary=true for a lightweight listing) and ?limit=&offset=.
+        # Raises ValueError if any are invalid.
+        if str(kwargs.get("summary", "")).lower() in ["true", "1"]:
+            fields = bot.BOT_SUMMARY_FIELDS
+        elif kwargs.get("fields"):
+            fields = [x.strip() for x in kwargs["fields"].split(",") if x.strip()]
+            if any(x for x in fields if x not in bot.BOT_FIELDS + ["config"]):
+                raise ValueError("Invalid field specified.")
+        else:
+            fields = None
+
+        limit = int(kwargs["limit"]) if kwargs.get("limit") else None
+        offset = int(kwargs.get("offset") or 0)
+        if (limit is not None and limit < 0) or offset < 0:
+            raise ValueError("Invalid limit or offset specified.")
+
+        return fields, limit, offset
+
     def _prep(self, response=None, errors=None):
         data = {
             "meta": {"api_version": 1, "timestamp": time.time()},
@@ -2525,6 +3341,9 @@ class APIv1(object):
             "response": "",
         }
         if errors:
+            # Errors are not cacheable
+            cherrypy.response.headers.pop("ETag", None)
+            cherrypy.response.headers.pop("Last-Modified", None)
             data.update({"errors": errors})
 
         if response:
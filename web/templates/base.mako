@@ -1,7 +1,7 @@
 <% 
     import cherrypy
     import redball
-    from redball import config, user
+    from redball import config, user, webserver
     if cherrypy.session.get("_cp_username") and cherrypy.session["_cp_username"] in redball.LOGGED_IN_USERS.keys():
         user.refresh_user_privileges(cherrypy.session["_cp_username"])
     auth_type = config.get_sys_config(category="Web/Security", key="AUTH_TYPE")
@@ -18,7 +18,7 @@
 <head>
 <meta http-equiv="Content-Type" content="text/html; charset=utf-8" />
 <title>${title} | <%block name="siteHeader">redball</%block></title>
-<link href="/css/style.css" rel="stylesheet" type="text/css" />
+<link href="${webserver.static_url('/css/style.css')}" rel="stylesheet" type="text/css" />
 <script src="//ajax.googleapis.com/ajax/libs/jquery/3.4.1/jquery.min.js"></script>
 <link rel="stylesheet" href="//ajax.googleapis.com/ajax/libs/jqueryui/1.12.1/themes/smoothness/jquery-ui.css" />
 <script src="//ajax.googleapis.com/ajax/libs/jqueryui/1.12.1/jquery-ui.min.js"></script>
@@ -95,14 +95,14 @@ $(window).resize(function() {
 <%block name="pagejs"></%block>
 </head>
 <body>
-<div id="loadingcontainer" class="hide"><div id="blackout"></div><div id="loadingdiv"><br /><img src="/img/spinner.gif" /><br /><span id="loadingtext">Loading...</span></div></div>
+<div id="loadingcontainer" class="hide"><div id="blackout"></div><div id="loadingdiv"><br /><img src="${webserver.static_url('/img/spinner.gif')}" /><br /><span id="loadingtext">Loading...</span></div></div>
 <header role="banner">
 	<div id="loginstatus">
 		<div id="userbox">
 			${'' if wideOpen or basicAuth else '{}<a href="/password" title="Change Password"><span class="ui-icon ui-icon-wrench"></span></a><a href="/logout"><span class="ui-icon ui-icon-locked" title="Logout"></span></a>'.format(cherrypy.session.get("_cp_username")) if cherrypy.session.get("_cp_username") else '<a href="/login"><span class="ui-icon ui-icon-locked"></span>Login</a>'}
 		</div>
 	</div>
-	<div id="logo"><a href="/" class="logo"><img src="/img/redball.png" height="40" width="40" style="vertical-align:middle"> ${self.siteHeader()}</a></div>
+	<div id="logo"><a href="/" class="logo"><img src="${webserver.static_url('/img/redball.png')}" height="40" width="40" style="vertical-align:middle"> ${self.siteHeader()}</a></div>
 	<div id="menu">
 		<ul class="menu">
 			% if cherrypy.session.get("_cp_username"):
@@ -2,26 +2,42 @@
 <%! 
 	import cherrypy
 	import redball
-	from redball import config, user
+	import time
+	from redball import bot, config, user
 
-	if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_all_rw'):
-		priv = 3
-	elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_all_startstop'):
-		priv = 2
-	elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_all_ro'):
-		priv = 1
-	else:
-		priv = 0
+	# Module-level code runs once per compiled template, so privileges
+	# have to be checked per render (see <% %> at the top of each block)
+	def get_privs():
+		if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_all_rw'):
+			priv = 3
+		elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_all_startstop'):
+			priv = 2
+		elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_all_ro'):
+			priv = 1
+		else:
+			priv = 0
 
-	explicitPrivCount = sum(1 for x in redball.BOTS.values() if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_startstop'.format(x.id)) or user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_ro'.format(x.id)))
+		explicitPrivCount = sum(1 for x in redball.BOTS.values() if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_startstop'.format(x.id)) or user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_ro'.format(x.id)))
+		return priv, explicitPrivCount
+
+	def fmt_seconds(s):
+		s = max(0, int(s))
+		if s >= 3600:
+			return '{}h {}m'.format(s // 3600, s % 3600 // 60)
+		elif s >= 60:
+			return '{}m {}s'.format(s // 60, s % 60)
+		else:
+			return '{}s'.format(s)
 %>
 
 <%block name="topright">
+<% priv, explicitPrivCount = get_privs() %>
 	% if priv > 0 or explicitPrivCount > 0:
 	<div id="botStatus_autoRefresh" name="botStatus_autoRefresh" class="refreshInterval">
 		<label for="botStatus_refreshInterval">Auto Refresh Bot Status:</label>
 		<select name="botStatus_refreshInterval" id="botStatus_refreshInterval" class="text ui-widget-content ui-corner-all" title="Warning: enabling auto refresh will prevent your session from timing out.">
-			<option value="0" selected="selected">None</option>
+			<option value="live" selected="selected">Live</option>
+			<option value="0">None</option>
 			<option value="5">5 Seconds</option>
 			<option value="15">15 Seconds</option>
 			<option value="30">30 Seconds</option>
@@ -37,9 +53,29 @@
 </%block>
 
 <%block name="content">
+<% priv, explicitPrivCount = get_privs() %>
 	% if priv > 0 or explicitPrivCount > 0:
 	<% redditAuths = config.get_redditAuths() %>
 	% if bot_id == None:
+		<div id="launchQueue">
+		<% launchQueue = [x for x in bot.get_launch_queue() if priv > 0 or user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_ro'.format(x['id'])) or user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_startstop'.format(x['id']))] %>
+		% if len(launchQueue):
+			<div class="launchQueue">
+				<span class="botName">Launch Queue</span>
+				<table>
+					<tr><th>#</th><th>Bot</th><th>Work Starts</th><th>Launch</th></tr>
+					% for i, x in enumerate(launchQueue):
+					<tr>
+						<td>${i + 1}</td>
+						<td><a href="/bots?bot_id=${x['id']}">${x['name']}</a></td>
+						<td>${'Unknown' if x['priority'] is None else 'in ' + fmt_seconds(x['priority']) if x['priority'] > 0 else 'Now'}</td>
+						<td>${'Starting' if x['starting'] else 'in ~' + fmt_seconds(x['eta'] - time.time())}</td>
+					</tr>
+					% endfor
+				</table>
+			</div>
+		% endif
+		</div>
 		<div id="botGrid" class="botGrid layoutGrid">
 		<% botTypes = config.get_botTypes() %>
 		% for b in redball.BOTS.values():
@@ -51,7 +87,7 @@
 						<span class="botDetail"><strong>Type</strong>: ${next((x['description'] for x in botTypes if str(x['id']) == str(b.botType)),'Unknown')}</span>
 						<span class="botDetail"><strong>Auto Run</strong>: ${b.autoRun}</span>
 						<span class="botDetail"><strong>Reddit Auth</strong>: ${next((redditAuth['description'] for redditAuth in redditAuths if str(redditAuth['id']) == str(b.redditAuth)),'Unknown')}</span>
-						<span class="botDetail"><strong>Status</strong>: ${'<span id="botStatus_{}" class="greenBold">Running</span>'.format(b.id) if b.isRunning() == True else '<span id="botStatus_{}" class="redBold">Stopped</span>'.format(b.id)} <span id="refreshBotStatusButton" onclick="${"refreshBotStatus('{}')".format('botId='+str(b.id))};" title="Refresh Bot Status Now" class="ui-icon ui-icon-refresh"></span></span>
+						<span class="botDetail"><strong>Status</strong>: <% status = b.status() %><span id="botStatus_${b.id}" class="${'greenBold' if status == 'Running' else 'redBold'}">${status}</span> <span id="refreshBotStatusButton" onclick="${"refreshBotStatus('{}')".format('botId='+str(b.id))};" title="Refresh Bot Status Now" class="ui-icon ui-icon-refresh"></span></span>
 						<span class="botControls">
 							% if priv > 1 or user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_startstop'.format(b.id)):
 							<button type="Submit" name="action" title="Start Bot" value="start" class="ui-button ui-widget ui-corner-all ui-button-icon-only button-play">Start</button>
@@ -114,7 +150,7 @@
 						<option value="${redditAuth['id']}"${' selected="selected"' if str(redditAuth['id']) == str(b.redditAuth) else ''}>${redditAuth['description']}</option>
 					% endfor
 				</select></span>
-				<span class="botDetail"><strong>Status</strong>: ${'<span id="botStatus_{}" class="greenBold">Running</span>'.format(b.id) if b.isRunning() == True else '<span id="botStatus_{}" class="redBold">Stopped</span>'.format(b.id)} <span id="refreshBotStatusButton" onclick="refreshBotStatus();" title="Refresh Bot Status Now" class="ui-icon ui-icon-refresh"></span></span>
+				<span class="botDetail"><strong>Status</strong>: <% status = b.status() %><span id="botStatus_${b.id}" class="${'greenBold' if status == 'Running' else 'redBold'}">${status}</span> <span id="refreshBotStatusButton" onclick="refreshBotStatus();" title="Refresh Bot Status Now" class="ui-icon ui-icon-refresh"></span></span>
 				<span class="botControls">
 					% if priv > 2 or user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_bot_{}_rw'.format(b.id)):
 					<button type="submit" name="action" title="Save Bot Settings" value="save_bot" class="ui-button ui-widget ui-corner-all ui-button-icon-only button-disk">Save</button>
@@ -346,8 +382,18 @@
 	% endif
 </%block>
 <%block name="pagejs">
+<% priv, explicitPrivCount = get_privs() %>
 % if priv > 0 or explicitPrivCount > 0:
 <script>
+	var launchQueueTimeout = null;
+	function refreshLaunchQueue() {
+		// Several bots usually change at once; reload the panel once for all of them
+		if (!$('#launchQueue').length || launchQueueTimeout) {return;}
+		launchQueueTimeout = setTimeout(function() {
+			launchQueueTimeout = null;
+			$('#launchQueue').load('/bots #launchQueue > *');
+		}, 1000);
+	}
 	function refreshBotStatus(extraParam='') {
 		if(extraParam != ''){sep = '&'}
 		else{sep = ''}
@@ -359,6 +405,9 @@
 					if (botStatus.hasOwnProperty(botId)) {
 						var oldStatus = $('#botStatus_'+botId).html()
 						if (botStatus[botId] != oldStatus) {
+							if (botStatus[botId] == 'Queued' || oldStatus == 'Queued') {
+								refreshLaunchQueue();
+							}
 							$('#botStatus_'+botId).html(botStatus[botId]);
 							if (botStatus[botId] == 'Running') {
 								$('#botStatus_'+botId).removeClass('redBold').addClass('greenBold');
@@ -399,37 +448,79 @@
 		});
 	}
 	% endif
+	function applyBotEvents(bots) {
+		Object.keys(bots).forEach( function(botId) {
+			var oldStatus = $('#botStatus_'+botId).html()
+			if (bots[botId]['status'] != oldStatus) {
+				if (bots[botId]['status'] == 'Queued' || oldStatus == 'Queued') {
+					refreshLaunchQueue();
+				}
+				$('#botStatus_'+botId).html(bots[botId]['status']);
+				if (bots[botId]['status'] == 'Running') {
+					$('#botStatus_'+botId).removeClass('redBold').addClass('greenBold');
+					$('#botStatus_'+botId).effect("highlight", {color:'#0f0'}, 3000);
+				}
+				else {
+					$('#botStatus_'+botId).removeClass('greenBold').addClass('redBold');
+					$('#botStatus_'+botId).effect("highlight", {color:'#f00'}, 3000);
+				}
+			}
+			% if bot_id is not None:
+			if (bots[botId]['summary'] && bots[botId]['summary']['html'] != $('#botDetailedStateSummary_'+botId).html()) {
+				$('#botDetailedStateSummary_'+botId).html(bots[botId]['summary']['html']);
+				$('#botDetailedStateSummary_'+botId).effect("highlight", {color:'#ddd'}, 3000);
+			}
+			% endif
+		});
+	}
+	var botEvents;
+	var refreshTimeout;
+	% if bot_id is not None:
+	var refreshTimeout_detailedState;
+	% endif
+	function startBotEvents() {
+		// Server pushes status and detailed state changes as they happen
+		if (!window.EventSource) {return false}
+		botEvents = new EventSource('/botevents${'?botId={}'.format(bot_id) if bot_id != None else ''}');
+		botEvents.addEventListener('bots', function(e) {applyBotEvents(JSON.parse(e.data))});
+		botEvents.onerror = function() {
+			if (this === botEvents && this.readyState == EventSource.CLOSED) {
+				// Stream was refused (e.g. too many open), so poll instead
+				botEvents = undefined;
+				startPolling(15);
+			}
+		};
+		return true;
+	}
+	function startPolling(seconds) {
+		refreshTimeout = setInterval(refreshBotStatus, seconds*1000);
+		% if bot_id is not None:
+		refreshTimeout_detailedState = setInterval(refreshBotDetailedState, seconds*1000);
+		% endif
+	}
+	function setAutoRefresh(interval) {
+		if (botEvents) {
+			botEvents.close();
+			botEvents = undefined;
+		}
+		clearInterval(refreshTimeout);
+		% if bot_id is not None:
+		clearInterval(refreshTimeout_detailedState);
+		% endif
+		if (interval == 'live') {
+			if (!startBotEvents()) {startPolling(15)}
+		} else if (interval != '0') {
+			startPolling(parseInt(interval));
+		}
+	}
 	$(document).ready(function() {
 		// bot status auto refresh settings
 		if (Cookies.get('rb_autoRefreshInterval') != undefined) {
 			$("#botStatus_refreshInterval").val(Cookies.get('rb_autoRefreshInterval'));
 		}
-		if ($("#botStatus_refreshInterval").val() == '0') {
-			var refreshTimeout;
-			% if bot_id is not None:
-			var refreshTimeout_detailedState;
-			% endif
-		} else {
-			var refreshTimeout = setInterval(refreshBotStatus, parseInt($("#botStatus_refreshInterval").val())*1000);
-			% if bot_id is not None:
-			var refreshTimeout_detailedState = setInterval(refreshBotDetailedState, parseInt($("#botStatus_refreshInterval").val())*1000);
-			% endif
-		}
+		setAutoRefresh($("#botStatus_refreshInterval").val());
 		botStatus_refreshInterval.onchange = function() {
-												clearInterval(refreshTimeout);
-												% if bot_id is not None:
-												clearInterval(refreshTimeout_detailedState);
-												% endif
-												if ($("#botStatus_refreshInterval").val() == '0') {
-													// do nothing
-												} else {
-													clearInterval(refreshTimeout);
-													refreshTimeout = setInterval(refreshBotStatus, parseInt($('#botStatus_refreshInterval').val())*1000);
-													% if bot_id is not None:
-													clearInterval(refreshTimeout_detailedState);
-													refreshTimeout_detailedState = setInterval(refreshBotDetailedState, parseInt($('#botStatus_refreshInterval').val())*1000);
-													% endif
-												}
+												setAutoRefresh($("#botStatus_refreshInterval").val());
 												Cookies.set('rb_autoRefreshInterval', $("#botStatus_refreshInterval").val());
 											};
 
@@ -4,15 +4,19 @@
 	import redball
 	from redball import config, user
 
-	if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_config_rw'):
-		priv = 2
-	elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_config_ro'):
-		priv = 1
-	else:
-		priv = 0
+	# Module-level code runs once per compiled template, so privileges
+	# have to be checked per render (see <% %> at the top of each block)
+	def get_priv():
+		if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_config_rw'):
+			return 2
+		elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_config_ro'):
+			return 1
+		else:
+			return 0
 %>
 
 <%block name="content">
+<% priv = get_priv() %>
 	% if priv > 0:
 	% if botType_id == None and redditAuth_id == None and user_id == None:
 		<div id="sysConfigGrid" class="configGrid layoutGrid">
@@ -130,6 +134,7 @@
 							<form id="botType-${x['id']}" method="post" action="/config?botType_id=${str(x['id'])}">
 								<strong>Description</strong>: ${x['description']}<br />
 								<strong>Module Name</strong>: ${x['moduleName']}<br />
+								<strong>Run Mode</strong>: ${x.get('runMode') or 'thread'}<br />
 								% if priv > 1:
 								<button type="Submit" name="action" value="edit_botType" class="ui-button ui-widget ui-corner-all button-wrench">Edit</button></form>
 								<form id="deleteBotType" method="post" action="/config?botType_id=${str(x['id'])}" onsubmit="return in_use('botType',${str(x['id'])});">
@@ -143,6 +148,11 @@
 							<form id="addBotType" method="post" action="/config">
 								<label for="botType_description">Description:</label> <input id="botType_description" name="botType_description" value="" class="text ui-widget-content ui-corner-all" />
 								<label for="botType_moduleName">Module Name:</label> <input id="botType_moduleName" name="botType_moduleName" value="" class="text ui-widget-content ui-corner-all" />
+								<label for="botType_runMode">Run Mode:</label> <select id="botType_runMode" name="botType_runMode" class="text ui-widget-content ui-corner-all" title="Process mode runs each bot in its own process, so CPU-heavy bots don't slow down the others.">
+									% for m in config.BOT_RUN_MODES:
+									<option value="${m}">${m}</option>
+									% endfor
+								</select>
 								<button type="submit" name="action" value="create_botType" class="ui-button ui-widget ui-corner-all button-disk">Create</button>
 							</form>
 						</div>
@@ -260,6 +270,11 @@
 				<form id="editbotType" method="post" action="/config?botType_id=${str(x['id'])}">
 					<label for="botType_description">Description:</label> <input id="botType_description" name="botType_description" value="${x['description']}" class="text ui-widget-content ui-corner-all" />
 					<label for="botType_moduleName">Module Name:</label> <input id="botType_moduleName" name="botType_moduleName" value="${x['moduleName']}" class="text ui-widget-content ui-corner-all" />
+					<label for="botType_runMode">Run Mode:</label> <select id="botType_runMode" name="botType_runMode" class="text ui-widget-content ui-corner-all" title="Process mode runs each bot in its own process, so CPU-heavy bots don't slow down the others. Takes effect the next time the bot starts.">
+						% for m in config.BOT_RUN_MODES:
+						<option value="${m}"${' selected' if (x.get('runMode') or 'thread') == m else ''}>${m}</option>
+						% endfor
+					</select>
 					% if priv > 1:
 					<button type="Submit" name="action" value="save_botType" class="ui-button ui-widget ui-corner-all button-disk">Save</button> <button type="submit" name="action" value="cancel" class="ui-button ui-widget ui-corner-all button-close">Cancel</button>
 					% endif
@@ -335,6 +350,7 @@
 	% endif
 </%block>
 <%block name="pagejs">
+<% priv = get_priv() %>
 % if priv > 0:
 <script type='text/javascript'>
 	function copyText(field) {
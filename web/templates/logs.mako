@@ -5,25 +5,47 @@
 	import redball
 	from redball import user
 
-	if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_log_rw'):
-		priv = 2
-	elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_log_ro'):
-		priv = 1
-	else:
-		priv = 0
+	# Module-level code runs once per compiled template, so privileges
+	# have to be checked per render (see <% %> at the top of each block)
+	def get_priv():
+		if user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_log_rw'):
+			return 2
+		elif user.check_privilege(cherrypy.session.get("_cp_username"), 'rb_log_ro'):
+			return 1
+		else:
+			return 0
 %>
 
 <%block name="content">
+<% priv = get_priv() %>
 	% if priv > 0:
 	<% logDirList = os.listdir(redball.LOG_PATH) %>
 	<% used = [] %>
+	<div id="logViewer" class="logViewer hide">
+		<div class="logViewerControls">
+			<span class="logType" id="logViewName"></span>
+			<label for="logViewLines">Lines:</label> <input type="text" size="5" id="logViewLines" value="100" class="text ui-widget-content ui-corner-all" />
+			<button type="button" onclick="tailLog();" class="ui-button ui-widget ui-corner-all">Tail</button>
+			<button type="button" onclick="pageLog(0);" class="ui-button ui-widget ui-corner-all">First</button>
+			<button type="button" onclick="pageLog(logView.start - logView.length);" class="ui-button ui-widget ui-corner-all">Previous</button>
+			<button type="button" onclick="pageLog(logView.end);" class="ui-button ui-widget ui-corner-all">Next</button>
+			<label for="logViewFollow">Follow:</label> <input type="checkbox" id="logViewFollow" onchange="followLog(this.checked);" />
+			<br />
+			<label for="logViewPattern">Search (regex):</label> <input type="text" size="40" id="logViewPattern" class="text ui-widget-content ui-corner-all" onkeydown="if (event.key == 'Enter') {grepLog();}" />
+			<label for="logViewIgnoreCase">Ignore case:</label> <input type="checkbox" id="logViewIgnoreCase" />
+			<button type="button" onclick="grepLog();" class="ui-button ui-widget ui-corner-all">Search</button>
+			<button type="button" onclick="closeLog();" class="ui-button ui-widget ui-corner-all">Close</button>
+			<span id="logViewRange" class="logViewRange"></span>
+		</div>
+		<pre id="logViewOutput" class="logViewOutput"></pre>
+	</div>
 	<div id="logsConfigGrid" class="logsGrid layoutGrid">
 		<div class="logs gridItem">
 			<div class="gridItemContent">
 				<span class="logType">System</span>
 				% for f in (f for f in logDirList if 'redball.log' in f):
 					<span class="logFile">
-						<a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a> 
+						<a href="#" onclick="showLog('${f}'); return false;" class="ui-icon ui-widget ui-icon-search" title="View"></a><a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a> 
 						% if f[-4:] != '.log' and priv > 1:
 							<a href="/logs?action=deleteLog&logId=${f}" class="ui-icon ui-widget ui-icon-trash" onclick="return confirm('Are you sure you want to permanently delete this log file?');"></a>
 						% endif
@@ -38,7 +60,7 @@
 				<span class="logType">Webserver</span>
 				% for f in (f for f in logDirList if 'access.log' in f or 'error.log' in f):
 					<span class="logFile">
-						<a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a>
+						<a href="#" onclick="showLog('${f}'); return false;" class="ui-icon ui-widget ui-icon-search" title="View"></a><a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a>
 						% if f[-4:] != '.log' and priv > 1:
 							<a href="/logs?action=deleteLog&logId=${f}" class="ui-icon ui-widget ui-icon-trash" onclick="return confirm('Are you sure you want to permanently delete this log file?');"></a>
 						% endif
@@ -55,7 +77,7 @@
 						<span class="logType">${b.name} (#${str(b.id)})</span>
 						% for f in (f for f in logDirList if f.find('bot-{}-'.format(b.id))!=-1):
 							<span class="logFile">
-								<a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a>
+								<a href="#" onclick="showLog('${f}'); return false;" class="ui-icon ui-widget ui-icon-search" title="View"></a><a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a>
 								% if (f[-4:] != '.log' or b.name.replace(' ','-') not in f) and priv > 1:
 									<a href="/logs?action=deleteLog&logId=${f}" class="ui-icon ui-widget ui-icon-trash" onclick="return confirm('Are you sure you want to permanently delete this log file?');"></a>
 								% endif
@@ -73,7 +95,7 @@
 					<span class="logType">Other</span>
 					% for f in (f for f in logDirList if f not in used):
 						<span class="logFile">
-							<a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a>
+							<a href="#" onclick="showLog('${f}'); return false;" class="ui-icon ui-widget ui-icon-search" title="View"></a><a href="/logs?action=downloadLog&logId=${f}" class="ui-icon ui-widget ui-icon-disk"></a>
 							% if priv > 1:
 							<a href="/logs?action=deleteLog&logId=${f}" class="ui-icon ui-widget ui-icon-trash" onclick="return confirm('Are you sure you want to permanently delete this log file?');"></a>
 							% endif
@@ -88,4 +110,131 @@
 % else:
 Insufficient privileges.
 % endif
-</%block>
\ No newline at end of file
+</%block>
+<%block name="pagejs">
+<% priv = get_priv() %>
+% if priv > 0:
+<script>
+	var logView = {logId: null, start: 0, end: 0, size: 0, length: 65536, source: null, reader: null};
+
+	function showLog(logId) {
+		stopLog();
+		logView.logId = logId;
+		$('#logViewName').text(logId);
+		$('#logViewer').removeClass('hide');
+		tailLog();
+	}
+
+	function closeLog() {
+		stopLog();
+		$('#logViewer').addClass('hide');
+		$('#logViewOutput').text('');
+	}
+
+	function stopLog() {
+		// Stop following or searching
+		if (logView.source) {
+			logView.source.close();
+			logView.source = null;
+		}
+		if (logView.reader) {
+			logView.reader.cancel();
+			logView.reader = null;
+		}
+		$('#logViewFollow').prop('checked', false);
+	}
+
+	function setLogRange(data) {
+		logView.start = data.start;
+		logView.end = data.end;
+		logView.size = data.size;
+		$('#logViewRange').text('Bytes ' + data.start + '-' + data.end + ' of ' + data.size);
+	}
+
+	function showLogLines(lines, append) {
+		var out = $('#logViewOutput');
+		if (!append) {out.text('');}
+		if (lines.length) {out.append(document.createTextNode(lines.join('\n') + '\n'));}
+	}
+
+	function logViewError(xhr) {
+		showLogLines(['Error: ' + xhr.status + ' ' + xhr.statusText]);
+	}
+
+	function tailLog() {
+		stopLog();
+		$.getJSON('/logview', {logId: logView.logId, mode: 'tail', lines: $('#logViewLines').val()}, function(data) {
+			setLogRange(data);
+			showLogLines(data.lines);
+			$('#logViewOutput').scrollTop($('#logViewOutput')[0].scrollHeight);
+		}).fail(logViewError);
+	}
+
+	function pageLog(offset) {
+		stopLog();
+		$.getJSON('/logview', {logId: logView.logId, mode: 'page', offset: Math.max(0, offset), length: logView.length}, function(data) {
+			setLogRange(data);
+			showLogLines(data.lines);
+			$('#logViewOutput').scrollTop(0);
+		}).fail(logViewError);
+	}
+
+	function followLog(on) {
+		if (!on) {
+			stopLog();
+			return;
+		}
+		var out = $('#logViewOutput')[0];
+		logView.source = new EventSource('/logview?' + $.param({logId: logView.logId, mode: 'follow', offset: logView.end}));
+		logView.source.addEventListener('lines', function(e) {
+			var data = JSON.parse(e.data);
+			var atBottom = out.scrollTop + out.clientHeight >= out.scrollHeight - 5;
+			setLogRange({start: logView.start, end: data.end, size: data.size});
+			showLogLines(data.lines, true);
+			if (atBottom) {out.scrollTop = out.scrollHeight;}
+		});
+		logView.source.onerror = function() {
+			if (logView.source && logView.source.readyState == EventSource.CLOSED) {stopLog();}
+		};
+	}
+
+	function grepLog() {
+		stopLog();
+		var out = $('#logViewOutput').text('');
+		var params = {logId: logView.logId, mode: 'grep', pattern: $('#logViewPattern').val(), ignoreCase: $('#logViewIgnoreCase').prop('checked')};
+		var count = 0;
+		$('#logViewRange').text('Searching...');
+		fetch('/logview?' + $.param(params), {credentials: 'same-origin'}).then(function(response) {
+			if (!response.ok) {
+				logViewError(response);
+				return;
+			}
+			// Matches are streamed as they are found, one JSON array per line
+			var reader = logView.reader = response.body.getReader();
+			var decoder = new TextDecoder();
+			var buffer = '';
+			function read() {
+				return reader.read().then(function(result) {
+					buffer += decoder.decode(result.value || new Uint8Array(), {stream: !result.done});
+					var lines = buffer.split('\n');
+					buffer = lines.pop();
+					lines.forEach(function(line) {
+						if (!line) {return;}
+						var match = JSON.parse(line);
+						count++;
+						// Click a match to see it in context
+						$('<span class="logMatch"></span>').text(match[1] + '\n').attr('title', 'Byte ' + match[0]).on('click', function() {
+							pageLog(match[0] - logView.length / 2);
+						}).appendTo(out);
+					});
+					$('#logViewRange').text(count + ' match(es)' + (result.done ? '' : '...'));
+					if (!result.done) {return read();}
+					logView.reader = null;
+				});
+			}
+			return read();
+		}).catch(function() {});
+	}
+</script>
+% endif
+</%block>